@@ -0,0 +1,64 @@
+"""Compare MockTrainer batch synthesis throughput and payload size per image codec
+
+Usage: python benchmarks/bench_codecs.py [--steps 200] [--batch-size 16] [--image-size 64]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_path)
+
+from server import mock_trainer
+
+
+DEFAULT_CODECS = ['raw', 'png:0', 'png:1', 'png:6', 'png:9', 'jpeg:50', 'jpeg:85', 'webp:80', 'lazy:png']
+
+
+def bench_codec(spec, steps, batch_size, image_size):
+    """Generate `steps` batches with one codec and measure speed and size"""
+    trainer = mock_trainer.MockTrainer(codec=spec, batch_size=batch_size, image_size=image_size)
+
+    total_bytes = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        batch = trainer.generate_fake_batch()
+        # Lazy batches are never encoded unless a stream asks for them
+        if not trainer.lazy_encoding:
+            total_bytes += sum(len(img['pixels']) for img in batch['images'])
+    elapsed = time.perf_counter() - start
+
+    return {
+        'codec': spec,
+        'steps_per_sec': steps / elapsed,
+        'bytes_per_step': total_bytes / steps,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--image-size', type=int, default=64)
+    parser.add_argument('--codecs', nargs='+', default=DEFAULT_CODECS)
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = [
+        bench_codec(spec, args.steps, args.batch_size, args.image_size)
+        for spec in args.codecs
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'codec':<12}{'steps/sec':>12}{'bytes/step':>14}")
+    for result in results:
+        print(f"{result['codec']:<12}{result['steps_per_sec']:>12.1f}{result['bytes_per_step']:>14.0f}")
+
+
+if __name__ == '__main__':
+    main()
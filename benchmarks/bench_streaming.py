@@ -0,0 +1,489 @@
+"""Load-test the streaming pipeline: trainer -> gRPC server -> dashboard clients -> HTTP pollers
+
+Starts a training server (in this process or a subprocess), attaches
+synthetic DashboardClient consumers (some deliberately slow) and HTTP
+pollers against web_dashboard.app, then reports throughput, step latency,
+server CPU/RSS and bytes per client as JSON.
+
+Usage: python benchmarks/bench_streaming.py [--duration 20] [--step-rate 20] [--clients 8]
+           [--slow-clients 2] [--http-pollers 4] [--server subprocess] [--output result.json]
+           [--baseline baseline.json]
+
+With --baseline, results are compared against a stored run and the exit
+code is 1 if throughput or p99 latency regressed by more than --tolerance.
+In-process mode measures CPU and RSS of the whole benchmark process, since
+server and consumers share it; use --server subprocess to isolate the server.
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import urllib.error
+import numpy as np
+
+base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_path)
+sys.path.insert(0, os.path.join(base_path, 'client'))
+
+try:
+    import psutil
+except ImportError:
+    psutil = None  # Falls back to /proc (Linux) for the server subprocess
+
+import grpc
+from server import mock_trainer
+from server import process_trainer
+from server import training_server
+from dashboard_client import DashboardClient
+
+
+# Headline numbers compared against a baseline: (path, higher is better)
+BASELINE_KEYS = (
+    (('server', 'steps_per_sec'), True),
+    (('clients', 'fast', 'steps_per_sec'), True),
+    (('clients', 'fast', 'latency_ms', 'p50'), False),
+    (('clients', 'fast', 'latency_ms', 'p99'), False),
+    (('clients', 'bytes_per_client'), False),
+    (('server', 'cpu_percent'), False),
+    (('http', 'latency_ms', 'p99'), False),
+)
+
+
+class StopBenchmark(Exception):
+    """Raised from a consumer callback to leave the client's stream loop"""
+
+
+def percentiles(values):
+    if not values:
+        return {'p50': None, 'p99': None, 'max': None}
+    array = np.asarray(values, dtype=np.float64)
+    return {
+        'p50': float(np.percentile(array, 50)),
+        'p99': float(np.percentile(array, 99)),
+        'max': float(array.max()),
+    }
+
+
+def make_trainer(args):
+    """Trainer stepping at roughly args.step_rate steps per second, for as long as the run lasts"""
+    options = {
+        'codec': args.codec,
+        'batch_size': args.batch_size,
+        'image_size': args.image_size,
+        'step_delay': 1.0 / args.step_rate,
+        'fixed_samples': args.fixed_samples,
+        'max_steps': 10 ** 9,
+    }
+    if args.trainer_processes:
+        return process_trainer.ProcessTrainer(**options)
+    return mock_trainer.MockTrainer(**options)
+
+
+def serve(args):
+    """Run the server in this process until it exits (blocks)"""
+    serve_fn = training_server.serve if args.server_mode == 'threads' else training_server.serve_async
+    serve_fn({'bench': make_trainer(args)}, port=args.port, metrics_port=0)
+
+
+def wait_for_server(address, timeout=30):
+    channel = grpc.insecure_channel(address)
+    try:
+        grpc.channel_ready_future(channel).result(timeout=timeout)
+    finally:
+        channel.close()
+
+
+class ProcessStats:
+    """CPU seconds and peak RSS of a process, sampled in the background"""
+
+    def __init__(self, pid=None):
+        self.pid = pid  # None = this process
+        self.peak_rss = 0
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+
+    def cpu_seconds(self):
+        if self.pid is None:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            return usage.ru_utime + usage.ru_stime
+        if psutil:
+            times = psutil.Process(self.pid).cpu_times()
+            return times.user + times.system
+        with open(f'/proc/{self.pid}/stat') as f:
+            # Fields after the parenthesised command name; utime and stime are 14 and 15
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+    def rss(self):
+        if psutil:
+            return psutil.Process(self.pid or os.getpid()).memory_info().rss
+        with open(f"/proc/{self.pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def _sample(self):
+        while not self.stop.wait(0.5):
+            self.peak_rss = max(self.peak_rss, self.rss())
+
+    def start(self):
+        self.start_cpu = self.cpu_seconds()
+        self.start_time = time.perf_counter()
+        self.peak_rss = self.rss()
+        self.thread.start()
+
+    def finish(self):
+        self.stop.set()
+        elapsed = time.perf_counter() - self.start_time
+        cpu = self.cpu_seconds() - self.start_cpu
+        return {
+            'cpu_seconds': cpu,
+            'cpu_percent': 100 * cpu / elapsed,
+            'peak_rss_mb': self.peak_rss / 2 ** 20,
+        }
+
+
+class Consumer:
+    """One synthetic dashboard: a DashboardClient whose callbacks record what arrives"""
+
+    def __init__(self, address, stream, slow_delay, stop):
+        self.client = DashboardClient(address)
+        self.stream = stream
+        self.slow_delay = slow_delay  # Seconds each image batch takes to "render"
+        self.stop = stop
+        self.measuring = False
+        self.steps = 0
+        self.frames = 0
+        self.latencies = []
+        self.bytes_at_start = 0
+        self.threads = []
+
+    def on_metrics(self, metrics):
+        if self.stop.is_set():
+            raise StopBenchmark()
+        if self.measuring:
+            self.steps += 1
+            self.latencies.append(self.client.clock.latency_ms(metrics.timestamp_ms))
+
+    def on_images(self, batch):
+        if self.stop.is_set():
+            raise StopBenchmark()
+        if self.slow_delay:
+            time.sleep(self.slow_delay)
+        if self.measuring:
+            self.frames += 1
+
+    def _run(self, target, *callbacks):
+        try:
+            target(*callbacks)
+        except StopBenchmark:
+            pass
+
+    def start(self):
+        if not self.client.connect():
+            raise RuntimeError(f"Consumer could not connect to {self.client.server_address}")
+        if self.stream == 'live':
+            targets = [(self.client.stream_live, self.on_metrics, self.on_images)]
+        else:
+            targets = [(self.client.stream_metrics, self.on_metrics), (self.client.stream_images, self.on_images)]
+        for target, *callbacks in targets:
+            thread = threading.Thread(target=self._run, args=(target, *callbacks), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def begin_measuring(self):
+        self.bytes_at_start = self.client.bytes_received
+        self.measuring = True
+
+    def finish(self, elapsed):
+        self.measuring = False
+        return {
+            'slow': bool(self.slow_delay),
+            'steps_per_sec': self.steps / elapsed,
+            'image_fps': self.frames / elapsed,
+            'latency_ms': percentiles(self.latencies),
+            'bytes': self.client.bytes_received - self.bytes_at_start,
+        }, self.latencies
+
+    def close(self):
+        for thread in self.threads:
+            thread.join(timeout=5)
+        self.client.close()
+
+
+class HttpPoller:
+    """A browser tab polling web_dashboard: status, metrics deltas, the image index and new images"""
+
+    def __init__(self, base_url, interval, stop):
+        self.base_url = base_url
+        self.interval = interval
+        self.stop = stop
+        self.measuring = False
+        self.requests = 0
+        self.bytes = 0
+        self.latencies = []
+        self.errors = 0
+        self.etags = {}
+        self.fetched_images = set()  # Image URLs are immutable, as a browser cache would know
+        self.last_step = -1
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def begin_measuring(self):
+        self.measuring = True
+
+    def get(self, path):
+        request = urllib.request.Request(self.base_url + path)
+        if path in self.etags:
+            request.add_header('If-None-Match', self.etags[path])
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                body = response.read()
+                if response.headers.get('ETag'):
+                    self.etags[path] = response.headers['ETag']
+        except urllib.error.HTTPError as e:
+            body = None
+            if e.code != 304:
+                self.errors += 1
+        except OSError:
+            body = None
+            self.errors += 1
+        if self.measuring:
+            self.requests += 1
+            self.latencies.append((time.perf_counter() - start) * 1000)
+            self.bytes += len(body or b'')
+        return body
+
+    def poll(self):
+        self.get('/api/status')
+        metrics = self.get(f'/api/metrics?since_step={self.last_step}')
+        if metrics:
+            self.last_step = json.loads(metrics)['last_step']
+        index = self.get('/api/images')
+        if index:
+            for image in json.loads(index):
+                if image['url'] not in self.fetched_images:
+                    self.fetched_images.add(image['url'])
+                    self.get(image['url'])
+
+    def run(self):
+        while not self.stop.is_set():
+            self.poll()
+            self.stop.wait(self.interval)
+
+    def finish(self, elapsed):
+        self.measuring = False
+        return {
+            'requests_per_sec': self.requests / elapsed,
+            'latency_ms': self.latencies,
+            'bytes': self.bytes,
+            'errors': self.errors,
+        }
+
+
+def start_web_dashboard(address, port):
+    """Serve web_dashboard.app on `port`, its gRPC client attached to `address`"""
+    from werkzeug.serving import make_server
+    os.environ['GRPC_SERVER_ADDRESS'] = address
+    import web_dashboard
+    web_dashboard.start_client()
+    http_server = make_server('127.0.0.1', port, web_dashboard.app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    return http_server
+
+
+def group_summary(results):
+    """Mean rates and pooled latency percentiles over (result, latencies) pairs"""
+    if not results:
+        return None
+    return {
+        'count': len(results),
+        'steps_per_sec': float(np.mean([result['steps_per_sec'] for result, _ in results])),
+        'image_fps': float(np.mean([result['image_fps'] for result, _ in results])),
+        'latency_ms': percentiles([latency for _, latencies in results for latency in latencies]),
+    }
+
+
+def run_benchmark(args):
+    address = f'localhost:{args.port}'
+    server_process = None
+    if args.server == 'subprocess':
+        command = [sys.executable, os.path.abspath(__file__), '--serve-only'] + sys.argv[1:]
+        # Its logs go to stderr like ours, keeping stdout for the JSON result
+        server_process = subprocess.Popen(command, stdout=sys.stderr)
+        stats = ProcessStats(server_process.pid)
+    else:
+        threading.Thread(target=serve, args=(args,), daemon=True).start()
+        stats = ProcessStats()
+    wait_for_server(address)
+
+    stop = threading.Event()
+    consumers = [
+        Consumer(address, args.stream, args.slow_delay if i < args.slow_clients else 0, stop)
+        for i in range(args.clients)
+    ]
+    for consumer in consumers:
+        consumer.start()
+
+    pollers = []
+    if args.http_pollers:
+        http_server = start_web_dashboard(address, args.http_port)
+        base_url = f'http://127.0.0.1:{args.http_port}'
+        pollers = [HttpPoller(base_url, args.poll_interval, stop) for _ in range(args.http_pollers)]
+        for poller in pollers:
+            poller.thread.start()
+
+    control = DashboardClient(address)
+    control.connect()
+    control.start_training()
+
+    def current_step():
+        return control.training_stub.GetTrainingStatus(
+            training_server.training_service_pb2.TrainingStatusRequest()
+        ).current_step
+
+    # Let connections, caches and the first steps settle, then measure
+    time.sleep(args.warmup)
+    first_step = current_step()
+    for client in consumers + pollers:
+        client.begin_measuring()
+    stats.start()
+    start = time.perf_counter()
+
+    time.sleep(args.duration)
+
+    elapsed = time.perf_counter() - start
+    last_step = current_step()
+    server_stats = stats.finish()
+    consumer_results = [consumer.finish(elapsed) for consumer in consumers]
+    poller_results = [poller.finish(elapsed) for poller in pollers]
+
+    stop.set()
+    for consumer in consumers:
+        consumer.close()
+    control.stop_training()
+    control.close()
+    if pollers:
+        http_server.shutdown()
+    if server_process:
+        server_process.terminate()
+        server_process.wait(timeout=10)
+
+    per_client = [result for result, _ in consumer_results]
+    fast = [pair for pair in consumer_results if not pair[0]['slow']]
+    slow = [pair for pair in consumer_results if pair[0]['slow']]
+    bytes_per_client = float(np.mean([result['bytes'] for result in per_client])) if per_client else 0.0
+
+    return {
+        'config': {
+            key: value for key, value in vars(args).items()
+            if key not in ('output', 'baseline', 'serve_only', 'tolerance')
+        },
+        'server': dict(
+            server_stats,
+            mode=args.server,
+            steps=last_step - first_step,
+            steps_per_sec=(last_step - first_step) / elapsed,
+        ),
+        'clients': {
+            'fast': group_summary(fast),
+            'slow': group_summary(slow),
+            'bytes_per_client': bytes_per_client,
+            'bytes_per_sec_per_client': bytes_per_client / elapsed,
+            'per_client': per_client,
+        },
+        'http': {
+            'pollers': len(pollers),
+            'requests_per_sec': sum(r['requests_per_sec'] for r in poller_results),
+            'latency_ms': percentiles([latency for r in poller_results for latency in r['latency_ms']]),
+            'bytes_per_poller': float(np.mean([r['bytes'] for r in poller_results])) if poller_results else 0,
+            'errors': sum(r['errors'] for r in poller_results),
+        },
+        'duration_s': elapsed,
+    }
+
+
+def lookup(result, path):
+    for key in path:
+        if not isinstance(result, dict) or result.get(key) is None:
+            return None
+        result = result[key]
+    return result
+
+
+def compare(result, baseline, tolerance):
+    """Print headline numbers against the baseline; returns the regressed metric names"""
+    regressions = []
+    print(f"{'metric':<36}{'baseline':>12}{'current':>12}{'change':>9}", file=sys.stderr)
+    for path, higher_is_better in BASELINE_KEYS:
+        old, new = lookup(baseline, path), lookup(result, path)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        name = '.'.join(path)
+        print(f"{name:<36}{old:>12.2f}{new:>12.2f}{change:>+9.1%}", file=sys.stderr)
+        # Throughput and latency gate the exit code; the rest are informational
+        gated = 'steps_per_sec' in name or 'p99' in name
+        worse = -change if higher_is_better else change
+        if gated and worse > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=20, help="Measured seconds")
+    parser.add_argument('--warmup', type=float, default=3, help="Seconds before measuring starts")
+    parser.add_argument('--step-rate', type=float, default=20, help="Target trainer steps per second")
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--image-size', type=int, default=64)
+    parser.add_argument('--codec', default='png')
+    parser.add_argument('--fixed-samples', action='store_true', help="Repeat the same images every step")
+    parser.add_argument('--trainer-processes', action='store_true', help="Use ProcessTrainer")
+    parser.add_argument('--server', choices=('inprocess', 'subprocess'), default='inprocess')
+    parser.add_argument('--server-mode', choices=('aio', 'threads'), default='aio')
+    parser.add_argument('--port', type=int, default=50151)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--slow-clients', type=int, default=2)
+    parser.add_argument('--slow-delay', type=float, default=0.25, help="Seconds a slow client spends per image batch")
+    parser.add_argument('--stream', choices=('live', 'separate'), default='live',
+                        help="LiveTrainingStream, or StreamMetrics plus StreamImages")
+    parser.add_argument('--http-pollers', type=int, default=4)
+    parser.add_argument('--http-port', type=int, default=5051)
+    parser.add_argument('--poll-interval', type=float, default=0.5)
+    parser.add_argument('--output', help="Also write the JSON result here")
+    parser.add_argument('--baseline', help="JSON result of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="Allowed regression before exiting 1")
+    parser.add_argument('--serve-only', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_only:
+        serve(args)
+        return
+
+    # Server, trainer and client logs would otherwise interleave with the JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        result = run_benchmark(args)
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print(f"Regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
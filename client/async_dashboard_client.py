@@ -0,0 +1,525 @@
+import grpc
+import grpc.aio
+import asyncio
+import collections
+import inspect
+import time
+import sys
+import uuid
+import os
+
+# Handle both script and PyInstaller execution
+if getattr(sys, 'frozen', False):
+    base_path = sys._MEIPASS
+else:
+    base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+generated_path = os.path.join(base_path, 'generated')
+sys.path.insert(0, base_path)
+sys.path.insert(0, generated_path)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generated import training_service_pb2
+from generated import training_service_pb2_grpc
+from generated import health_check_pb2
+from generated import health_check_pb2_grpc
+from generated import training_metric_pb2
+from dashboard_client import (
+    ClassStatsView, ClockSync, ImageStore, IMAGE_CACHE_SIZE, FRAME_SECONDS,
+    backoff_delay, columns_from_pages, count_skipped_frames, parse_image_selection, record_arrival
+)
+
+
+# HTTP/2 keepalive pings notice a dead server (or NAT drop) on an idle stream
+# within ~15s instead of waiting for TCP to time out
+KEEPALIVE_OPTIONS = [
+    ('grpc.keepalive_time_ms', 10000),
+    ('grpc.keepalive_timeout_ms', 5000),
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.max_pings_without_data', 0),
+]
+
+
+class ChannelPool:
+    """grpc.aio channels shared by every client on one event loop
+
+    HTTP/2 multiplexes all of a client's streams over one connection, so
+    clients of the same server share a channel. With size > 1, clients
+    round-robin over that many channels per address, spreading many busy
+    runs across connections.
+    """
+
+    def __init__(self, size=1, options=KEEPALIVE_OPTIONS):
+        self.size = max(1, size)
+        self.options = options
+        self.channels = collections.defaultdict(list)
+        self.next_index = collections.Counter()
+
+    def get(self, address):
+        """A channel to `address`, opening a new one until the pool is full"""
+        channels = self.channels[address]
+        if len(channels) < self.size:
+            channels.append(grpc.aio.insecure_channel(address, options=self.options))
+            return channels[-1]
+        channel = channels[self.next_index[address] % self.size]
+        self.next_index[address] += 1
+        return channel
+
+    async def close(self):
+        for channels in self.channels.values():
+            for channel in channels:
+                await channel.close()
+        self.channels.clear()
+
+
+async def _call(callback, *args):
+    """Run a callback that may be a plain function or a coroutine function"""
+    result = callback(*args)
+    if inspect.isawaitable(result):
+        await result
+
+
+class AsyncDashboardClient:
+    """Asyncio dashboard client: streams, heartbeats and status reports on one loop
+
+    Watching several runs or servers is one client per target on the same
+    loop, sharing a ChannelPool:
+
+        pool = ChannelPool()
+        clients = [AsyncDashboardClient(address, run_id, pool=pool) for address, run_id in targets]
+        await asyncio.gather(*(c.run(on_metrics, on_images) for c in clients))
+    """
+
+    def __init__(self, server_address=None, run_id=None, pool=None):
+        # Use environment variable or default
+        if server_address is None:
+            server_address = os.getenv('GRPC_SERVER_ADDRESS', 'localhost:50051')
+        if run_id is None:
+            run_id = os.getenv('TRAINING_RUN_ID', '')
+
+        self.server_address = server_address
+        self.run_id = run_id  # Empty = the server's default run
+        self.client_id = str(uuid.uuid4())
+        self.pool = pool or ChannelPool()
+        self.owns_pool = pool is None
+        self.training_stub = None
+        self.health_stub = None
+        self._connected = False
+        self.on_connection_change = None  # Called with the new state when it flips
+        self.last_step = 0
+        self.retry_count = 0
+        self.max_retries = 5
+
+        # Performance tracking
+        self.fps = 0
+        self.latency_ms = 0
+        self.frame_times = collections.deque(maxlen=60)
+
+        # FPS cap
+        self.target_fps = 60
+        self.min_frame_time = 1.0 / self.target_fps
+
+        # Status reports drive the server's per-client quality adaptation
+        self.status_interval = 1.0
+        self.heartbeat_interval = 5.0  # Pings also renew the server-side session lease
+        self.heartbeat_task = None
+        self.adaptation_level = 0
+
+        # Repeated images arrive as content ids (0 = ask for full pixels every time)
+        self.image_cache_size = IMAGE_CACHE_SIZE
+        # Which images of each step the server sends, e.g. "misclassified:4" (see parse_image_selection)
+        self.image_batch_size, self.image_selection, self.selection_class = parse_image_selection(
+            os.getenv('DASHBOARD_IMAGE_SELECTION', '')
+        )
+
+        # latency_ms is measured on the server's clock; heartbeats keep the offset fresh
+        self.clock = ClockSync()
+        self.last_image_step = 0
+        self.bytes_received = 0  # Serialized stream messages, before image references are resolved
+
+    @property
+    def connected(self):
+        return self._connected
+
+    @connected.setter
+    def connected(self, value):
+        changed = value != self._connected
+        self._connected = value
+        if changed and self.on_connection_change:
+            self.on_connection_change(value)
+
+    async def connect(self):
+        """Open (or reuse) a pooled channel and check the server answers"""
+        channel = self.pool.get(self.server_address)
+        self.training_stub = training_service_pb2_grpc.TrainingDashboardStub(channel)
+        self.health_stub = health_check_pb2_grpc.HealthCheckStub(channel)
+
+        if await self.send_heartbeat():
+            self.connected = True
+            self.retry_count = 0
+            print(f"Connected to server at {self.server_address} (Client ID: {self.client_id})")
+            self._start_heartbeats()
+            return True
+        return False
+
+    def _start_heartbeats(self):
+        if self.heartbeat_task is None or self.heartbeat_task.done():
+            self.heartbeat_task = asyncio.create_task(self.heartbeat_loop())
+
+    async def reconnect(self, last_step=None):
+        """Retry with jittered exponential backoff until reconnected or out of attempts
+
+        Returns the step the calling stream should resume after (see
+        DashboardClient.reconnect), or None when giving up.
+        """
+        while True:
+            self.retry_count += 1
+
+            if self.retry_count > self.max_retries:
+                print(f"Max retries exceeded for {self.server_address}. Giving up.")
+                return None
+
+            wait_time = backoff_delay(self.retry_count)
+            print(f"Reconnection attempt {self.retry_count}/{self.max_retries} in {wait_time:.1f}s...")
+            await asyncio.sleep(wait_time)
+
+            try:
+                response = await self.health_stub.Reconnect(
+                    health_check_pb2.ReconnectRequest(
+                        last_known_step=self.last_step if last_step is None else last_step,
+                        client_id=self.client_id,
+                        attempt_number=self.retry_count,
+                        run_id=self.run_id
+                    )
+                )
+            except grpc.RpcError:
+                continue
+
+            if response.success:
+                print(f"Reconnected! Resuming from step {response.resume_step}")
+                self.connected = True
+                self.retry_count = 0
+                self._start_heartbeats()
+                # The server may clamp to the steps it still retains
+                return response.resume_step
+            print(f"Reconnection failed: {response.message}")
+
+    async def send_heartbeat(self):
+        """Ping the server and sample the clock offset; False if it doesn't answer"""
+        sent_ms = int(time.time() * 1000)
+        try:
+            response = await self.health_stub.Ping(
+                health_check_pb2.PingRequest(
+                    timestamp_ms=sent_ms,
+                    client_id=self.client_id
+                ),
+                timeout=self.heartbeat_interval
+            )
+        except grpc.RpcError:
+            return False
+        self.clock.observe(sent_ms, response.timestamp_ms, int(time.time() * 1000))
+        return response.alive
+
+    async def disconnect(self, reason="Client closed"):
+        """End the server-side session, so the server stops this client's streams right away"""
+        if self.health_stub is None:
+            return
+        try:
+            await self.health_stub.Disconnect(
+                health_check_pb2.DisconnectRequest(client_id=self.client_id, reason=reason),
+                timeout=2
+            )
+        except grpc.RpcError:
+            pass  # The lease runs out on its own
+
+    async def send_dashboard_status(self):
+        """Send dashboard performance metrics to server"""
+        try:
+            ack = await self.training_stub.SendDashboardStatus(
+                training_metric_pb2.DashboardMetrics(
+                    fps=self.fps,
+                    latency_ms=self.latency_ms,
+                    frames_rendered=len(self.frame_times),
+                    client_id=self.client_id
+                )
+            )
+            if ack.adaptation_level != self.adaptation_level:
+                print(f"Server adaptation level: {ack.adaptation_level} ({ack.adaptation_name})")
+            self.adaptation_level = ack.adaptation_level
+        except grpc.RpcError as e:
+            print(f"Failed to send status: {e}")
+
+    async def _finish_frame(self, frame_start):
+        """Cap FPS (yielding to the loop, not blocking it) and update frame statistics"""
+        frame_time = time.time() - frame_start
+        FRAME_SECONDS.observe(frame_time)
+        if frame_time < self.min_frame_time:
+            await asyncio.sleep(self.min_frame_time - frame_time)
+            frame_time = self.min_frame_time
+
+        self.frame_times.append(frame_time)
+        avg_frame_time = sum(self.frame_times) / len(self.frame_times)
+        self.fps = min(1.0 / avg_frame_time if avg_frame_time > 0 else 0, self.target_fps)
+
+    async def _stream(self, open_call, handle):
+        """Run a stream, reconnecting on errors; returns once reconnecting gives up
+
+        The stream keeps its own resume position: open_call(resume_step) opens
+        the call from it, and handle(message) returns the step it consumed, if any.
+        """
+        resume_step = self.last_step
+        while True:
+            call = open_call(resume_step)
+            try:
+                async for message in call:
+                    step = await handle(message)
+                    if step is not None:
+                        resume_step = step
+            except grpc.RpcError as e:
+                print(f"Stream interrupted: {e.code()}")
+                self.connected = False
+                resume_step = await self.reconnect(resume_step)
+                if resume_step is None:
+                    return
+            finally:
+                call.cancel()
+
+    async def stream_metrics(self, callback):
+        """Stream training metrics with automatic reconnection"""
+        async def handle(metrics):
+            self.last_step = metrics.step
+            self.latency_ms = self.clock.latency_ms(metrics.timestamp_ms)
+            self.bytes_received += record_arrival('metrics', metrics, self.latency_ms)
+            await _call(callback, metrics)
+            return metrics.step
+
+        await self._stream(
+            # Rebuilt on every (re)connect so the server replays what was missed
+            lambda resume_step: self.training_stub.StreamMetrics(
+                training_service_pb2.MetricsRequest(
+                    update_interval=100,
+                    start_step=resume_step,
+                    run_id=self.run_id,
+                    client_id=self.client_id
+                )
+            ),
+            handle
+        )
+
+    async def stream_metrics_batches(self, callback, flush_interval_ms=100, max_batch_steps=256):
+        """Stream every step's metrics as MetricsBatch messages, with automatic reconnection"""
+        async def handle(batch):
+            if not batch.step:
+                return
+            self.last_step = batch.step[-1]
+            self.latency_ms = self.clock.latency_ms(batch.timestamp_ms[-1])
+            self.bytes_received += record_arrival('metrics_batch', batch, self.latency_ms)
+            await _call(callback, batch)
+            return batch.step[-1]
+
+        await self._stream(
+            lambda resume_step: self.training_stub.StreamMetricsBatches(
+                training_service_pb2.MetricsRequest(
+                    start_step=resume_step,
+                    run_id=self.run_id,
+                    flush_interval_ms=flush_interval_ms,
+                    max_batch_steps=max_batch_steps,
+                    client_id=self.client_id
+                )
+            ),
+            handle
+        )
+
+    async def stream_class_stats(self, callback, update_interval_ms=500):
+        """Stream per-class stats with automatic reconnection; callback gets a ClassStatsView"""
+        view = None
+
+        def open_call(resume_step):
+            nonlocal view
+            view = ClassStatsView()
+            return self.training_stub.StreamClassStats(
+                training_service_pb2.ClassStatsRequest(
+                    run_id=self.run_id,
+                    update_interval_ms=update_interval_ms,
+                    client_id=self.client_id
+                )
+            )
+
+        async def handle(update):
+            self.bytes_received += record_arrival(
+                'class_stats', update, self.clock.latency_ms(update.timestamp_ms) if update.step else 0
+            )
+            await _call(callback, view.apply(update))
+
+        await self._stream(open_call, handle)
+
+    async def stream_images(self, callback):
+        """Stream image batches with automatic reconnection and FPS cap"""
+        images = None
+
+        def open_call(resume_step):
+            nonlocal images
+            images = ImageStore(self.image_cache_size)
+            return self.training_stub.StreamImages(
+                training_service_pb2.ImageBatchRequest(
+                    batch_size=self.image_batch_size,
+                    start_step=resume_step,
+                    client_id=self.client_id,
+                    run_id=self.run_id,
+                    image_cache_size=images.capacity,
+                    selection=self.image_selection,
+                    selection_class=self.selection_class
+                )
+            )
+
+        async def handle(batch):
+            frame_start = time.time()
+            self.last_step = batch.step
+            self.latency_ms = self.clock.latency_ms(batch.timestamp_ms)
+            self.bytes_received += record_arrival('images', batch, self.latency_ms)
+            self.last_image_step = count_skipped_frames(self.last_image_step, batch.step)
+            await _call(callback, images.resolve(batch))
+            await self._finish_frame(frame_start)
+            return batch.step
+
+        await self._stream(open_call, handle)
+
+    async def stream_live(self, metrics_callback, images_callback, window=2):
+        """Metrics and images over one credit-controlled bidi stream (see DashboardClient.stream_live)"""
+        acks = None
+        images = None
+
+        def open_call(resume_step):
+            nonlocal acks, images
+            acks = asyncio.Queue()
+            images = ImageStore(self.image_cache_size)
+            # Opening message sets where to resume and the credit window
+            acks.put_nowait(training_service_pb2.DashboardResponse(
+                ready=True,
+                last_received_step=resume_step,
+                status="READY",
+                window=window,
+                client_id=self.client_id,
+                run_id=self.run_id,
+                image_cache_size=images.capacity,
+                batch_size=self.image_batch_size,
+                selection=self.image_selection,
+                selection_class=self.selection_class
+            ))
+            queue = acks
+
+            async def ack_stream():
+                while True:
+                    yield await queue.get()
+
+            return self.training_stub.LiveTrainingStream(ack_stream())
+
+        async def handle(update):
+            self.last_step = update.step
+
+            if update.HasField('metrics'):
+                self.latency_ms = self.clock.latency_ms(update.metrics.timestamp_ms)
+                self.bytes_received += record_arrival('live', update, self.latency_ms)
+                await _call(metrics_callback, update.metrics)
+
+            if update.HasField('batch'):
+                frame_start = time.time()
+                self.last_image_step = count_skipped_frames(self.last_image_step, update.step)
+                await _call(images_callback, images.resolve(update.batch))
+                await self._finish_frame(frame_start)
+
+            acks.put_nowait(training_service_pb2.DashboardResponse(
+                ready=True,
+                last_received_step=update.step,
+                status="OK"
+            ))
+            return update.step
+
+        await self._stream(open_call, handle)
+
+    async def heartbeat_loop(self):
+        """Ping periodically so a dead server shows up even while no step arrives"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            alive = await self.send_heartbeat()
+            if alive != self.connected:
+                self.connected = alive
+
+    async def status_loop(self):
+        """Report FPS and latency to the server every status_interval"""
+        while True:
+            await asyncio.sleep(self.status_interval)
+            if self.connected and self.frame_times:
+                await self.send_dashboard_status()
+
+    async def run(self, metrics_callback, images_callback, window=2, class_stats_callback=None):
+        """Connect, then run the live stream, heartbeats and status reports until the stream gives up
+
+        With class_stats_callback, per-class stats are streamed alongside.
+        Calling it again after it returns starts over with a fresh retry budget.
+        """
+        self.retry_count = 0
+        if not await self.connect() and await self.reconnect() is None:
+            return
+
+        # connect() started the heartbeats; they stop with the streams below
+        background = [self.heartbeat_task, asyncio.create_task(self.status_loop())]
+        if class_stats_callback is not None:
+            background.append(asyncio.create_task(self.stream_class_stats(class_stats_callback)))
+        try:
+            await self.stream_live(metrics_callback, images_callback, window)
+        finally:
+            for task in background:
+                task.cancel()
+            self.connected = False
+
+    async def start_training(self):
+        """Send command to start training"""
+        response = await self.training_stub.StartTraining(
+            training_service_pb2.TrainingControlRequest(client_id=self.client_id, run_id=self.run_id)
+        )
+        print(f"Start training response: {response.message}")
+        return response.success
+
+    async def stop_training(self):
+        """Send command to stop training"""
+        response = await self.training_stub.StopTraining(
+            training_service_pb2.TrainingControlRequest(client_id=self.client_id, run_id=self.run_id)
+        )
+        print(f"Stop training response: {response.message}")
+        return response.success
+
+    async def list_runs(self):
+        """Runs hosted by the server, as RunInfo messages"""
+        response = await self.training_stub.ListRuns(
+            training_service_pb2.ListRunsRequest(client_id=self.client_id)
+        )
+        return list(response.runs)
+
+    async def query_metrics(self, from_step=0, to_step=0, stride=1, include_predictions=False):
+        """Range read of the recorded run as NumPy columns (see DashboardClient.query_metrics)"""
+        pages = []
+        while True:
+            page = await self.training_stub.QueryMetrics(
+                training_service_pb2.MetricsQuery(
+                    from_step=from_step,
+                    to_step=to_step,
+                    stride=stride,
+                    include_predictions=include_predictions,
+                    run_id=self.run_id
+                )
+            )
+            pages.append(page)
+            if not page.next_step:
+                break
+            from_step = page.next_step
+        return columns_from_pages(pages, include_predictions)
+
+    async def close(self):
+        """End the session and close the channels, if this client owns its pool"""
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+        await self.disconnect()
+        if self.owns_pool:
+            await self.pool.close()
+        self.connected = False
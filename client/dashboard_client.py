@@ -1,8 +1,13 @@
 import grpc
 import time
+import threading
 import sys
 import uuid
 import os
+import queue
+import random
+import collections
+import numpy as np
 
 # Handle both script and PyInstaller execution
 if getattr(sys, 'frozen', False):
@@ -13,28 +18,197 @@ else:
 generated_path = os.path.join(base_path, 'generated')
 sys.path.insert(0, base_path)
 sys.path.insert(0, generated_path)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from generated import training_service_pb2
 from generated import training_service_pb2_grpc
 from generated import health_check_pb2
 from generated import health_check_pb2_grpc
 from generated import training_metric_pb2
+from common import telemetry
+
+
+METRIC_COLUMNS = (('step', '<u4'), ('loss', '<f4'), ('accuracy', '<f4'), ('timestamp_ms', '<u8'))
+PREDICTION_COLUMNS = (('image_step', '<u4'), ('ground_truth', 'u1'), ('prediction', 'u1'), ('confidence', '<f4'))
+
+# Images kept per stream so the server can send repeats by content id
+IMAGE_CACHE_SIZE = 256
+
+STEP_LATENCY = telemetry.REGISTRY.histogram(
+    'dashboard_step_latency_seconds', 'Time from the server publishing a step to it arriving here, '
+    'corrected for clock skew', ('kind',)
+)
+BYTES_RECEIVED = telemetry.REGISTRY.counter('dashboard_bytes_received_total', 'Serialized bytes received', ('kind',))
+FRAME_SECONDS = telemetry.REGISTRY.histogram('dashboard_frame_seconds', 'Time the image callback took per batch')
+DROPPED_FRAMES = telemetry.REGISTRY.counter(
+    'dashboard_dropped_frames_total', 'Steps whose images never arrived (gaps between consecutive image batches)'
+)
+CLOCK_OFFSET = telemetry.REGISTRY.gauge('dashboard_clock_offset_seconds', 'Estimated server clock minus local clock')
+PING_RTT = telemetry.REGISTRY.gauge('dashboard_ping_rtt_seconds', 'Round trip of the ping the clock offset comes from')
+
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    """Exponential backoff jittered between half and one and a half times the delay
+    
+    Clients that lost the same server don't retry in lockstep, yet with the
+    floor max_retries attempts still wait about as long as 2**n seconds each.
+    """
+    delay = min(cap, base * 2 ** attempt)
+    return random.uniform(0.5 * delay, 1.5 * delay)
+
+
+def columns_from_pages(pages, include_predictions=False):
+    """Decode QueryMetrics pages into NumPy columns (see DashboardClient.query_metrics)"""
+    def concat(columns):
+        return {
+            name: np.concatenate([np.frombuffer(getattr(page, name), dtype) for page in pages])
+            for name, dtype in columns
+        }
+    
+    result = concat(METRIC_COLUMNS)
+    if include_predictions:
+        result['predictions'] = concat(PREDICTION_COLUMNS)
+        result['predictions']['class_names'] = list(pages[-1].class_names)
+    return result
+
+
+def parse_image_selection(spec):
+    """(batch_size, ImageSelection, class name) for a spec like "misclassified:4" or "class:cat:8"
+    
+    Policies: first, misclassified, least_confident, stratified, class.
+    The count defaults to 16, the most the server sends at full quality.
+    """
+    parts = spec.split(':') if spec else ['first']
+    policy = parts.pop(0)
+    class_name = parts.pop(0) if policy == 'class' and parts else ''
+    count = int(parts[0]) if parts else 16
+    return count, training_service_pb2.ImageSelection.Value('SELECT_' + policy.upper()), class_name
+
+
+def record_arrival(kind, message, latency_ms):
+    """Count a received message and its end-to-end latency; returns its size in bytes"""
+    size = message.ByteSize()
+    BYTES_RECEIVED.labels(kind).inc(size)
+    STEP_LATENCY.labels(kind).observe(latency_ms / 1000)
+    return size
+
+
+def count_skipped_frames(previous_step, step):
+    """Count image steps skipped between two batches; returns `step` as the new previous one"""
+    if previous_step and step > previous_step + 1:
+        DROPPED_FRAMES.inc(step - previous_step - 1)
+    return step
+
+
+class ClockSync:
+    """Server clock offset estimated from Ping round trips, as NTP does
+    
+    The server stamps its reply somewhere inside the round trip; assuming
+    the middle is off by at most half the round trip, so the offset comes
+    from the fastest of the recent pings.
+    """
+    
+    def __init__(self, samples=8):
+        self.samples = collections.deque(maxlen=samples)  # (rtt_ms, offset_ms)
+        self.offset_ms = 0.0
+        self.rtt_ms = None
+        self.updated = 0.0
+    
+    def observe(self, sent_ms, server_ms, received_ms):
+        """Add one ping: local send time, the server's reply timestamp, local receive time"""
+        self.samples.append((received_ms - sent_ms, server_ms - (sent_ms + received_ms) / 2))
+        self.rtt_ms, self.offset_ms = min(self.samples)
+        self.updated = time.time()
+        CLOCK_OFFSET.set(self.offset_ms / 1000)
+        PING_RTT.set(self.rtt_ms / 1000)
+    
+    def latency_ms(self, timestamp_ms):
+        """Milliseconds since the server stamped `timestamp_ms`, measured on the server's clock"""
+        return max(0, int(time.time() * 1000 + self.offset_ms) - timestamp_ms)
+    
+    def stale(self, max_age_s=30):
+        return time.time() - self.updated > max_age_s
+
+
+class ImageStore:
+    """Client half of image deduplication: an LRU of encoded images by content id
+    
+    The server mirrors this LRU for the stream and sends an image it knows
+    is still here as its content id alone. `resolve` fills those back in, so
+    callbacks always see complete batches. One store per stream, since the
+    server's mirror only follows that stream.
+    """
+    
+    def __init__(self, capacity=IMAGE_CACHE_SIZE):
+        self.capacity = capacity
+        self.images = collections.OrderedDict()
+        self.missing = 0  # References to images no longer held; should stay 0
+    
+    def resolve(self, batch):
+        """Fill in pixel_data of images sent by reference, in place; returns the batch"""
+        for labeled_img in batch.images:
+            image = labeled_img.image
+            if not image.content_id:
+                continue
+            # Touch every id in arrival order, exactly as the server's mirror does
+            if image.pixel_data:
+                self.images[image.content_id] = image.pixel_data
+                self.images.move_to_end(image.content_id)
+                if len(self.images) > self.capacity:
+                    self.images.popitem(last=False)
+            elif image.content_id in self.images:
+                self.images.move_to_end(image.content_id)
+                image.pixel_data = self.images[image.content_id]
+            else:
+                self.missing += 1
+        return batch
+
+
+class ClassStatsView:
+    """Confusion matrix rebuilt from StreamClassStats deltas, plus the latest windowed stats"""
+    
+    def __init__(self):
+        self.class_names = []
+        self.confusion = np.zeros((0, 0), dtype=np.int64)  # [ground truth, prediction]
+        self.latest = None  # Last ClassStatsUpdate, for the window_* and confidence_* fields
+    
+    def apply(self, update):
+        """Fold one update into the matrix; returns self"""
+        if update.reset:
+            self.class_names = list(update.class_names)
+            n = len(self.class_names)
+            self.confusion = np.zeros((n, n), dtype=np.int64)
+        np.add.at(self.confusion.reshape(-1), np.asarray(update.confusion_cells, dtype=np.int64),
+                  np.asarray(update.confusion_counts, dtype=np.int64))
+        self.latest = update
+        return self
+    
+    def window_accuracy(self):
+        """Per-class accuracy over the server's window (NaN for classes it has not seen)"""
+        correct = np.asarray(self.latest.window_correct, dtype=np.float64)
+        total = np.asarray(self.latest.window_total, dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return correct / total
 
 
 class DashboardClient:
     """Dashboard client with fault tolerance and reconnection"""
     
-    def __init__(self, server_address=None):
+    def __init__(self, server_address=None, run_id=None):
         # Use environment variable or default
         if server_address is None:
             server_address = os.getenv('GRPC_SERVER_ADDRESS', 'localhost:50051')
+        if run_id is None:
+            run_id = os.getenv('TRAINING_RUN_ID', '')
         
         self.server_address = server_address
+        self.run_id = run_id  # Empty = the server's default run
         self.client_id = str(uuid.uuid4())
         self.channel = None
         self.training_stub = None
         self.health_stub = None
-        self.connected = False
+        self._connected = False
+        self.on_connection_change = None  # Called with the new state when it flips
         self.last_step = 0
         self.retry_count = 0
         self.max_retries = 5
@@ -47,156 +221,358 @@ class DashboardClient:
         # FPS cap
         self.target_fps = 60
         self.min_frame_time = 1.0 / self.target_fps  # ~0.0167 seconds
+        
+        # Status reports drive the server's per-client quality adaptation
+        self.status_interval = 1.0
+        self.last_status_time = 0
+        self.adaptation_level = 0
+        
+        # Pings renew the server-side session; a client silent for the lease loses its streams
+        self.heartbeat_interval = 5.0
+        self.heartbeat_thread = None
+        self.closing = threading.Event()
+        
+        # Repeated images arrive as content ids (0 = ask for full pixels every time)
+        self.image_cache_size = IMAGE_CACHE_SIZE
+        # Which images of each step the server sends, e.g. "misclassified:4" (see parse_image_selection)
+        self.image_batch_size, self.image_selection, self.selection_class = parse_image_selection(
+            os.getenv('DASHBOARD_IMAGE_SELECTION', '')
+        )
+        
+        # latency_ms is measured on the server's clock, using the offset from pings
+        self.clock = ClockSync()
+        self.last_image_step = 0
+        self.bytes_received = 0  # Serialized stream messages, before image references are resolved
     
-    def connect(self):
-        """Establish connection to server"""
-        try:
-            self.channel = grpc.insecure_channel(self.server_address)
-            self.training_stub = training_service_pb2_grpc.TrainingDashboardStub(self.channel)
-            self.health_stub = health_check_pb2_grpc.HealthCheckStub(self.channel)
-            
-            # Send initial ping
-            response = self.health_stub.Ping(
-                health_check_pb2.PingRequest(
-                    timestamp_ms=int(time.time() * 1000),
-                    client_id=self.client_id
-                )
-            )
-            
-            if response.alive:
-                self.connected = True
-                self.retry_count = 0
-                print(f"Connected to server at {self.server_address} (Client ID: {self.client_id})")
-                return True
-        except grpc.RpcError as e:
-            print(f"Connection failed: {e}")
-            return False
+    @property
+    def connected(self):
+        return self._connected
     
-    def reconnect(self):
-        """Attempt to reconnect with exponential backoff"""
-        self.retry_count += 1
-        
-        if self.retry_count > self.max_retries:
-            print("Max retries exceeded. Giving up.")
-            return False
+    @connected.setter
+    def connected(self, value):
+        changed = value != self._connected
+        self._connected = value
+        if changed and self.on_connection_change:
+            self.on_connection_change(value)
+    
+    def connect(self):
+        """Establish connection to server; False if it doesn't answer a ping"""
+        self.channel = grpc.insecure_channel(self.server_address)
+        self.training_stub = training_service_pb2_grpc.TrainingDashboardStub(self.channel)
+        self.health_stub = health_check_pb2_grpc.HealthCheckStub(self.channel)
         
-        wait_time = min(2 ** self.retry_count, 30)  # Exponential backoff, max 30s
-        print(f"Reconnection attempt {self.retry_count}/{self.max_retries} in {wait_time}s...")
-        time.sleep(wait_time)
+        # Send initial ping (send_heartbeat handles RpcError)
+        if self.send_heartbeat():
+            self.connected = True
+            self.retry_count = 0
+            print(f"Connected to server at {self.server_address} (Client ID: {self.client_id})")
+            self._start_heartbeats()
+            return True
+        print(f"Connection to {self.server_address} failed")
+        return False
+    
+    def reconnect(self, last_step=None):
+        """Retry with jittered exponential backoff until reconnected or out of attempts
         
-        try:
-            response = self.health_stub.Reconnect(
-                health_check_pb2.ReconnectRequest(
-                    last_known_step=self.last_step,
-                    client_id=self.client_id,
-                    attempt_number=self.retry_count
+        `last_step` is the calling stream's own position (default: the newest
+        step any stream received). Returns the step that stream should resume
+        after, or None when giving up.
+        """
+        while True:
+            self.retry_count += 1
+            
+            if self.retry_count > self.max_retries:
+                print("Max retries exceeded. Giving up.")
+                return None
+            
+            wait_time = backoff_delay(self.retry_count)
+            print(f"Reconnection attempt {self.retry_count}/{self.max_retries} in {wait_time:.1f}s...")
+            time.sleep(wait_time)
+            
+            try:
+                response = self.health_stub.Reconnect(
+                    health_check_pb2.ReconnectRequest(
+                        last_known_step=self.last_step if last_step is None else last_step,
+                        client_id=self.client_id,
+                        attempt_number=self.retry_count,
+                        run_id=self.run_id
+                    )
                 )
-            )
+            except grpc.RpcError:
+                continue
             
             if response.success:
                 print(f"Reconnected! Resuming from step {response.resume_step}")
                 self.connected = True
                 self.retry_count = 0
-                return True
-            else:
-                print(f"Reconnection failed: {response.message}")
-                return self.reconnect()
-        except grpc.RpcError:
-            return self.reconnect()
+                self._start_heartbeats()
+                # The server may clamp to the steps it still retains
+                return response.resume_step
+            print(f"Reconnection failed: {response.message}")
     
     def send_heartbeat(self):
-        """Send periodic heartbeat to maintain connection"""
+        """Send periodic heartbeat to maintain connection; also samples the clock offset"""
+        sent_ms = int(time.time() * 1000)
         try:
             response = self.health_stub.Ping(
                 health_check_pb2.PingRequest(
-                    timestamp_ms=int(time.time() * 1000),
+                    timestamp_ms=sent_ms,
                     client_id=self.client_id
                 )
             )
-            return response.alive
         except grpc.RpcError:
             return False
+        self.clock.observe(sent_ms, response.timestamp_ms, int(time.time() * 1000))
+        return response.alive
+    
+    def _start_heartbeats(self):
+        if self.heartbeat_thread is None:
+            self.heartbeat_thread = threading.Thread(target=self.heartbeat_loop, daemon=True)
+            self.heartbeat_thread.start()
+    
+    def heartbeat_loop(self):
+        """Ping every heartbeat_interval until closed, also while streams block this client's threads"""
+        while not self.closing.wait(self.heartbeat_interval):
+            alive = self.send_heartbeat()
+            if alive != self.connected:
+                self.connected = alive
+    
+    def disconnect(self, reason="Client closed"):
+        """End the server-side session, so the server stops this client's streams right away"""
+        if self.health_stub is None:
+            return
+        try:
+            self.health_stub.Disconnect(
+                health_check_pb2.DisconnectRequest(client_id=self.client_id, reason=reason),
+                timeout=2
+            )
+        except grpc.RpcError:
+            pass  # The lease runs out on its own
     
     def send_dashboard_status(self):
         """Send dashboard performance metrics to server"""
+        self.last_status_time = time.time()
         try:
-            self.training_stub.SendDashboardStatus(
+            ack = self.training_stub.SendDashboardStatus(
                 training_metric_pb2.DashboardMetrics(
                     fps=self.fps,
                     latency_ms=self.latency_ms,
-                    frames_rendered=len(self.frame_times)
+                    frames_rendered=len(self.frame_times),
+                    client_id=self.client_id
                 )
             )
+            if ack.adaptation_level != self.adaptation_level:
+                print(f"Server adaptation level: {ack.adaptation_level} ({ack.adaptation_name})")
+            self.adaptation_level = ack.adaptation_level
         except grpc.RpcError as e:
             print(f"Failed to send status: {e}")
     
     def stream_metrics(self, callback):
         """Stream training metrics with automatic reconnection"""
-        request = training_service_pb2.MetricsRequest(update_interval=100)
-        
+        resume_step = self.last_step  # This stream's own position; the others may be ahead or behind
         while True:
+            # Rebuilt on every (re)connect so the server replays what was missed
+            request = training_service_pb2.MetricsRequest(
+                update_interval=100,
+                start_step=resume_step,
+                run_id=self.run_id,
+                client_id=self.client_id
+            )
             try:
                 for metrics in self.training_stub.StreamMetrics(request):
-                    self.last_step = metrics.step
+                    resume_step = self.last_step = metrics.step
+                    self.latency_ms = self.clock.latency_ms(metrics.timestamp_ms)
+                    self.bytes_received += record_arrival('metrics', metrics, self.latency_ms)
                     callback(metrics)
-                    
-                    # Calculate latency
-                    current_time = int(time.time() * 1000)
-                    self.latency_ms = current_time - metrics.timestamp_ms
             
             except grpc.RpcError as e:
                 print(f"Stream interrupted: {e}")
                 self.connected = False
                 
-                if not self.reconnect():
+                resume_step = self.reconnect(resume_step)
+                if resume_step is None:
+                    break
+    
+    def stream_metrics_batches(self, callback, flush_interval_ms=100, max_batch_steps=256):
+        """Stream every step's metrics as MetricsBatch messages, with automatic reconnection
+        
+        Unlike stream_metrics, a fast trainer costs one message per flush
+        interval rather than one per step.
+        """
+        resume_step = self.last_step
+        while True:
+            request = training_service_pb2.MetricsRequest(
+                start_step=resume_step,
+                run_id=self.run_id,
+                flush_interval_ms=flush_interval_ms,
+                max_batch_steps=max_batch_steps,
+                client_id=self.client_id
+            )
+            try:
+                for batch in self.training_stub.StreamMetricsBatches(request):
+                    if not batch.step:
+                        continue
+                    resume_step = self.last_step = batch.step[-1]
+                    self.latency_ms = self.clock.latency_ms(batch.timestamp_ms[-1])
+                    self.bytes_received += record_arrival('metrics_batch', batch, self.latency_ms)
+                    callback(batch)
+            
+            except grpc.RpcError as e:
+                print(f"Stream interrupted: {e}")
+                self.connected = False
+                
+                resume_step = self.reconnect(resume_step)
+                if resume_step is None:
                     break
     
+    def stream_class_stats(self, callback, update_interval_ms=500):
+        """Stream per-class stats with automatic reconnection; callback gets a ClassStatsView"""
+        while True:
+            view = ClassStatsView()
+            request = training_service_pb2.ClassStatsRequest(
+                run_id=self.run_id,
+                update_interval_ms=update_interval_ms,
+                client_id=self.client_id
+            )
+            try:
+                for update in self.training_stub.StreamClassStats(request):
+                    self.bytes_received += record_arrival(
+                        'class_stats', update, self.clock.latency_ms(update.timestamp_ms) if update.step else 0
+                    )
+                    callback(view.apply(update))
+            
+            except grpc.RpcError as e:
+                print(f"Stream interrupted: {e}")
+                self.connected = False
+                
+                if self.reconnect() is None:
+                    break
+    
+    def _finish_frame(self, frame_start):
+        """Cap FPS and update frame statistics after a frame was rendered"""
+        # Calculate frame time
+        frame_time = time.time() - frame_start
+        FRAME_SECONDS.observe(frame_time)
+        
+        # Cap FPS by sleeping if frame processed too quickly
+        if frame_time < self.min_frame_time:
+            time.sleep(self.min_frame_time - frame_time)
+            frame_time = self.min_frame_time
+        
+        # Track frame times for FPS calculation
+        self.frame_times.append(frame_time)
+        if len(self.frame_times) > 60:
+            self.frame_times.pop(0)
+        
+        # Calculate FPS (capped at target)
+        avg_frame_time = sum(self.frame_times) / len(self.frame_times)
+        self.fps = min(1.0 / avg_frame_time if avg_frame_time > 0 else 0, self.target_fps)
+        
+        # Send status every 30 frames, and at least once per status interval
+        if len(self.frame_times) % 30 == 0 or time.time() - self.last_status_time >= self.status_interval:
+            self.send_dashboard_status()
+    
     def stream_images(self, callback):
         """Stream image batches with automatic reconnection and FPS cap"""
-        request = training_service_pb2.ImageBatchRequest(
-            batch_size=16,
-            start_step=self.last_step
-        )
-        
+        resume_step = self.last_step
         while True:
+            images = ImageStore(self.image_cache_size)
+            request = training_service_pb2.ImageBatchRequest(
+                batch_size=self.image_batch_size,
+                start_step=resume_step,
+                client_id=self.client_id,
+                run_id=self.run_id,
+                image_cache_size=images.capacity,
+                selection=self.image_selection,
+                selection_class=self.selection_class
+            )
             try:
                 for batch in self.training_stub.StreamImages(request):
                     frame_start = time.time()
                     
-                    self.last_step = batch.step
-                    callback(batch)
-                    
-                    # Calculate frame time
-                    frame_time = time.time() - frame_start
+                    resume_step = self.last_step = batch.step
+                    self.latency_ms = self.clock.latency_ms(batch.timestamp_ms)
+                    self.bytes_received += record_arrival('images', batch, self.latency_ms)
+                    self.last_image_step = count_skipped_frames(self.last_image_step, batch.step)
+                    callback(images.resolve(batch))
                     
-                    # Cap FPS by sleeping if frame processed too quickly
-                    if frame_time < self.min_frame_time:
-                        time.sleep(self.min_frame_time - frame_time)
-                        frame_time = self.min_frame_time
+                    self._finish_frame(frame_start)
+            
+            except grpc.RpcError as e:
+                print(f"Stream interrupted: {e}")
+                self.connected = False
+                
+                resume_step = self.reconnect(resume_step)
+                if resume_step is None:
+                    break
+    
+    def stream_live(self, metrics_callback, images_callback, window=2):
+        """Receive metrics and images over one bidi stream with credit-based flow control
+        
+        Each update is acked after its callbacks (and the FPS cap) have run, so
+        the server never has more than `window` updates queued for this client.
+        """
+        resume_step = self.last_step
+        while True:
+            acks = queue.Queue()
+            images = ImageStore(self.image_cache_size)
+            
+            def ack_stream():
+                # Opening message sets where to resume and the credit window
+                acks.put(training_service_pb2.DashboardResponse(
+                    ready=True,
+                    last_received_step=resume_step,
+                    status="READY",
+                    window=window,
+                    client_id=self.client_id,
+                    run_id=self.run_id,
+                    image_cache_size=images.capacity,
+                    batch_size=self.image_batch_size,
+                    selection=self.image_selection,
+                    selection_class=self.selection_class
+                ))
+                while True:
+                    ack = acks.get()
+                    if ack is None:
+                        return
+                    yield ack
+            
+            try:
+                for update in self.training_stub.LiveTrainingStream(ack_stream()):
+                    resume_step = self.last_step = update.step
                     
-                    # Track frame times for FPS calculation
-                    self.frame_times.append(frame_time)
-                    if len(self.frame_times) > 60:
-                        self.frame_times.pop(0)
+                    if update.HasField('metrics'):
+                        self.latency_ms = self.clock.latency_ms(update.metrics.timestamp_ms)
+                        self.bytes_received += record_arrival('live', update, self.latency_ms)
+                        metrics_callback(update.metrics)
                     
-                    # Calculate FPS (capped at target)
-                    avg_frame_time = sum(self.frame_times) / len(self.frame_times)
-                    self.fps = min(1.0 / avg_frame_time if avg_frame_time > 0 else 0, self.target_fps)
+                    if update.HasField('batch'):
+                        frame_start = time.time()
+                        self.last_image_step = count_skipped_frames(self.last_image_step, update.step)
+                        images_callback(images.resolve(update.batch))
+                        self._finish_frame(frame_start)
                     
-                    # Send status every 30 frames
-                    if len(self.frame_times) % 30 == 0:
-                        self.send_dashboard_status()
+                    acks.put(training_service_pb2.DashboardResponse(
+                        ready=True,
+                        last_received_step=update.step,
+                        status="OK"
+                    ))
             
             except grpc.RpcError as e:
                 print(f"Stream interrupted: {e}")
                 self.connected = False
                 
-                if not self.reconnect():
+                resume_step = self.reconnect(resume_step)
+                if resume_step is None:
                     break
+            finally:
+                acks.put(None)
     
     def close(self):
         """Close the connection"""
+        self.closing.set()
         if self.channel:
+            self.disconnect()
             self.channel.close()
         self.connected = False
     
@@ -205,7 +581,8 @@ class DashboardClient:
         try:
             response = self.training_stub.StartTraining(
                 training_service_pb2.TrainingControlRequest(
-                    client_id=self.client_id
+                    client_id=self.client_id,
+                    run_id=self.run_id
                 )
             )
             print(f"Start training response: {response.message}")
@@ -220,7 +597,8 @@ class DashboardClient:
         try:
             response = self.training_stub.StopTraining(
                 training_service_pb2.TrainingControlRequest(
-                    client_id=self.client_id
+                    client_id=self.client_id,
+                    run_id=self.run_id
                 )
             )
             print(f"Stop training response: {response.message}")
@@ -229,6 +607,38 @@ class DashboardClient:
             print(f"Failed to stop training: {e}")
             # Fallback: return True anyway
             return True
+    
+    def list_runs(self):
+        """Runs hosted by the server, as RunInfo messages"""
+        return list(self.training_stub.ListRuns(
+            training_service_pb2.ListRunsRequest(client_id=self.client_id)
+        ).runs)
+    
+    def query_metrics(self, from_step=0, to_step=0, stride=1, include_predictions=False):
+        """Range read of the recorded run as NumPy columns, following pagination
+        
+        Returns {'step', 'loss', 'accuracy', 'timestamp_ms'} and, with
+        include_predictions, 'predictions' holding per-image columns plus
+        'class_names'.
+        """
+        pages = []
+        
+        while True:
+            page = self.training_stub.QueryMetrics(
+                training_service_pb2.MetricsQuery(
+                    from_step=from_step,
+                    to_step=to_step,
+                    stride=stride,
+                    include_predictions=include_predictions,
+                    run_id=self.run_id
+                )
+            )
+            pages.append(page)
+            if not page.next_step:
+                break
+            from_step = page.next_step
+        
+        return columns_from_pages(pages, include_predictions)
 
 
 # Example usage
@@ -0,0 +1,51 @@
+# ============================================
+# gunicorn.conf.py
+# Multi-worker web dashboard with one shared upstream:
+#   gunicorn --config client/gunicorn.conf.py client.web_dashboard:app
+#
+# The master starts `web_dashboard.py --upstream`, the only process that
+# talks gRPC to the training server. Every worker follows it over a Unix
+# socket (DASHBOARD_FEED_SOCKET) and serves a read-only replica.
+# ============================================
+
+import multiprocessing
+import subprocess
+import tempfile
+import secrets
+import shutil
+import sys
+import os
+
+bind = os.getenv('DASHBOARD_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = 32  # Each open /api/stream tab holds one mostly idle thread
+timeout = 120
+
+# Only the upstream and the workers of this master can connect to the socket:
+# it sits in a fresh 0700 directory and both ends share a random authkey
+socket_dir = None
+if 'DASHBOARD_FEED_SOCKET' not in os.environ:
+    socket_dir = tempfile.mkdtemp(prefix='dashboard-')
+    os.environ['DASHBOARD_FEED_SOCKET'] = os.path.join(socket_dir, 'upstream.sock')
+os.environ.setdefault('DASHBOARD_FEED_AUTHKEY', secrets.token_hex(16))
+
+upstream = None
+
+
+def on_starting(server):
+    global upstream
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web_dashboard.py')
+    upstream = subprocess.Popen([sys.executable, script, '--upstream'])
+
+
+def post_worker_init(worker):
+    from client import web_dashboard
+    web_dashboard.follow_upstream()
+
+
+def on_exit(server):
+    if upstream is not None:
+        upstream.terminate()
+        upstream.wait(timeout=5)
+    if socket_dir is not None:
+        shutil.rmtree(socket_dir, ignore_errors=True)
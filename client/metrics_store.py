@@ -0,0 +1,276 @@
+import threading
+import numpy as np
+
+
+class ColumnRing:
+    """Fixed-capacity ring buffer of NumPy columns ordered by an increasing 'step' column
+
+    Appends are O(1); once full the oldest rows are overwritten. Because steps
+    only increase, range lookups are binary searches.
+    """
+
+    def __init__(self, fields, capacity):
+        self.fields = fields
+        self.capacity = capacity
+        self.columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in fields}
+        self.count = 0  # Rows ever appended since the last clear
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def _physical(self, logical):
+        """Array index of the logical position (0 = oldest retained row)"""
+        return (self.count - len(self) + logical) % self.capacity
+
+    def _step_at(self, logical):
+        return int(self.columns['step'][self._physical(logical)])
+
+    def first_step(self):
+        with self.lock:
+            return self._step_at(0) if self.count else 0
+
+    def last_step(self):
+        with self.lock:
+            return self._step_at(len(self) - 1) if self.count else 0
+
+    def append_row(self, values):
+        """Add one row (values in field order); a step that goes backwards restarts the ring"""
+        with self.lock:
+            if self.count and values[0] <= self._step_at(len(self) - 1):
+                self.count = 0
+
+            i = self.count % self.capacity
+            for (name, _), value in zip(self.fields, values):
+                self.columns[name][i] = value
+            self.count += 1
+
+    def clear(self):
+        with self.lock:
+            self.count = 0
+
+    def load(self, columns):
+        """Replace the contents with rows in step order (as returned by tail()), keeping the newest that fit"""
+        with self.lock:
+            n = min(len(columns['step']), self.capacity)
+            for name, column in self.columns.items():
+                column[:n] = columns[name][len(columns[name]) - n:]
+            self.count = n
+
+    def _first_after(self, step):
+        """Logical index of the first retained row with a step greater than `step`"""
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._step_at(mid) <= step:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _gather(self, start, stop):
+        """Columns for logical range [start, stop) as arrays in step order"""
+        indices = (self.count - len(self) + np.arange(start, stop)) % self.capacity
+        return {name: column[indices] for name, column in self.columns.items()}
+
+    def since(self, step, limit=None):
+        """Rows with step > `step`, oldest first, at most `limit`; also whether more remain"""
+        with self.lock:
+            start = self._first_after(step)
+            stop = len(self) if limit is None else min(len(self), start + limit)
+            return self._gather(start, stop), stop < len(self)
+
+    def _range(self, from_step, to_step):
+        start = 0 if from_step is None else self._first_after(from_step - 1)
+        stop = len(self) if to_step is None else self._first_after(to_step)
+        return start, max(start, stop)
+
+    def count_between(self, from_step=None, to_step=None):
+        """Number of rows with from_step <= step <= to_step (None = unbounded)"""
+        with self.lock:
+            start, stop = self._range(from_step, to_step)
+            return stop - start
+
+    def between(self, from_step=None, to_step=None):
+        """Rows with from_step <= step <= to_step (None = unbounded)"""
+        with self.lock:
+            return self._gather(*self._range(from_step, to_step))
+
+    def tail(self, n):
+        """The newest `n` rows"""
+        with self.lock:
+            return self._gather(max(0, len(self) - n), len(self))
+
+
+class MetricsHistory(ColumnRing):
+    """Raw training metrics, 24 bytes per point"""
+
+    FIELDS = (
+        ('step', np.int64),
+        ('loss', np.float32),
+        ('accuracy', np.float32),
+        ('timestamp', np.int64),
+    )
+
+    def __init__(self, capacity=1_000_000):
+        super().__init__(self.FIELDS, capacity)
+
+    def append(self, step, loss, accuracy, timestamp):
+        self.append_row((step, loss, accuracy, timestamp))
+
+
+class MetricsPyramid:
+    """Min/max downsampling levels over a MetricsHistory, updated as points arrive
+
+    Level k holds one bucket per factor**k raw points with the min and max of
+    loss and accuracy, so spikes survive any amount of downsampling. Coarser
+    levels keep fewer rows but span far more steps, so history that has
+    already left the raw ring is still available at a lower resolution.
+    """
+
+    BUCKET_FIELDS = (
+        ('step', np.int64),  # First step in the bucket
+        ('step_last', np.int64),
+        ('loss_min', np.float32),
+        ('loss_max', np.float32),
+        ('accuracy_min', np.float32),
+        ('accuracy_max', np.float32),
+    )
+
+    def __init__(self, history, factor=8, num_levels=6, min_capacity=4096):
+        self.history = history
+        self.factor = factor
+        self.levels = [
+            ColumnRing(self.BUCKET_FIELDS, max(min_capacity, history.capacity // factor ** k))
+            for k in range(1, num_levels + 1)
+        ]
+        # Bucket still filling at each level: [step, step_last, loss_min, loss_max, acc_min, acc_max, count]
+        self.pending = [None] * num_levels
+        self.run_first_step = 0
+        self.lock = threading.Lock()
+
+    def append(self, step, loss, accuracy, timestamp):
+        """Add a raw point and roll it up into every level"""
+        with self.lock:
+            if len(self.history) and step <= self.history.last_step():
+                # Run restarted: drop every level along with the raw ring
+                for level in self.levels:
+                    level.clear()
+                self.pending = [None] * len(self.levels)
+            if not len(self.history):
+                self.run_first_step = step
+
+            self.history.append(step, loss, accuracy, timestamp)
+            self._feed(0, (step, step, loss, loss, accuracy, accuracy))
+
+    def export(self):
+        """Copy of the raw points and every level, for load() in another process"""
+        with self.lock:
+            return {
+                'history': self.history.tail(len(self.history)),
+                'levels': [level.tail(len(level)) for level in self.levels],
+                'pending': [None if pending is None else list(pending) for pending in self.pending],
+                'run_first_step': self.run_first_step
+            }
+
+    def load(self, state):
+        """Replace everything with an export(); far cheaper than appending the points again"""
+        with self.lock:
+            self.history.load(state['history'])
+            for level, columns in zip(self.levels, state['levels']):
+                level.load(columns)
+            self.pending = [None if pending is None else list(pending) for pending in state['pending']]
+            self.run_first_step = state['run_first_step']
+
+    def _feed(self, k, bucket):
+        pending = self.pending[k]
+        if pending is None:
+            pending = self.pending[k] = list(bucket) + [0]
+        else:
+            pending[1] = bucket[1]
+            pending[2] = min(pending[2], bucket[2])
+            pending[3] = max(pending[3], bucket[3])
+            pending[4] = min(pending[4], bucket[4])
+            pending[5] = max(pending[5], bucket[5])
+        pending[6] += 1
+
+        if pending[6] == self.factor:
+            completed = tuple(pending[:6])
+            self.levels[k].append_row(completed)
+            self.pending[k] = None
+            if k + 1 < len(self.levels):
+                self._feed(k + 1, completed)
+
+    def query(self, from_step=None, to_step=None, max_points=1000):
+        """Series for [from_step, to_step] from the finest level that fits in max_points
+
+        A level qualifies when it still covers from_step and its points in the
+        range fit the budget (buckets cost two points, min and max). If none
+        does, the coarsest level is used.
+        """
+        with self.lock:
+            start_step = self.run_first_step if from_step is None else max(from_step, self.run_first_step)
+            candidates = [(0, self.history)] + [(k + 1, level) for k, level in enumerate(self.levels)]
+
+            def bucket_from(k):
+                # Include the bucket that straddles start_step
+                return start_step - (self.factor ** k - 1)
+
+            k, level = candidates[-1]
+            for candidate_k, candidate in candidates:
+                covers = len(candidate) == 0 or candidate.first_step() <= start_step
+                points = candidate.count_between(bucket_from(candidate_k), to_step) * (1 if candidate_k == 0 else 2)
+                if covers and points <= max_points:
+                    k, level = candidate_k, candidate
+                    break
+
+            if k == 0:
+                result = columns_to_json(level.between(start_step, to_step))
+                del result['timestamp']
+            else:
+                result = buckets_to_series(level.between(bucket_from(k), to_step), self.pending[k - 1], to_step)
+
+            result['level'] = k
+            result['bucket_size'] = self.factor ** k
+            return result
+
+
+def columns_to_json(columns):
+    """Plain lists for JSON; float32 values are rounded so they don't print as 0.10000000149"""
+    return {
+        'step': columns['step'].tolist(),
+        'loss': columns['loss'].astype(np.float64).round(6).tolist(),
+        'accuracy': columns['accuracy'].astype(np.float64).round(6).tolist(),
+        'timestamp': columns['timestamp'].tolist(),
+    }
+
+
+def buckets_to_series(columns, pending=None, to_step=None):
+    """Flatten min/max buckets into a drawable series: each bucket becomes a
+    vertical min->max segment at its first step, plus the still-filling bucket
+    """
+    steps = columns['step']
+    loss = (columns['loss_min'], columns['loss_max'])
+    accuracy = (columns['accuracy_min'], columns['accuracy_max'])
+    if pending is not None and (to_step is None or pending[0] <= to_step):
+        steps = np.append(steps, pending[0])
+        loss = (np.append(loss[0], pending[2]), np.append(loss[1], pending[3]))
+        accuracy = (np.append(accuracy[0], pending[4]), np.append(accuracy[1], pending[5]))
+
+    def interleave(pair):
+        return np.stack(pair, axis=1).reshape(-1).astype(np.float64).round(6).tolist()
+
+    return {
+        'step': np.repeat(steps, 2).tolist(),
+        'loss': interleave(loss),
+        'accuracy': interleave(accuracy),
+    }
+
+
+def columns_to_points(columns):
+    """List of per-point dicts, the original /api/metrics format"""
+    data = columns_to_json(columns)
+    return [
+        {'step': step, 'loss': loss, 'accuracy': accuracy, 'timestamp': timestamp}
+        for step, loss, accuracy, timestamp in zip(data['step'], data['loss'], data['accuracy'], data['timestamp'])
+    ]
@@ -0,0 +1,241 @@
+import collections
+import itertools
+import threading
+import socket
+import stat
+import time
+import os
+from multiprocessing.connection import Listener, Client, AuthenticationError
+
+
+# Messages a worker may fall behind by before it is dropped; it then reconnects and replays
+FEED_QUEUE_SIZE = 10000
+
+# How often a worker retries a feed that is not up (yet)
+FEED_RETRY_S = 1.0
+
+
+class _Outbox:
+    """Bounded queue of messages for one worker, drained by its sender thread"""
+
+    def __init__(self, size):
+        self.size = size
+        self.messages = collections.deque()
+        self.condition = threading.Condition()
+        self.closed = False
+
+    def put(self, message):
+        """Queue a message; False if the outbox is closed or full"""
+        with self.condition:
+            if self.closed or len(self.messages) >= self.size:
+                return False
+            self.messages.append(message)
+            self.condition.notify()
+            return True
+
+    def get(self):
+        """Next message, or None once closed"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.messages or self.closed)
+            return None if self.closed else self.messages.popleft()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+
+def _private_socket_path(path):
+    """Make sure only this user can reach `path`: its directory is created
+    with mode 0700, or must already be owned by us and closed to others
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if info.st_uid != os.getuid() or stat.S_IMODE(info.st_mode) & 0o077:
+        raise PermissionError(f"{directory} must be private to this user (mode 0700) to hold the feed socket")
+
+
+def _shutdown(conn):
+    """Wake whichever thread is blocked on a connection, without closing its descriptor"""
+    try:
+        with socket.socket(fileno=os.dup(conn.fileno())) as sock:
+            sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # Already closed
+
+
+class FeedServer:
+    """Shares one process's dashboard state with web workers over a Unix socket
+
+    A worker that connects first gets replay(), the state as it is now, then
+    every message passed to broadcast(). `lock` is held around both, so a
+    publisher that changes the state and broadcasts the change under the
+    same lock can't have it both in a replay and after it. Each worker has
+    its own bounded outbox and sender thread: a stalled worker is dropped,
+    and reconnects for a fresh replay, instead of holding up the others.
+    Workers can also send ('call', id, name); handle_call(name) runs here
+    and its result goes back as ('result', id, ok, value).
+
+    Messages are pickles, so both ends need the same `authkey` and the
+    socket lives in a directory only this user can enter.
+    """
+
+    def __init__(self, path, replay, handle_call, authkey, lock=None, queue_size=FEED_QUEUE_SIZE):
+        if not authkey:
+            raise ValueError("The feed needs an authkey")
+        _private_socket_path(path)
+        if os.path.exists(path):
+            os.unlink(path)  # Left behind by a previous run
+        self.listener = Listener(path, family='AF_UNIX', authkey=authkey)
+        os.chmod(path, 0o600)
+        self.replay = replay
+        self.handle_call = handle_call
+        self.lock = lock or threading.RLock()
+        self.queue_size = queue_size
+        self.outboxes = {}  # Connection -> _Outbox
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def broadcast(self, message):
+        """Send a message to every connected worker"""
+        with self.lock:
+            for conn, outbox in list(self.outboxes.items()):
+                if not outbox.put(message):
+                    del self.outboxes[conn]
+                    outbox.close()
+                    _shutdown(conn)
+
+    def _accept(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except AuthenticationError:
+                continue
+            except OSError:
+                return  # Listener closed
+
+            outbox = _Outbox(self.queue_size)
+            with self.lock:
+                outbox.put(('replay', self.replay()))
+                self.outboxes[conn] = outbox
+            threading.Thread(target=self._serve, args=(conn, outbox), daemon=True).start()
+
+    def _send(self, conn, outbox):
+        while True:
+            message = outbox.get()
+            if message is None:
+                return
+            try:
+                conn.send(message)
+            except OSError:
+                _shutdown(conn)
+                return
+
+    def _serve(self, conn, outbox):
+        """Answer a worker's calls until it goes away; the only thread that closes `conn`"""
+        sender = threading.Thread(target=self._send, args=(conn, outbox), daemon=True)
+        sender.start()
+        try:
+            while True:
+                _, call_id, name = conn.recv()
+                try:
+                    reply = ('result', call_id, True, self.handle_call(name))
+                except Exception as e:
+                    reply = ('result', call_id, False, str(e))
+                if not outbox.put(reply):
+                    break
+        except (EOFError, OSError):
+            pass  # Worker exited, or was dropped by broadcast()
+        finally:
+            with self.lock:
+                self.outboxes.pop(conn, None)
+            outbox.close()
+            _shutdown(conn)
+            sender.join()
+            conn.close()
+
+    def close(self):
+        self.listener.close()
+
+
+class FeedReader:
+    """Worker side of a FeedServer: stays connected, reconnecting as needed,
+    and hands every message but call results to apply()
+    """
+
+    def __init__(self, path, apply, authkey, retry_s=FEED_RETRY_S):
+        if not authkey:
+            raise ValueError("The feed needs an authkey")
+        self.path = path
+        self.apply = apply
+        self.authkey = authkey
+        self.retry_s = retry_s
+        self.conn = None
+        self.lock = threading.Lock()
+        self.call_ids = itertools.count()
+        self.calls = {}  # call id -> [Event, (ok, value)]
+        threading.Thread(target=self._run, daemon=True).start()
+
+    @property
+    def connected(self):
+        return self.conn is not None
+
+    def _run(self):
+        while True:
+            try:
+                conn = Client(self.path, family='AF_UNIX', authkey=self.authkey)
+            except (OSError, AuthenticationError):
+                time.sleep(self.retry_s)
+                continue
+
+            with self.lock:
+                self.conn = conn
+            try:
+                while True:
+                    message = conn.recv()
+                    if message[0] == 'result':
+                        self._resolve(message[1], message[2:])
+                    else:
+                        self.apply(message)
+            except (EOFError, OSError):
+                print("Lost the shared upstream, reconnecting")
+            finally:
+                with self.lock:
+                    self.conn = None
+                    calls = list(self.calls)
+                for call_id in calls:
+                    self._resolve(call_id, (True, None))
+                conn.close()
+            time.sleep(self.retry_s)
+
+    def _resolve(self, call_id, result):
+        with self.lock:
+            pending = self.calls.pop(call_id, None)
+        if pending is not None:
+            pending[1] = result
+            pending[0].set()
+
+    def call(self, name, timeout=None):
+        """Run handle_call(name) in the feed's process; None if the feed can't be reached
+
+        Raises RuntimeError with the message of an exception raised there.
+        """
+        with self.lock:
+            if self.conn is None:
+                return None
+            call_id = next(self.call_ids)
+            pending = self.calls[call_id] = [threading.Event(), None]
+            try:
+                self.conn.send(('call', call_id, name))
+            except OSError:
+                del self.calls[call_id]
+                return None
+
+        if not pending[0].wait(timeout):
+            with self.lock:
+                self.calls.pop(call_id, None)
+            raise TimeoutError(f"The shared upstream did not answer {name} in time")
+        ok, value = pending[1]
+        if not ok:
+            raise RuntimeError(value)
+        return value
@@ -0,0 +1,96 @@
+import threading
+import json
+import gzip
+import uuid
+
+
+# Versions restart with the process, so ETags also carry a per-process id
+BOOT_ID = uuid.uuid4().hex[:8]
+
+
+class Snapshot:
+    """Immutable, pre-encoded payload of one dashboard channel"""
+
+    __slots__ = ('channel', 'version', 'json', 'gzip', 'etag', 'event')
+
+    def __init__(self, channel, version, payload):
+        self.channel = channel
+        self.version = version
+        self.json = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        self.gzip = gzip.compress(self.json, compresslevel=5)
+        self.etag = f'{BOOT_ID}-{channel}-{version}'
+        # Ready-made Server-Sent Events frame
+        self.event = b'event: ' + channel.encode('ascii') + b'\ndata: ' + self.json + b'\n\n'
+
+
+class SnapshotStore:
+    """Latest snapshot per channel, swapped atomically as callbacks publish
+
+    Encoding happens once per update in publish(); readers only hand out the
+    bytes of whatever snapshot is current, and can block until a channel
+    moves past a version they have already seen. Snapshots published in
+    another process can be installed as they are with put().
+    """
+
+    def __init__(self, channels=('status', 'metrics', 'images'), initial=None):
+        initial = initial or {}
+        self.snapshots = {
+            channel: Snapshot(channel, 0, initial.get(channel)) for channel in channels
+        }
+        self.condition = threading.Condition()
+        self.publish_lock = threading.Lock()
+        self.listeners = []  # Called with every published snapshot, in version order
+
+    def publish(self, channel, payload):
+        """Encode a new payload and make it the current snapshot"""
+        # Publishers queue on their own lock so readers never wait on encoding
+        with self.publish_lock:
+            snapshot = Snapshot(channel, self.snapshots[channel].version + 1, payload)
+            with self.condition:
+                self.snapshots[channel] = snapshot
+                self.condition.notify_all()
+            for listener in self.listeners:
+                listener(snapshot)
+        return snapshot
+
+    def put(self, snapshot, replace=False):
+        """Install an already encoded snapshot unless the channel is past its
+        version; with replace, install it regardless (the publisher restarted)
+        """
+        with self.condition:
+            if not replace and snapshot.version <= self.snapshots[snapshot.channel].version:
+                return False
+            self.snapshots[snapshot.channel] = snapshot
+            self.condition.notify_all()
+            return True
+
+    def all(self):
+        """Current snapshot of every channel"""
+        with self.condition:
+            return list(self.snapshots.values())
+
+    def get(self, channel):
+        """Current snapshot of a channel"""
+        return self.snapshots[channel]
+
+    def versions(self):
+        """Current version of every channel"""
+        with self.condition:
+            return {channel: snapshot.version for channel, snapshot in self.snapshots.items()}
+
+    def wait_for(self, channel, since_version, timeout=None):
+        """Block until a channel is newer than `since_version` (long-poll)"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.snapshots[channel].version > since_version, timeout)
+            return self.snapshots[channel]
+
+    def wait_any(self, seen, timeout=None):
+        """Block until any channel differs from `seen`; returns the changed snapshots"""
+        with self.condition:
+            def changed():
+                return [
+                    snapshot for channel, snapshot in self.snapshots.items()
+                    if seen.get(channel) != snapshot.version
+                ]
+            self.condition.wait_for(changed, timeout)
+            return changed()
@@ -1,27 +1,42 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request, make_response, abort, g
 from flask_cors import CORS
 import threading
-import base64
+import asyncio
+import collections
+import hashlib
+import getpass
+import tempfile
+import json
+import time
 import sys
 import os
 
 # Handle both script and PyInstaller execution
 if getattr(sys, 'frozen', False):
     base_path = sys._MEIPASS
-    from dashboard_client import DashboardClient
+    from async_dashboard_client import AsyncDashboardClient
+    from dashboard_client import backoff_delay
+    from snapshot_store import SnapshotStore
+    from snapshot_feed import FeedServer, FeedReader
+    from metrics_store import MetricsHistory, MetricsPyramid, columns_to_json, columns_to_points
 else:
     base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, base_path)
     sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-    from dashboard_client import DashboardClient
+    from async_dashboard_client import AsyncDashboardClient
+    from dashboard_client import backoff_delay
+    from snapshot_store import SnapshotStore
+    from snapshot_feed import FeedServer, FeedReader
+    from metrics_store import MetricsHistory, MetricsPyramid, columns_to_json, columns_to_points
+from common import telemetry
 
 # Set template folder
 template_dir = os.path.join(base_path, 'templates')
 app = Flask(__name__, template_folder=template_dir)
 CORS(app)
 
-# Global state
+# Global state, only touched by the gRPC callbacks; handlers serve `snapshots`
 dashboard_state = {
-    'metrics': [],
     'images': [],
     'fps': 0,
     'latency_ms': 0,
@@ -30,126 +45,465 @@ dashboard_state = {
 }
 
 client = None
+# Event loop thread that runs every gRPC call of `client`
+client_loop = None
+CLIENT_CALL_TIMEOUT_S = 10
+
+# Multi-worker serving (see gunicorn.conf.py): one process runs `client` and
+# shares its state over this socket; web workers replicate it read-only.
+# The socket's directory must be private, and both sides need the authkey
+FEED_SOCKET = os.getenv('DASHBOARD_FEED_SOCKET', os.path.join(
+    tempfile.gettempdir(), f'dashboard-{getpass.getuser()}', 'upstream.sock'
+))
+FEED_AUTHKEY = os.getenv('DASHBOARD_FEED_AUTHKEY', '').encode('ascii') or None
+feed = None  # FeedServer, in the process that runs the gRPC client for the workers
+follower = None  # FeedReader, in a web worker serving from that process
+
+# Held while state the workers replicate changes and the change is forwarded,
+# and while a new worker's replay is taken
+upstream_lock = threading.RLock()
+
+# Calls a worker can make on the gRPC client, see upstream_call()
+CONTROL_CALLS = ('start_training', 'stop_training', 'list_runs')
+
+# Full metrics history; /api/metrics without arguments still returns the last METRICS_WINDOW points
+metrics_history = MetricsHistory(int(os.getenv('DASHBOARD_METRICS_CAPACITY', 1_000_000)))
+METRICS_WINDOW = 100
+
+# Min/max downsampled levels over the history for whole-run charts
+metrics_pyramid = MetricsPyramid(metrics_history)
+
+# Most points sent at once on a ?since_step= query or a new push stream
+METRICS_PAGE_LIMIT = 1000
+
+# Encoded images by content id, served from /api/images/<content id>.<ext>
+# Repeated images keep one entry and one URL, so browsers fetch them once
+IMAGE_FILES_KEPT = 256
+image_files = collections.OrderedDict()  # content id hex -> (bytes, mime)
+image_files_lock = threading.Lock()
+
+# Image.format -> (content type, URL extension)
+# RAW_RGB pixels (TRAINER_CODEC=raw) pass through untouched and are painted on a canvas
+IMAGE_TYPES = {
+    'PNG': ('image/png', 'png'),
+    'JPEG': ('image/jpeg', 'jpg'),
+    'WEBP': ('image/webp', 'webp'),
+    'RAW_RGB': ('application/octet-stream', 'rgb'),
+}
+
+# Idle push streams send a comment this often so proxies keep them open
+PUSH_KEEPALIVE_S = 15
+
+# How long a ?since_version= request waits for a newer snapshot
+LONG_POLL_TIMEOUT_S = 25
+
+# Served on GET /metrics together with the gRPC client's counters (see dashboard_client)
+HTTP_REQUEST_SECONDS = telemetry.REGISTRY.histogram(
+    'dashboard_http_request_seconds', 'Time to produce an HTTP response (push streams: until headers)',
+    ('endpoint', 'status')
+)
+PUSH_STREAMS = telemetry.REGISTRY.gauge('dashboard_push_streams', 'Open /api/stream connections')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    HTTP_REQUEST_SECONDS.labels(request.endpoint or 'unknown', response.status_code).observe(
+        time.perf_counter() - g.request_started
+    )
+    return response
+
+@app.route('/metrics')
+def get_telemetry():
+    """Prometheus text format: HTTP, push stream, gRPC stream and clock skew metrics"""
+    return Response(telemetry.REGISTRY.render(), content_type=telemetry.CONTENT_TYPE)
+
+def status_payload():
+    """Connection and performance summary"""
+    return {
+        'connected': client.connected if client else False,
+        'fps': dashboard_state['fps'],
+        'latency_ms': dashboard_state['latency_ms'],
+        'adaptation_level': client.adaptation_level if client else 0,
+        'current_step': dashboard_state['current_step'],
+        'is_training': dashboard_state['is_training']
+    }
+
+# Pre-encoded, versioned payloads swapped in by the callbacks
+snapshots = SnapshotStore(
+    channels=('status', 'metrics', 'images', 'class_stats'),
+    initial={'status': status_payload(), 'metrics': [], 'images': []}
+)
+
+def publish_status(*args):
+    snapshots.publish('status', status_payload())
+
+def forward(message):
+    """Pass a change on to the web workers, if this process shares its upstream"""
+    if feed is not None:
+        feed.broadcast(message)
 
 def metrics_callback(metrics):
     """Handle incoming metrics"""
-    dashboard_state['metrics'].append({
-        'step': metrics.step,
-        'loss': metrics.loss,
-        'accuracy': metrics.accuracy,
-        'timestamp': metrics.timestamp_ms
-    })
-    
-    # Keep only last 100 points
-    if len(dashboard_state['metrics']) > 100:
-        dashboard_state['metrics'].pop(0)
+    point = (metrics.step, metrics.loss, metrics.accuracy, metrics.timestamp_ms)
+    with upstream_lock:
+        metrics_pyramid.append(*point)
+        forward(('metric', point))
     
     dashboard_state['current_step'] = metrics.step
+    snapshots.publish('metrics', columns_to_points(metrics_history.tail(METRICS_WINDOW)))
+    publish_status()
+
+def metrics_delta(since_step, limit=METRICS_PAGE_LIMIT):
+    """Columnar points newer than since_step
+    
+    With no since_step, or one past the newest point (the run restarted), the
+    newest `limit` points are returned instead with reset=True so the
+    caller starts over.
+    """
+    if since_step is None or since_step > metrics_history.last_step():
+        payload = columns_to_json(metrics_history.tail(limit))
+        payload['reset'] = True
+        payload['more'] = False
+    else:
+        columns, more = metrics_history.since(since_step, limit)
+        payload = columns_to_json(columns)
+        payload['reset'] = False
+        payload['more'] = more
+    
+    payload['last_step'] = payload['step'][-1] if payload['step'] else (since_step or 0)
+    return payload
+
+def class_stats_callback(view):
+    """Handle a per-class stats update (a ClassStatsView, see dashboard_client)"""
+    update = view.latest
+    accuracy = view.window_accuracy()
+    snapshots.publish('class_stats', {
+        'step': update.step,
+        'classes': view.class_names,
+        'confusion': view.confusion.tolist(),  # [ground truth][prediction], whole run
+        'window_steps': update.window_steps,
+        'window_accuracy': [None if a != a else round(float(a), 4) for a in accuracy],  # NaN: no samples
+        'window_total': list(update.window_total),
+        'confidence_correct': list(update.confidence_correct),
+        'confidence_wrong': list(update.confidence_wrong)
+    })
+
+def store_image_files(files):
+    """Keep (content id, bytes, mime) entries, dropping the least recently sent"""
+    with image_files_lock:
+        for image_id, data, mime in files:
+            image_files[image_id] = (data, mime)
+            image_files.move_to_end(image_id)
+        while len(image_files) > IMAGE_FILES_KEPT:
+            image_files.popitem(last=False)
 
 def images_callback(batch):
     """Handle incoming image batch"""
     images_data = []
+    files = []
     
     for labeled_img in batch.images:
-        # Convert bytes to base64 for web display
-        img_base64 = base64.b64encode(labeled_img.image.pixel_data).decode('utf-8')
+        # Keep the encoded bytes as-is; the index only references their URL
+        image = labeled_img.image
+        mime, ext = IMAGE_TYPES.get(image.format, ('application/octet-stream', 'bin'))
+        # Servers that predate content ids get the same hash computed here
+        image_id = (image.content_id or hashlib.blake2b(image.pixel_data, digest_size=8).digest()).hex()
+        files.append((image_id, image.pixel_data, mime))
         
         images_data.append({
-            'data': img_base64,
+            'url': f'/api/images/{image_id}.{ext}',
             'width': labeled_img.image.width,
             'height': labeled_img.image.height,
+            'format': labeled_img.image.format,
             'ground_truth': labeled_img.ground_truth,
             'prediction': labeled_img.prediction,
             'confidence': labeled_img.confidence
         })
     
+    store_image_files(files)
+    # Outside image_files_lock: replays take it under upstream_lock. Files sent twice are harmless
+    forward(('image_files', files))
+    
     dashboard_state['images'] = images_data
     dashboard_state['fps'] = client.fps
     dashboard_state['latency_ms'] = client.latency_ms
+    snapshots.publish('images', images_data)
+    publish_status()
 
 @app.route('/')
 def index():
     return render_template('dashboard.html')
 
+def conditional(response, etag):
+    """Attach a strong ETag and answer If-None-Match with 304 when it matches"""
+    response.set_etag(etag)
+    response.cache_control.no_cache = True  # Always revalidate; unchanged steps cost a 304
+    return response.make_conditional(request)
+
+def snapshot_response(channel):
+    """Serve a channel's current snapshot bytes, or long-poll with ?since_version=N"""
+    since_version = request.args.get('since_version', type=int)
+    if since_version is None:
+        snapshot = snapshots.get(channel)
+    else:
+        snapshot = snapshots.wait_for(channel, since_version, timeout=LONG_POLL_TIMEOUT_S)
+        if snapshot.version <= since_version:
+            return Response(status=204)
+    
+    use_gzip = 'gzip' in request.accept_encodings
+    response = Response(snapshot.gzip if use_gzip else snapshot.json, mimetype='application/json')
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['X-Snapshot-Version'] = str(snapshot.version)
+    return conditional(response, snapshot.etag + ('-gzip' if use_gzip else ''))
+
 @app.route('/api/status')
 def get_status():
-    return jsonify({
-        'connected': client.connected if client else False,
-        'fps': dashboard_state['fps'],
-        'latency_ms': dashboard_state['latency_ms'],
-        'current_step': dashboard_state['current_step'],
-        'is_training': dashboard_state['is_training']
-    })
+    return snapshot_response('status')
 
 @app.route('/api/metrics')
 def get_metrics():
-    return jsonify(dashboard_state['metrics'])
+    """Metrics in one of three shapes:
+    
+    - no arguments: the last METRICS_WINDOW points (snapshot)
+    - ?since_step=N[&limit=M]: only points after N, columnar (-1 for the newest page)
+    - ?from=&to=&max_points=: a range, downsampled to at most max_points (columnar)
+    """
+    if any(arg in request.args for arg in ('from', 'to', 'max_points')):
+        return jsonify(metrics_pyramid.query(
+            request.args.get('from', type=int),
+            request.args.get('to', type=int),
+            max(2, request.args.get('max_points', METRICS_PAGE_LIMIT, type=int))
+        ))
+    
+    since_step = request.args.get('since_step', type=int)
+    if since_step is None:
+        return snapshot_response('metrics')
+    
+    if since_step < 0:
+        since_step = None
+    limit = min(request.args.get('limit', METRICS_PAGE_LIMIT, type=int), METRICS_PAGE_LIMIT)
+    return jsonify(metrics_delta(since_step, limit))
+
+@app.route('/api/class-stats')
+def get_class_stats():
+    """Confusion matrix, windowed per-class accuracy and confidence histograms"""
+    return snapshot_response('class_stats')
 
 @app.route('/api/images')
 def get_images():
-    return jsonify(dashboard_state['images'])
+    """Index of the current batch: image URLs plus label, prediction and confidence"""
+    return snapshot_response('images')
+
+@app.route('/api/images/<image_id>.<ext>')
+def get_image_file(image_id, ext):
+    """Raw encoded bytes of one image"""
+    with image_files_lock:
+        entry = image_files.get(image_id)
+    if entry is None:
+        abort(404)
+    
+    data, mime = entry
+    response = make_response(data)
+    response.mimetype = mime
+    # A content-addressed URL never changes what it serves
+    response.set_etag(image_id)
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+@app.route('/api/stream')
+def stream_events():
+    """Server-Sent Events: push status, metrics and images only when they change"""
+    def generate():
+        PUSH_STREAMS.inc()
+        try:
+            seen = {}
+            metrics_step = None
+            while True:
+                changed = snapshots.wait_any(seen, timeout=PUSH_KEEPALIVE_S)
+                if not changed:
+                    yield b': keepalive\n\n'
+                    continue
+                
+                for snapshot in changed:
+                    seen[snapshot.channel] = snapshot.version
+                    if snapshot.channel != 'metrics':
+                        yield snapshot.event
+                        continue
+                    
+                    # Metrics go out as deltas: only points this stream has not sent yet
+                    delta = metrics_delta(metrics_step)
+                    metrics_step = delta['last_step']
+                    yield f"event: metrics\ndata: {json.dumps(delta, separators=(',', ':'))}\n\n".encode('utf-8')
+        finally:
+            PUSH_STREAMS.dec()  # Client went away; the generator was closed
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Don't let a reverse proxy buffer the stream
+    })
 
 @app.route('/api/control/start', methods=['POST'])
 def start_training():
     """Start training on the server"""
-    global client
     try:
-        if client and client.connected:
-            # Send start command to server
-            success = client.start_training()
-            if success:
-                dashboard_state['is_training'] = True
-                return jsonify({'success': True, 'message': 'Training started'})
-            else:
-                return jsonify({'success': False, 'message': 'Failed to start training'}), 500
-        else:
+        success = upstream_call('start_training')
+        if success is None:
             return jsonify({'success': False, 'message': 'Not connected to server'}), 503
+        elif success:
+            return jsonify({'success': True, 'message': 'Training started'})
+        else:
+            return jsonify({'success': False, 'message': 'Failed to start training'}), 500
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @app.route('/api/control/stop', methods=['POST'])
 def stop_training():
     """Stop training on the server"""
-    global client
     try:
-        if client and client.connected:
-            # Send stop command to server
-            success = client.stop_training()
-            if success:
-                dashboard_state['is_training'] = False
-                return jsonify({'success': True, 'message': 'Training stopped'})
-            else:
-                return jsonify({'success': False, 'message': 'Failed to stop training'}), 500
+        success = upstream_call('stop_training')
+        if success is None:
+            return jsonify({'success': False, 'message': 'Not connected to server'}), 503
+        elif success:
+            return jsonify({'success': True, 'message': 'Training stopped'})
         else:
+            return jsonify({'success': False, 'message': 'Failed to stop training'}), 500
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/runs')
+def list_runs():
+    """Runs hosted by the training server; this dashboard follows run_id"""
+    try:
+        runs = upstream_call('list_runs')
+        if runs is None:
             return jsonify({'success': False, 'message': 'Not connected to server'}), 503
+        return jsonify(runs)
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+def call_client(coroutine):
+    """Run a client coroutine on the client's loop from a Flask handler thread"""
+    return asyncio.run_coroutine_threadsafe(coroutine, client_loop).result(CLIENT_CALL_TIMEOUT_S)
+
+def local_call(name):
+    """Run one of CONTROL_CALLS on this process's gRPC client; None when not connected"""
+    if name not in CONTROL_CALLS:
+        raise ValueError(f"Unknown control call '{name}'")
+    if not (client and client.connected):
+        return None
+    
+    if name == 'list_runs':
+        runs = [
+            {
+                'run_id': run.run_id,
+                'is_training': run.is_training,
+                'current_step': run.current_step,
+                'max_steps': run.max_steps,
+                'loss': round(run.current_loss, 6),
+                'accuracy': round(run.current_accuracy, 6),
+                'subscribers': run.subscribers
+            }
+            for run in call_client(client.list_runs())
+        ]
+        return {'run_id': client.run_id, 'runs': runs}
+    
+    success = call_client(getattr(client, name)())
+    if success:
+        dashboard_state['is_training'] = name == 'start_training'
+        publish_status()
+    return success
+
+def upstream_call(name):
+    """Run a control call wherever the gRPC client lives: here, or in the shared upstream"""
+    if follower is not None:
+        return follower.call(name, timeout=CLIENT_CALL_TIMEOUT_S)
+    return local_call(name)
+
 def start_client():
-    """Start the gRPC client in background threads"""
-    global client
-    client = DashboardClient()
-    
-    if client.connect():
-        # Start metrics stream in separate thread
-        metrics_thread = threading.Thread(
-            target=client.stream_metrics,
-            args=(metrics_callback,),
-            daemon=True
-        )
-        metrics_thread.start()
-        
-        # Start images stream in separate thread
-        images_thread = threading.Thread(
-            target=client.stream_images,
-            args=(images_callback,),
-            daemon=True
-        )
-        images_thread.start()
+    """Run the gRPC client (live stream, heartbeats, status reports) on one background event loop"""
+    global client, client_loop
+    client = AsyncDashboardClient()
+    client.on_connection_change = publish_status
+    
+    client_loop = asyncio.new_event_loop()
+    threading.Thread(target=client_loop.run_forever, daemon=True).start()
+    asyncio.run_coroutine_threadsafe(run_client(), client_loop)
 
-if __name__ == '__main__':
-    # Start gRPC client
-    start_client()
+async def run_client():
+    """Keep the client running: run() returns once it runs out of reconnect attempts,
+    and a server that comes back after that must still be picked up
+    """
+    attempt = 0
+    while True:
+        # Metrics and images share one flow-controlled stream; class stats come on their own small one
+        await client.run(metrics_callback, images_callback, class_stats_callback=class_stats_callback)
+        attempt = min(attempt + 1, 5)
+        delay = backoff_delay(attempt)
+        print(f"Gave up on the training server, trying again in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+def upstream_replay():
+    """Everything a web worker needs to start serving; taken under upstream_lock"""
+    with image_files_lock:
+        files = [(image_id, data, mime) for image_id, (data, mime) in image_files.items()]
+    return {
+        'snapshots': snapshots.all(),
+        'metrics': metrics_pyramid.export(),
+        'image_files': files
+    }
+
+def serve_upstream(path=FEED_SOCKET, authkey=FEED_AUTHKEY):
+    """Run the one gRPC client and share its state with the web workers over `path`
     
-    # Start Flask server
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    Snapshots go out already encoded (ETags included), so every worker
+    serves the same bytes and versions; a long-poll can land on any worker.
+    """
+    global feed
+    feed = FeedServer(path, upstream_replay, local_call, authkey, lock=upstream_lock)
+    snapshots.listeners.append(lambda snapshot: forward(('snapshot', snapshot)))
+    start_client()
+
+def apply_upstream(message):
+    """Replicate one change received from the shared upstream"""
+    kind = message[0]
+    if kind == 'snapshot':
+        snapshots.put(message[1])
+    elif kind == 'metric':
+        metrics_pyramid.append(*message[1])
+    elif kind == 'image_files':
+        store_image_files(message[1])
+    elif kind == 'replay':
+        state = message[1]
+        metrics_pyramid.load(state['metrics'])
+        with image_files_lock:
+            image_files.clear()
+        store_image_files(state['image_files'])
+        # The upstream may have restarted, with versions starting over
+        for snapshot in state['snapshots']:
+            snapshots.put(snapshot, replace=True)
+
+def follow_upstream(path=FEED_SOCKET, authkey=FEED_AUTHKEY):
+    """Serve from the shared upstream at `path` instead of running a gRPC client here"""
+    global follower
+    follower = FeedReader(path, apply_upstream, authkey)
+
+if __name__ == '__main__':
+    if '--upstream' in sys.argv:
+        # Only the gRPC client, shared with the web workers started by gunicorn.conf.py
+        if FEED_AUTHKEY is None:
+            sys.exit("--upstream needs DASHBOARD_FEED_AUTHKEY, shared with the web workers")
+        serve_upstream()
+        threading.Event().wait()
+    else:
+        # Start gRPC client
+        start_client()
+        
+        # Start Flask server
+        app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
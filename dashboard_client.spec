@@ -5,7 +5,7 @@ block_cipher = None
 
 a = Analysis(
     ['client/web_dashboard.py'],
-    pathex=['.'],
+    pathex=['.'],                    # Repo root, so the shared `common` package resolves
     binaries=[],
     datas=[
         ('templates', 'templates'),   # Flask HTML templates
@@ -18,6 +18,8 @@ a = Analysis(
         'google.protobuf',
         'flask',
         'flask_cors',
+        'common',
+        'common.telemetry',          # Shared with the training server
     ],
     excludes=[
         'matplotlib',                # ✅ prevent NumPy ABI crash
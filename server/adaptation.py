@@ -0,0 +1,106 @@
+import threading
+import time
+
+
+# Degradation ladder, from full fidelity to the cheapest stream we still send.
+# min_step_gap: only send images when this many steps passed since the last send
+# max_images: images per batch
+# codec: re-encode with this codec spec (None keeps the trainer's encoding)
+# pace: send at most pace * the client's reported FPS; below 1 drains a backlog
+ADAPTATION_LEVELS = [
+    {'name': 'full', 'min_step_gap': 1, 'max_images': 16, 'codec': None, 'pace': 1.25},
+    {'name': 'skip_steps', 'min_step_gap': 4, 'max_images': 16, 'codec': None, 'pace': 0.75},
+    {'name': 'fewer_images', 'min_step_gap': 4, 'max_images': 4, 'codec': None, 'pace': 0.75},
+    {'name': 'low_quality', 'min_step_gap': 8, 'max_images': 4, 'codec': 'jpeg:40', 'pace': 0.75},
+]
+
+
+class ClientAdaptation:
+    """Per-client quality controller driven by the dashboard's latency reports
+
+    Steps one level down the ladder whenever reported latency is above the
+    target, and back up after several consecutive reports comfortably below it.
+    The level is shared by all of the client's streams; each stream paces its
+    sends with its own pacer().
+    """
+
+    def __init__(self, target_latency_ms=500, recover_reports=3, cooldown_s=1.0):
+        self.target_latency_ms = target_latency_ms
+        self.recover_reports = recover_reports
+        self.cooldown_s = cooldown_s  # Minimum time between level changes
+        self.level = 0
+        self.fps = 0.0
+        self.latency_ms = 0.0
+        self.good_reports = 0
+        self.last_change = 0.0
+        self.lock = threading.Lock()
+
+    def report(self, fps, latency_ms):
+        """Feed one SendDashboardStatus report; returns the (possibly new) level"""
+        with self.lock:
+            self.fps = fps
+            self.latency_ms = latency_ms
+            now = time.time()
+
+            if latency_ms > self.target_latency_ms:
+                self.good_reports = 0
+                if self.level < len(ADAPTATION_LEVELS) - 1 and now - self.last_change >= self.cooldown_s:
+                    self.level += 1
+                    self.last_change = now
+            elif latency_ms < self.target_latency_ms / 2:
+                self.good_reports += 1
+                if self.level > 0 and self.good_reports >= self.recover_reports:
+                    self.level -= 1
+                    self.good_reports = 0
+                    self.last_change = now
+            else:
+                self.good_reports = 0
+
+            return self.level
+
+    def pacer(self):
+        """Send pacing for one more stream of this client"""
+        return StreamPacer(self)
+
+    def current(self):
+        """Settings for the current level"""
+        return ADAPTATION_LEVELS[self.level]
+
+    def describe(self):
+        return f"level {self.level} ({self.current()['name']})"
+
+
+class StreamPacer:
+    """One stream's image send pacing under its client's adaptation level
+
+    Each stream keeps its own last send time, so a client with several image
+    streams open doesn't have them take each other's send slots.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.last_send_time = 0.0
+
+    def should_send(self, step, last_sent_step):
+        """Whether images for `step` should go out at the client's current level
+
+        Sends are also paced against the client's reported FPS: the transport
+        buffers whatever we write, so sending faster than the client renders
+        only grows its backlog.
+        """
+        with self.client.lock:
+            level = ADAPTATION_LEVELS[self.client.level]
+            fps = self.client.fps
+        if last_sent_step and step - last_sent_step < level['min_step_gap']:
+            return False
+
+        now = time.time()
+        if fps > 0 and now - self.last_send_time < 1.0 / (fps * level['pace']):
+            return False
+
+        self.last_send_time = now
+        return True
+
+    def current(self):
+        """Settings for the client's current level"""
+        return self.client.current()
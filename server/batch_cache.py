@@ -0,0 +1,51 @@
+import threading
+import collections
+
+
+class BatchCache:
+    """LRU of serialized step payloads so each step is encoded once for all streams"""
+
+    def __init__(self, build_fn, capacity=32):
+        self.build_fn = build_fn  # record -> serialized payload (bytes, or ImageBatchParts for images)
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(record):
+        """Steps restart from 0 after a reset, so the publish time is part of the key"""
+        return (record['step'], record['timestamp_ms'])
+
+    def get(self, record):
+        """Return the serialized payload for a step, building it on first request"""
+        key = self.key_for(record)
+        # Building under the lock means concurrent subscribers never encode twice
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+            self.misses += 1
+            data = self.build_fn(record)
+            self.entries[key] = data
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+            return data
+
+    def peek(self, record):
+        """Cached payload for a step, or None; never builds, so it never blocks on an encode"""
+        with self.lock:
+            data = self.entries.get(self.key_for(record))
+            if data is not None:
+                self.entries.move_to_end(self.key_for(record))
+                self.hits += 1
+            return data
+
+    def clear(self):
+        """Drop every cached step"""
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,278 @@
+import asyncio
+import threading
+import collections
+import time
+
+
+class StaleRecordError(Exception):
+    """A record's payload lives in a reused buffer and was overwritten before it was read"""
+
+
+class Subscription:
+    """A single stream's view of the broadcaster with its own buffer and cursor"""
+
+    def __init__(self, broadcaster, maxlen=8, start_step=0):
+        self.broadcaster = broadcaster
+        self.buffer = collections.deque(maxlen=maxlen)
+        self.cursor = start_step  # Last step handed to this subscriber
+        self.dropped = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def push(self, record):
+        """Queue a published step, dropping the oldest one if the buffer is full"""
+        with self.condition:
+            if self.closed or record['step'] <= self.cursor:
+                return
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append(record)
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """Wait for the next step; returns None on timeout or once closed"""
+        with self.condition:
+            while not self.buffer and not self.closed:
+                if not self.condition.wait(timeout):
+                    return None
+            if not self.buffer:
+                return None
+            record = self.buffer.popleft()
+            self.cursor = record['step']
+            return record
+
+    def get_latest(self, timeout=None):
+        """Wait for new data and return only the newest step, skipping the rest"""
+        record = self.get(timeout)
+        if record is None:
+            return None
+        with self.condition:
+            if self.buffer:
+                self.dropped += len(self.buffer)
+                record = self.buffer.pop()
+                self.buffer.clear()
+                self.cursor = record['step']
+        return record
+
+    def get_batch(self, max_count, timeout=None, linger=0.0):
+        """Wait for a step, then up to `linger` seconds more for others; returns up to
+        max_count records in order ([] on timeout or once closed)
+        """
+        with self.condition:
+            while not self.buffer and not self.closed:
+                if not self.condition.wait(timeout):
+                    return []
+            deadline = time.monotonic() + linger
+            while len(self.buffer) < max_count and not self.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            return self._pop(max_count)
+
+    def _pop(self, max_count):
+        records = []
+        while self.buffer and len(records) < max_count:
+            records.append(self.buffer.popleft())
+        if records:
+            self.cursor = records[-1]['step']
+        return records
+
+    def advance(self, step):
+        """Move the cursor to `step`, dropping anything buffered up to it (e.g. after a replay)"""
+        with self.condition:
+            self.cursor = max(self.cursor, step)
+            while self.buffer and self.buffer[0]['step'] <= self.cursor:
+                self.buffer.popleft()
+
+    def pending(self):
+        """Number of steps buffered and not yet read"""
+        with self.condition:
+            return len(self.buffer)
+
+    def close(self):
+        """Detach from the broadcaster and wake any waiting reader"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.broadcaster.unsubscribe(self)
+
+
+class LoopWaker:
+    """Sets asyncio events from publisher threads, with one loop wakeup per burst
+
+    Publishing a step wakes every async subscriber; batching those wakeups
+    into a single call_soon_threadsafe keeps the cost per step flat no matter
+    how many streams the loop serves.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.pending = set()
+        self.scheduled = False
+        self.lock = threading.Lock()
+
+    def wake(self, event):
+        with self.lock:
+            self.pending.add(event)
+            if self.scheduled:
+                return
+            self.scheduled = True
+        try:
+            self.loop.call_soon_threadsafe(self._flush)
+        except RuntimeError:
+            pass  # Loop already closed; nobody is waiting any more
+
+    def _flush(self):
+        with self.lock:
+            events, self.pending = self.pending, set()
+            self.scheduled = False
+        for event in events:
+            event.set()
+
+
+class AsyncSubscription(Subscription):
+    """Subscription read by a coroutine instead of a blocked thread"""
+
+    def __init__(self, broadcaster, waker, maxlen=8, start_step=0):
+        super().__init__(broadcaster, maxlen=maxlen, start_step=start_step)
+        self.waker = waker
+        self.event = asyncio.Event()
+
+    def push(self, record):
+        super().push(record)
+        self.waker.wake(self.event)
+
+    def close(self):
+        super().close()
+        self.waker.wake(self.event)
+
+    async def next(self, timeout=None, latest=False):
+        """Await the next step (only the newest with latest=True); None on timeout or once closed"""
+        read = self.get_latest if latest else self.get
+        # Clear before checking so a push in between still sets the event
+        self.event.clear()
+        record = read(0)
+        if record is None and not self.closed:
+            try:
+                await asyncio.wait_for(self.event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+            record = read(0)
+        return record
+
+    async def next_batch(self, max_count, timeout=None, linger=0.0):
+        """Await a step, then up to `linger` seconds more for others (see Subscription.get_batch)"""
+        self.event.clear()
+        if not self.pending() and not self.closed:
+            try:
+                await asyncio.wait_for(self.event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        deadline = time.monotonic() + linger
+        while self.pending() < max_count and not self.closed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.event.clear()
+            try:
+                await asyncio.wait_for(self.event.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        with self.condition:
+            return self._pop(max_count)
+
+
+class StepBroadcaster:
+    """Publish/subscribe hub that fans each training step out to every stream"""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.latest = None
+        self.lock = threading.Lock()
+
+    def subscribe(self, maxlen=8, start_step=0, waker=None):
+        """Register a new subscriber, seeded with the latest step if it is newer
+
+        A start_step past the latest published step comes from before a reset
+        or restart, and would hold back every new step; the subscriber starts
+        from 0 instead (its cursor says where it really starts).
+        With a LoopWaker the subscriber is an AsyncSubscription for that loop.
+        """
+        if waker is None:
+            subscription = Subscription(self, maxlen=maxlen, start_step=start_step)
+        else:
+            subscription = AsyncSubscription(self, waker, maxlen=maxlen, start_step=start_step)
+        with self.lock:
+            latest = self.latest
+            if start_step > (latest['step'] if latest is not None else 0):
+                subscription.cursor = 0
+            self.subscribers.add(subscription)
+        if latest is not None:
+            subscription.push(latest)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscriber (safe to call more than once)"""
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def publish(self, record):
+        """Hand a step record to every subscriber exactly once"""
+        with self.lock:
+            self.latest = record
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription.push(record)
+
+    def reset(self):
+        """Forget published steps so subscribers accept a restarted step counter"""
+        with self.lock:
+            self.latest = None
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            with subscription.condition:
+                subscription.buffer.clear()
+                subscription.cursor = 0
+
+    def subscriber_count(self):
+        """Number of currently attached subscribers"""
+        with self.lock:
+            return len(self.subscribers)
+
+
+class Recorder:
+    """Background thread that hands every published step to `write_fn`, in order
+
+    Used by sinks that persist steps (the step log, the columnar export) so
+    slow disk writes never hold up the trainer or the streams. idle_fn runs
+    once whenever no step has arrived for idle_s after a write, i.e. when
+    training stops, pauses or finishes.
+    """
+
+    def __init__(self, broadcaster, write_fn, close_fn=None, buffer_size=1024, idle_fn=None, idle_s=1.0):
+        self.write_fn = write_fn  # record -> None
+        self.close_fn = close_fn
+        self.idle_fn = idle_fn
+        self.idle_s = idle_s
+        self.subscription = broadcaster.subscribe(maxlen=buffer_size)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        written = False
+        while not self.subscription.closed:
+            record = self.subscription.get(timeout=self.idle_s)
+            if record is not None:
+                self.write_fn(record)
+                written = True
+            elif written and self.idle_fn:
+                self.idle_fn()
+                written = False
+
+    def stop(self):
+        """Finish the current write, then close the sink"""
+        self.subscription.close()
+        self.thread.join(timeout=2)
+        if self.close_fn:
+            self.close_fn()
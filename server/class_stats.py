@@ -0,0 +1,92 @@
+import collections
+import threading
+import numpy as np
+
+
+# Equal-width confidence bins over [0, 1]
+CONFIDENCE_BINS = 10
+
+
+class ClassStats:
+    """Running confusion matrix plus per-class accuracy and confidence
+    histograms over the last `window` steps
+
+    Fed every published step by a Recorder. Each step costs a few bincounts
+    over the batch; the windowed sums are kept by adding the new step's
+    counts and subtracting the ones that fall out of the window.
+    """
+
+    def __init__(self, classes, window=100, confidence_bins=CONFIDENCE_BINS):
+        self.classes = list(classes)
+        self.window = window
+        self.confidence_bins = confidence_bins
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self._clear()
+        self.generation = 0  # Bumped when the run restarts and counting starts over
+
+    def _clear(self):
+        n = len(self.classes)
+        self.confusion = np.zeros((n, n), dtype=np.int64)  # [ground truth, prediction]
+        self.steps = collections.deque()  # (correct, total, confidence histograms) per step in the window
+        self.window_correct = np.zeros(n, dtype=np.int64)
+        self.window_total = np.zeros(n, dtype=np.int64)
+        self.window_confidence = np.zeros((2, self.confidence_bins), dtype=np.int64)  # [wrong, correct]
+        self.step = 0
+        self.timestamp_ms = 0
+
+    def append_record(self, record):
+        """Count one published step's predictions"""
+        batch = record['batch']
+        n = len(self.classes)
+        labels = np.asarray(batch['label_ids'], dtype=np.int64)
+        predictions = np.asarray(batch['prediction_ids'], dtype=np.int64)
+        confidences = np.asarray(batch['confidences'], dtype=np.float64)
+
+        confusion = np.bincount(labels * n + predictions, minlength=n * n).reshape(n, n)
+        correct_mask = labels == predictions
+        total = np.bincount(labels, minlength=n)
+        correct = np.bincount(labels[correct_mask], minlength=n)
+        bins = np.minimum((confidences * self.confidence_bins).astype(np.int64), self.confidence_bins - 1)
+        confidence = np.bincount(
+            correct_mask * self.confidence_bins + bins, minlength=2 * self.confidence_bins
+        ).reshape(2, self.confidence_bins)
+
+        with self.condition:
+            if record['step'] <= self.step:
+                self._clear()  # Steps restarted after a reset
+                self.generation += 1
+            self.confusion += confusion
+            self.window_correct += correct
+            self.window_total += total
+            self.window_confidence += confidence
+            self.steps.append((correct, total, confidence))
+            if len(self.steps) > self.window:
+                old_correct, old_total, old_confidence = self.steps.popleft()
+                self.window_correct -= old_correct
+                self.window_total -= old_total
+                self.window_confidence -= old_confidence
+            self.step = record['step']
+            self.timestamp_ms = record['timestamp_ms']
+            self.condition.notify_all()
+
+    def wait_for(self, generation, step, timeout=None):
+        """Block until a step other than (generation, step) was counted; False on timeout"""
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: (self.generation, self.step) != (generation, step), timeout
+            )
+
+    def snapshot(self):
+        """Copy of the current counts, safe to read while steps keep arriving"""
+        with self.lock:
+            return {
+                'generation': self.generation,
+                'step': self.step,
+                'timestamp_ms': self.timestamp_ms,
+                'confusion': self.confusion.copy(),
+                'window_steps': len(self.steps),
+                'window_correct': self.window_correct.copy(),
+                'window_total': self.window_total.copy(),
+                'window_confidence': self.window_confidence.copy()
+            }
@@ -0,0 +1,267 @@
+import os
+import time
+import bisect
+import threading
+import numpy as np
+
+
+METRIC_FIELDS = (
+    ('step', np.uint32),
+    ('loss', np.float32),
+    ('accuracy', np.float32),
+    ('timestamp_ms', np.uint64),
+)
+
+# One row per image, so a step owns batch_size consecutive rows
+PREDICTION_FIELDS = (
+    ('step', np.uint32),
+    ('ground_truth', np.uint8),
+    ('prediction', np.uint8),
+    ('confidence', np.float32),
+)
+
+RUN_PREFIX = 'run-'
+
+# Longest a published step stays in memory only, while steps keep coming
+SYNC_INTERVAL_S = 5.0
+
+
+def empty_columns(fields):
+    return {name: np.empty(0, dtype=dtype) for name, dtype in fields}
+
+
+class ColumnTable:
+    """Step-sorted columns stored as fixed-size chunks of .npy files, one file per column
+
+    Rows are buffered in memory and written out as a chunk directory once
+    `chunk_rows` have accumulated; sync() saves the partial chunk in between.
+    Written chunks are memory-mapped, so a range read is a binary search per
+    touched chunk plus a slice.
+    """
+
+    def __init__(self, directory, fields, chunk_rows=65536):
+        self.directory = directory
+        self.fields = fields
+        self.chunk_rows = chunk_rows
+        self.chunks = []  # Dicts of read-only memory-mapped columns
+        self.first_steps = []
+        self.buffer = {name: np.empty(chunk_rows, dtype=dtype) for name, dtype in fields}
+        self.buffered = 0
+        self.synced = 0  # Buffered rows already saved by sync()
+        self.lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        for name in sorted(os.listdir(directory)):
+            self._load_chunk(os.path.join(directory, name))
+
+    def _load_chunk(self, path):
+        chunk = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name, _ in self.fields}
+        # A sync cut short between columns leaves some longer than others
+        rows = min(len(column) for column in chunk.values())
+        chunk = {name: column[:rows] for name, column in chunk.items()}
+        if rows:
+            self.chunks.append(chunk)
+            self.first_steps.append(int(chunk['step'][0]))
+
+    def last_step(self):
+        with self.lock:
+            if self.buffered:
+                return int(self.buffer['step'][self.buffered - 1])
+            return int(self.chunks[-1]['step'][-1]) if self.chunks else 0
+
+    def append(self, columns):
+        """Append rows given as equal-length arrays per field"""
+        count = len(columns['step'])
+        offset = 0
+        with self.lock:
+            while offset < count:
+                take = min(count - offset, self.chunk_rows - self.buffered)
+                for name, _ in self.fields:
+                    self.buffer[name][self.buffered:self.buffered + take] = columns[name][offset:offset + take]
+                self.buffered += take
+                offset += take
+                if self.buffered == self.chunk_rows:
+                    self._flush()
+
+    def _write(self):
+        """Save the buffered rows as the chunk directory named by their first step"""
+        path = os.path.join(self.directory, f"{int(self.buffer['step'][0]):010d}")
+        os.makedirs(path, exist_ok=True)
+        for name, _ in self.fields:
+            # Replaced whole, so an offline reader never sees a half-written column
+            temp = os.path.join(path, f'{name}.npy.tmp')
+            with open(temp, 'wb') as f:
+                np.save(f, self.buffer[name][:self.buffered])
+            os.replace(temp, os.path.join(path, f'{name}.npy'))
+        return path
+
+    def _flush(self):
+        if not self.buffered:
+            return
+        path = self._write()
+        self.buffered = 0
+        self.synced = 0
+        self._load_chunk(path)
+
+    def sync(self):
+        """Save buffered rows to disk but keep filling the same chunk
+
+        The partial chunk directory is rewritten on every sync until the
+        chunk is full, so syncing often doesn't leave many small chunks.
+        """
+        with self.lock:
+            if self.buffered > self.synced:
+                self._write()
+                self.synced = self.buffered
+
+    def flush(self):
+        """Write buffered rows out as a (possibly short) chunk"""
+        with self.lock:
+            self._flush()
+
+    def between(self, from_step, to_step):
+        """All rows with from_step <= step <= to_step as contiguous arrays"""
+        with self.lock:
+            parts = []
+            first = max(0, bisect.bisect_right(self.first_steps, from_step) - 1)
+            last = bisect.bisect_right(self.first_steps, to_step)
+            for chunk in self.chunks[first:last]:
+                parts.append(self._slice(chunk, from_step, to_step))
+            if self.buffered:
+                # Copy so later appends can't change what the caller holds
+                buffered = {name: column[:self.buffered] for name, column in self.buffer.items()}
+                parts.append({name: column.copy() for name, column in self._slice(buffered, from_step, to_step).items()})
+
+        if not parts:
+            return empty_columns(self.fields)
+        return {name: np.concatenate([part[name] for part in parts]) for name, _ in self.fields}
+
+    @staticmethod
+    def _slice(chunk, from_step, to_step):
+        steps = chunk['step']
+        lo = np.searchsorted(steps, from_step, side='left')
+        hi = np.searchsorted(steps, to_step, side='right')
+        return {name: column[lo:hi] for name, column in chunk.items()}
+
+
+class RunExport:
+    """Columnar metrics and per-image predictions of one training run"""
+
+    def __init__(self, directory, chunk_rows=65536):
+        self.directory = directory
+        self.metrics = ColumnTable(os.path.join(directory, 'metrics'), METRIC_FIELDS, chunk_rows)
+        self.predictions = ColumnTable(os.path.join(directory, 'predictions'), PREDICTION_FIELDS, chunk_rows)
+
+    def query(self, from_step=0, to_step=None, stride=1, with_predictions=False):
+        """Metrics for steps in [from_step, to_step] keeping every `stride`th step
+        from from_step, plus the matching prediction rows if requested
+        """
+        to_step = self.metrics.last_step() if to_step is None else to_step
+        metrics = self.metrics.between(from_step, to_step)
+        if stride > 1:
+            keep = (metrics['step'] - from_step) % stride == 0
+            metrics = {name: column[keep] for name, column in metrics.items()}
+
+        predictions = None
+        if with_predictions:
+            predictions = self.predictions.between(from_step, to_step)
+            if stride > 1:
+                keep = (predictions['step'] - from_step) % stride == 0
+                predictions = {name: column[keep] for name, column in predictions.items()}
+        return metrics, predictions
+
+    def flush(self):
+        self.metrics.flush()
+        self.predictions.flush()
+
+    def sync(self):
+        self.metrics.sync()
+        self.predictions.sync()
+
+
+class ColumnarExport:
+    """Writes every published step of every run to step-indexed .npy chunks
+
+    Each run gets its own `run-<start time>` directory under `directory`; a
+    step that goes backwards (the trainer was reset) finishes the current run
+    and starts the next. Finished runs stay on disk and can be opened offline
+    with RunExport or read directly with numpy.load. Rows still being
+    buffered are synced to disk every sync_interval_s, and whenever the
+    recorder feeding the export goes idle (training stopped or paused).
+    """
+
+    def __init__(self, directory, chunk_rows=65536, with_predictions=True, sync_interval_s=SYNC_INTERVAL_S):
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.with_predictions = with_predictions
+        self.sync_interval_s = sync_interval_s
+        self.last_sync = time.monotonic()
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        runs = sorted(name for name in os.listdir(directory) if name.startswith(RUN_PREFIX))
+        # Resume the newest run; appends from a restarted trainer roll it over
+        self.current = RunExport(os.path.join(directory, runs[-1]), chunk_rows) if runs else None
+
+    def _start_run(self):
+        if self.current:
+            self.current.flush()
+        started = int(time.time() * 1000)
+        while os.path.exists(os.path.join(self.directory, f'{RUN_PREFIX}{started}')):
+            started += 1
+        self.current = RunExport(os.path.join(self.directory, f'{RUN_PREFIX}{started}'), self.chunk_rows)
+
+    def append_record(self, record):
+        """Add one published step"""
+        step = record['step']
+        with self.lock:
+            if self.current is None or step <= self.current.metrics.last_step():
+                self._start_run()
+            run = self.current
+
+        run.metrics.append({
+            'step': np.array([step]),
+            'loss': np.array([record['metrics']['loss']]),
+            'accuracy': np.array([record['metrics']['accuracy']]),
+            'timestamp_ms': np.array([record['timestamp_ms']]),
+        })
+
+        batch = record['batch']
+        if self.with_predictions and batch is not None and 'label_ids' in batch:
+            count = len(batch['label_ids'])
+            run.predictions.append({
+                'step': np.full(count, step),
+                'ground_truth': batch['label_ids'],
+                'prediction': batch['prediction_ids'],
+                'confidence': batch['confidences'],
+            })
+
+        if time.monotonic() - self.last_sync >= self.sync_interval_s:
+            self.sync()
+
+    def sync(self):
+        """Save the current run's buffered rows (see ColumnTable.sync)"""
+        with self.lock:
+            run = self.current
+            self.last_sync = time.monotonic()
+        if run:
+            run.sync()
+
+    def last_step(self):
+        with self.lock:
+            run = self.current
+        return run.metrics.last_step() if run else 0
+
+    def query(self, from_step=0, to_step=None, stride=1, with_predictions=False):
+        """Range read over the current run (see RunExport.query)"""
+        with self.lock:
+            run = self.current
+        if run is None:
+            return empty_columns(METRIC_FIELDS), empty_columns(PREDICTION_FIELDS) if with_predictions else None
+        return run.query(from_step, to_step, stride, with_predictions)
+
+    def close(self):
+        """Flush buffered rows so the run is complete on disk"""
+        with self.lock:
+            if self.current:
+                self.current.flush()
@@ -0,0 +1,53 @@
+import threading
+import collections
+
+
+class CreditWindow:
+    """Credit-based backpressure driven by the client's DashboardResponse acks
+
+    The server may have at most `window` updates in flight (sent but not yet
+    acknowledged through last_received_step), and nothing while the client
+    reports ready=False. Acks arrive in send order, so one for a lower step
+    than the last means training was reset and the step counter started over.
+    """
+
+    def __init__(self, window=1):
+        self.window = max(1, window)
+        self.ready = True
+        self.last_received_step = 0
+        self.in_flight = collections.deque()  # Steps sent and not yet acked
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def update(self, ready, last_received_step, window=0):
+        """Apply an ack from the client and wake the sender if credit opened up"""
+        with self.condition:
+            self.ready = ready
+            # Not max(): after a reset the old high-water mark would ack every new step
+            self.last_received_step = last_received_step
+            if window:
+                self.window = window
+            while self.in_flight and self.in_flight[0] <= last_received_step:
+                if self.in_flight.popleft() == last_received_step:
+                    break  # Steps after it were sent later, e.g. lower ones from a reset run
+            self.condition.notify_all()
+
+    def has_credit(self):
+        return self.ready and len(self.in_flight) < self.window
+
+    def wait_for_credit(self, timeout=None):
+        """Block until an update may be sent; False on timeout or once closed"""
+        with self.condition:
+            if not self.closed and not self.has_credit():
+                self.condition.wait(timeout)
+            return not self.closed and self.has_credit()
+
+    def sent(self, step):
+        """Record that an update for `step` is now in flight"""
+        with self.condition:
+            self.in_flight.append(step)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
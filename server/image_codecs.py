@@ -0,0 +1,94 @@
+from PIL import Image
+import io
+
+from common import telemetry
+
+
+IMAGE_ENCODE_SECONDS = telemetry.REGISTRY.histogram('image_encode_seconds', 'Time to encode one image')
+
+
+class RawCodec:
+    """Uncompressed uint8 RGB bytes, row-major"""
+
+    format = "RAW_RGB"
+
+    def encode(self, pixels):
+        return pixels.tobytes()
+
+
+class PILCodec:
+    """PNG/JPEG/WebP through Pillow with format-specific save options"""
+
+    def __init__(self, format, **save_options):
+        self.format = format
+        self.save_options = save_options
+
+    def encode(self, pixels):
+        pil_img = Image.fromarray(pixels, 'RGB')
+        img_bytes = io.BytesIO()
+        pil_img.save(img_bytes, format=self.format, **self.save_options)
+        return img_bytes.getvalue()
+
+
+def get_codec(spec="png"):
+    """Build a codec from a spec such as 'raw', 'png:1', 'jpeg:85' or 'webp:80'
+
+    The number after the colon is the PNG compression level (0-9) or the
+    JPEG/WebP quality (1-100).
+    """
+    name, _, level = spec.lower().partition(':')
+
+    if name == 'raw':
+        return RawCodec()
+    if name == 'png':
+        return PILCodec('PNG', compress_level=int(level) if level else 6)
+    if name in ('jpeg', 'jpg'):
+        return PILCodec('JPEG', quality=int(level) if level else 85)
+    if name == 'webp':
+        return PILCodec('WEBP', quality=int(level) if level else 80)
+    raise ValueError(f"Unknown image codec: {spec}")
+
+
+def parse_codec_spec(spec):
+    """Split an optional 'lazy:' prefix off a codec spec, returning (codec, lazy)"""
+    lazy = spec.lower().startswith('lazy:')
+    if lazy:
+        spec = spec[len('lazy:'):]
+    return get_codec(spec), lazy
+
+
+class EncodedImages:
+    """List-like view of a (batch, H, W, 3) tensor as encoded image dicts
+
+    With lazy=False every image is encoded up front. With lazy=True an image
+    is only encoded the first time somebody indexes it, so steps that no
+    stream ever serializes cost nothing to encode.
+    """
+
+    def __init__(self, pixels, codec, lazy=False):
+        self.pixels = pixels
+        self.codec = codec
+        self.encoded = [None] * len(pixels)
+        if not lazy:
+            for i in range(len(pixels)):
+                self[i]
+
+    def __len__(self):
+        return len(self.encoded)
+
+    def __getitem__(self, i):
+        if self.encoded[i] is None:
+            height, width = self.pixels.shape[1:3]
+            with IMAGE_ENCODE_SECONDS.time():
+                data = self.codec.encode(self.pixels[i])
+            self.encoded[i] = {
+                'pixels': data,
+                'width': width,
+                'height': height,
+                'format': self.codec.format
+            }
+        return self.encoded[i]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
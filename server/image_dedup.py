@@ -0,0 +1,69 @@
+import hashlib
+import collections
+
+
+# Largest client image cache the server mirrors per stream
+MAX_HELD_IMAGES = 4096
+
+
+def content_id(data):
+    """Content address of encoded image bytes"""
+    return hashlib.blake2b(data, digest_size=8).digest()
+
+
+class ImageBatchParts:
+    """One step's serialized ImageBatch, kept in pieces so a stream can leave
+    out the pixels of images its client already holds
+
+    `images` and `refs` hold each LabeledImage already wire-encoded as an
+    ImageBatch.images field, with and without pixel_data. Choosing per image
+    and concatenating behind `head` is a valid ImageBatch, so per-client
+    payloads still reuse the bytes built once for every stream.
+    """
+
+    __slots__ = ('head', 'images', 'refs', 'ids', 'full')
+
+    def __init__(self, head, images, refs, ids):
+        self.head = head  # ImageBatch without images: step and timestamp
+        self.images = images
+        self.refs = refs
+        self.ids = ids
+        self.full = head + b''.join(images)
+
+    def for_client(self, held):
+        """Serialized batch for a client whose cached images `held` mirrors (None = full)"""
+        if held is None:
+            return self.full
+        return self.head + b''.join(
+            ref if held.touch(image_id) else image
+            for image_id, image, ref in zip(self.ids, self.images, self.refs)
+        )
+
+
+class HeldImages:
+    """The server's mirror of one client's LRU of images by content id
+
+    Client and server update their LRUs with the same ids in the same order,
+    so an id this mirror holds is still in the client's cache. A client
+    cache at least `capacity` large, or one that also saw other batches
+    (a replay, an earlier stream), always holds a superset.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = min(capacity, MAX_HELD_IMAGES)
+        self.ids = collections.OrderedDict()
+
+    def touch(self, image_id):
+        """Record that the client sees this image now; True if it already had it"""
+        if image_id in self.ids:
+            self.ids.move_to_end(image_id)
+            return True
+        self.ids[image_id] = None
+        if len(self.ids) > self.capacity:
+            self.ids.popitem(last=False)
+        return False
+
+
+def held_images_for(image_cache_size):
+    """Mirror for a stream whose client advertised `image_cache_size`, or None to send pixels"""
+    return HeldImages(image_cache_size) if image_cache_size else None
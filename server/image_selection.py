@@ -0,0 +1,75 @@
+import collections
+import numpy as np
+
+
+# first: the batch's first images, in order
+# misclassified: wrong predictions, most confident first
+# least_confident: lowest confidence first
+# stratified: one image per ground-truth class, then a second per class, ...
+# class: images whose ground truth is class_name, in batch order
+POLICIES = ('first', 'misclassified', 'least_confident', 'stratified', 'class')
+
+
+class Selection(collections.namedtuple('Selection', ('policy', 'count', 'class_name'))):
+    """Which images of each step a stream asks for: up to `count` (0 = as many as
+    its quality level allows) chosen by `policy`
+    """
+
+    __slots__ = ()
+
+    def limit(self, max_images):
+        return min(self.count, max_images) if self.count else max_images
+
+
+def selection_for(policy='first', count=0, class_name=''):
+    """Selection for a request, or None for the default (first images, as many as allowed)
+
+    Raises ValueError for an unknown policy or a class policy without a class.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown image selection '{policy}'")
+    if policy == 'class' and not class_name:
+        raise ValueError("The class selection needs a class name")
+    if policy == 'first' and not count:
+        return None
+    return Selection(policy, count, class_name if policy == 'class' else '')
+
+
+def _smallest(values, k):
+    """Indices of the k smallest values, smallest first, without sorting all of them"""
+    if k < len(values):
+        candidates = np.argpartition(values, k)[:k]
+    else:
+        candidates = np.arange(len(values))
+    return candidates[np.argsort(values[candidates], kind='stable')]
+
+
+def _stratified(label_ids, k):
+    n = len(label_ids)
+    order = np.argsort(label_ids, kind='stable')
+    sorted_ids = label_ids[order]
+    # Position of each image within its class, in batch order
+    group_starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    starts = np.repeat(group_starts, np.diff(np.r_[group_starts, n]))
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n) - starts
+    # lexsort sorts by its last key first: every class's first image, then every second one, ...
+    return np.lexsort((np.arange(n), rank))[:k]
+
+
+def select(batch, max_images, selection=None):
+    """Indices of the images of `batch` to send, at most `max_images` of them"""
+    count = len(batch['images'])
+    if selection is None or selection.policy == 'first':
+        return np.arange(min(max_images, count))
+
+    if selection.policy == 'misclassified':
+        wrong = np.flatnonzero(np.asarray(batch['label_ids']) != np.asarray(batch['prediction_ids']))
+        confidences = np.asarray(batch['confidences'], dtype=np.float32)[wrong]
+        return wrong[_smallest(-confidences, max_images)]
+    if selection.policy == 'least_confident':
+        return _smallest(np.asarray(batch['confidences'], dtype=np.float32), max_images)
+    if selection.policy == 'stratified':
+        return _stratified(np.asarray(batch['label_ids']), max_images)
+    # class
+    return np.flatnonzero(np.asarray(batch['labels']) == selection.class_name)[:max_images]
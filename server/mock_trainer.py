@@ -1,43 +1,94 @@
 import numpy as np
 import threading
 import time
-from PIL import Image
-import io
+import sys
+
+if getattr(sys, 'frozen', False):
+    import broadcaster
+    import image_codecs
+else:
+    from server import broadcaster
+    from server import image_codecs
+from common import telemetry
+
+
+# Class names for image classification
+CLASSES = ['cat', 'dog', 'bird', 'fish', 'horse', 'deer', 'frog', 'ship', 'car', 'plane']
+
+STEP_GENERATION_SECONDS = telemetry.REGISTRY.histogram(
+    'trainer_step_generation_seconds', 'Time to generate one step\'s batch, including eager image encoding'
+)
+
 
 class MockTrainer:
     """Simulates ML training for testing the dashboard"""
     
-    def __init__(self):
+    def __init__(self, codec="png", batch_size=16, image_size=64, step_delay=0.1, fixed_samples=False, max_steps=1000):
         self.is_training = False
         self.is_running = False  # Controls the thread
         self.current_step = 0
-        self.batch_size = 16
-        self.max_steps = 1000
+        self.batch_size = batch_size
+        self.image_size = image_size
+        self.step_delay = step_delay  # Seconds per simulated step
+        self.max_steps = max_steps
+        
+        # Image encoding, e.g. "png:1", "jpeg:85", "raw" or "lazy:png"
+        self.codec, self.lazy_encoding = image_codecs.parse_codec_spec(codec)
+        self.rng = np.random.default_rng()
+        # Log the same images every step, like a trainer showing fixed validation samples
+        self.fixed_samples = fixed_samples
+        self.samples = None
         
         # Current batch data
         self.current_batch = None
         self.current_metrics = {'loss': 2.3, 'accuracy': 0.1}
         
-        # Class names for image classification
-        self.classes = ['cat', 'dog', 'bird', 'fish', 'horse', 'deer', 'frog', 'ship', 'car', 'plane']
+        self.classes = list(CLASSES)
         
         # Training thread
         self.training_thread = None
+        
+        # Every finished step is published here once for all streams
+        self.broadcaster = broadcaster.StepBroadcaster()
     
     def generate_fake_image(self, label_idx):
-        """Generate a random colored image"""
-        # Create a 64x64 image with random colors
-        img = np.random.randint(0, 255, (64, 64, 3), dtype=np.uint8)
+        """Generate a single random colored image"""
+        return self.generate_fake_batch(1)['images'][0]
+    
+    def generate_fake_batch(self, batch_size=None):
+        """Generate a whole batch of random images and predictions in one go"""
+        batch_size = batch_size or self.batch_size
+        num_classes = len(self.classes)
+        
+        if self.fixed_samples and self.samples is not None and len(self.samples[0]) == batch_size:
+            pixels, label_ids = self.samples
+        else:
+            # One NumPy call for every pixel in the batch
+            pixels = self.rng.integers(
+                0, 255, (batch_size, self.image_size, self.image_size, 3), dtype=np.uint8
+            )
+            label_ids = self.rng.integers(0, num_classes, batch_size)
+            if self.fixed_samples:
+                self.samples = (pixels, label_ids)
         
-        # Convert to bytes
-        pil_img = Image.fromarray(img, 'RGB')
-        img_bytes = io.BytesIO()
-        pil_img.save(img_bytes, format='PNG')
+        # Prediction is correct with increasing probability
+        correct = self.rng.random(batch_size) < self.current_metrics['accuracy']
+        prediction_ids = np.where(correct, label_ids, self.rng.integers(0, num_classes, batch_size))
+        confidences = np.where(
+            correct,
+            self.rng.uniform(0.7, 0.99, batch_size),
+            self.rng.uniform(0.4, 0.7, batch_size)
+        )
         
+        class_names = np.array(self.classes)
         return {
-            'pixels': img_bytes.getvalue(),
-            'width': 64,
-            'height': 64
+            'images': image_codecs.EncodedImages(pixels, self.codec, lazy=self.lazy_encoding),
+            'labels': class_names[label_ids].tolist(),
+            'predictions': class_names[prediction_ids].tolist(),
+            'confidences': confidences.tolist(),
+            'pixels': pixels,
+            'label_ids': label_ids,
+            'prediction_ids': prediction_ids
         }
     
     def training_loop(self):
@@ -51,7 +102,7 @@ class MockTrainer:
                 continue
             
             # Simulate training step
-            time.sleep(0.1)  # 100ms per step
+            time.sleep(self.step_delay)
             
             self.current_step += 1
             
@@ -59,34 +110,18 @@ class MockTrainer:
             self.current_metrics['loss'] = 2.3 * np.exp(-self.current_step / 200) + 0.1
             self.current_metrics['accuracy'] = min(0.95, 0.1 + 0.85 * (1 - np.exp(-self.current_step / 200)))
             
-            # Generate batch
-            images = []
-            labels = []
-            predictions = []
-            confidences = []
-            
-            for i in range(self.batch_size):
-                true_label_idx = np.random.randint(0, len(self.classes))
-                
-                # Prediction is correct with increasing probability
-                if np.random.random() < self.current_metrics['accuracy']:
-                    pred_label_idx = true_label_idx
-                    confidence = np.random.uniform(0.7, 0.99)
-                else:
-                    pred_label_idx = np.random.randint(0, len(self.classes))
-                    confidence = np.random.uniform(0.4, 0.7)
-                
-                images.append(self.generate_fake_image(true_label_idx))
-                labels.append(self.classes[true_label_idx])
-                predictions.append(self.classes[pred_label_idx])
-                confidences.append(confidence)
+            generate_start = time.perf_counter()
+            self.current_batch = self.generate_fake_batch()
+            generate_s = time.perf_counter() - generate_start
+            STEP_GENERATION_SECONDS.observe(generate_s)
             
-            self.current_batch = {
-                'images': images,
-                'labels': labels,
-                'predictions': predictions,
-                'confidences': confidences
-            }
+            self.broadcaster.publish({
+                'step': self.current_step,
+                'metrics': dict(self.current_metrics),
+                'batch': self.current_batch,
+                'timestamp_ms': int(time.time() * 1000),
+                'generate_s': generate_s
+            })
             
             if self.current_step % 10 == 0:
                 status = "TRAINING" if self.is_training else "PAUSED"
@@ -126,6 +161,8 @@ class MockTrainer:
         self.stop_training()
         self.current_step = 0
         self.current_metrics = {'loss': 2.3, 'accuracy': 0.1}
+        self.current_batch = None
+        self.broadcaster.reset()
         print("Training reset!")
     
     def get_current_batch(self):
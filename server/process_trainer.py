@@ -0,0 +1,301 @@
+import multiprocessing
+import threading
+import struct
+import sys
+from multiprocessing import shared_memory
+import numpy as np
+
+if getattr(sys, 'frozen', False):
+    import broadcaster
+    import mock_trainer
+else:
+    from server import broadcaster
+    from server import mock_trainer
+
+
+# Each slot starts with the write generation it holds; 0 while the worker is rewriting it.
+# Not the step: steps restart at 1 after a reset, and a reused slot must never look unchanged
+SLOT_HEADER = struct.Struct('<Q')
+
+
+def slot_size_for(batch_size, image_size):
+    """Bytes per ring slot: header, raw pixels, and room for the encoded images"""
+    pixel_bytes = batch_size * image_size * image_size * 3
+    # Encoded noise can come out slightly larger than raw; overflow goes over the pipe
+    return SLOT_HEADER.size + pixel_bytes + 2 * pixel_bytes + 1024 * batch_size
+
+
+class SharedBatchWriter:
+    """Worker-side stand-in for the broadcaster: writes each batch into a ring
+    slot of shared memory and sends only a small notification over the pipe
+    """
+
+    def __init__(self, shm, slots, slot_size, conn):
+        self.shm = shm
+        self.slots = slots
+        self.slot_size = slot_size
+        self.conn = conn
+        self.generation = 0  # Slot writes so far; only ever increases
+
+    def publish(self, record):
+        step = record['step']
+        batch = record['batch']
+        base = (step % self.slots) * self.slot_size
+        end = base + self.slot_size
+        buf = self.shm.buf
+
+        # Readers compare the header against the generation before and after copying
+        self.generation += 1
+        SLOT_HEADER.pack_into(buf, base, 0)
+        pixels = batch['pixels']
+        offset = base + SLOT_HEADER.size
+        np.ndarray(pixels.shape, dtype=np.uint8, buffer=buf, offset=offset)[:] = pixels
+        offset += pixels.nbytes
+
+        images = []
+        for img in batch['images']:  # Encodes here, in the worker, even for lazy codecs
+            data = img['pixels']
+            if offset + len(data) > end:
+                images.append(data)
+                continue
+            buf[offset:offset + len(data)] = data
+            images.append((offset, len(data)))
+            offset += len(data)
+        SLOT_HEADER.pack_into(buf, base, self.generation)
+
+        first = batch['images'][0] if len(batch['images']) else {'format': '', 'width': 0, 'height': 0}
+        self.conn.send({
+            'step': step,
+            'generation': self.generation,
+            'metrics': record['metrics'],
+            'timestamp_ms': record['timestamp_ms'],
+            'generate_s': record.get('generate_s', 0.0),
+            'pixels_shape': pixels.shape,
+            'images': images,
+            'format': first['format'],
+            'labels': batch['labels'],
+            'predictions': batch['predictions'],
+            'confidences': batch['confidences'],
+            'label_ids': batch['label_ids'],
+            'prediction_ids': batch['prediction_ids']
+        })
+
+    def reset(self):
+        self.conn.send({'reset': True})
+
+
+def _worker_main(shm_name, slots, slot_size, control, steps, trainer_options):
+    """Trainer process: runs a MockTrainer whose steps land in shared memory"""
+    # Spawned children share the parent's resource tracker, which unlinks the segment once
+    shm = shared_memory.SharedMemory(name=shm_name)
+
+    trainer = mock_trainer.MockTrainer(**trainer_options)
+    trainer.broadcaster = SharedBatchWriter(shm, slots, slot_size, steps)
+    commands = {
+        'start': trainer.start_training,
+        'pause': trainer.pause_training,
+        'stop': trainer.stop_training,
+        'reset': trainer.reset_training,
+    }
+
+    try:
+        while True:
+            command = control.recv()
+            if command == 'shutdown':
+                break
+            commands[command]()
+    except EOFError:
+        pass  # Parent went away
+    finally:
+        trainer.stop_training()
+        shm.close()
+
+
+class SlotView:
+    """Read access to one ring slot that fails once the worker has reused it"""
+
+    def __init__(self, buf, base, step, generation):
+        self.buf = buf
+        self.base = base
+        self.step = step
+        self.generation = generation
+
+    def check(self):
+        if SLOT_HEADER.unpack_from(self.buf, self.base)[0] != self.generation:
+            raise broadcaster.StaleRecordError(f"Step {self.step} was overwritten in shared memory")
+
+    def read(self, offset, length):
+        self.check()
+        data = bytes(self.buf[offset:offset + length])
+        self.check()
+        return data
+
+
+class SharedImages:
+    """List-like encoded images of one step, copied out of its slot on access"""
+
+    def __init__(self, view, entries, width, height, format):
+        self.view = view
+        self.entries = entries  # (offset, length) in the slot, or bytes that overflowed it
+        self.width = width
+        self.height = height
+        self.format = format
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, i):
+        entry = self.entries[i]
+        return {
+            'pixels': entry if isinstance(entry, bytes) else self.view.read(*entry),
+            'width': self.width,
+            'height': self.height,
+            'format': self.format
+        }
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class SharedPixels:
+    """List-like raw (H, W, 3) images of one step, copied out of its slot on access"""
+
+    def __init__(self, view, shape):
+        self.view = view
+        self.shape = shape
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, i):
+        # No lasting NumPy view into the segment, so it can always be closed
+        array = np.ndarray(self.shape, dtype=np.uint8, buffer=self.view.buf, offset=self.view.base + SLOT_HEADER.size)
+        self.view.check()
+        image = array[i].copy()
+        self.view.check()
+        return image
+
+
+class ProcessTrainer:
+    """MockTrainer running in its own process, with the same interface
+
+    Image generation and encoding happen in the worker, outside this
+    process's GIL. Batches are handed over through a ring of shared-memory
+    slots; only step notifications travel over the pipe, and a dispatcher
+    thread publishes them to the local broadcaster. A subscriber that falls
+    more than `slots` steps behind finds its slot reused and gets
+    StaleRecordError instead of torn data.
+    """
+
+    def __init__(self, codec="png", batch_size=16, image_size=64, step_delay=0.1, slots=16, fixed_samples=False,
+                 max_steps=1000):
+        self.is_training = False
+        self.current_step = 0
+        self.max_steps = max_steps
+        self.current_metrics = {'loss': 2.3, 'accuracy': 0.1}
+        self.classes = list(mock_trainer.CLASSES)
+        self.broadcaster = broadcaster.StepBroadcaster()
+
+        self.slots = slots
+        self.slot_size = slot_size_for(batch_size, image_size)
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * self.slot_size)
+
+        # spawn, not fork: forking a process that already runs gRPC threads is unsafe
+        context = multiprocessing.get_context('spawn')
+        worker_control, self.control = context.Pipe(duplex=False)
+        self.steps, worker_steps = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=_worker_main,
+            args=(self.shm.name, slots, self.slot_size, worker_control, worker_steps, {
+                'codec': codec,
+                'batch_size': batch_size,
+                'image_size': image_size,
+                'step_delay': step_delay,
+                'fixed_samples': fixed_samples,
+                'max_steps': max_steps
+            }),
+            daemon=True
+        )
+        self.process.start()
+        worker_control.close()
+        worker_steps.close()
+
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def dispatch(self):
+        """Turn worker notifications into broadcaster records"""
+        while True:
+            try:
+                note = self.steps.recv()
+            except (EOFError, OSError):
+                return  # Worker exited
+
+            if note.get('reset'):
+                self.current_step = 0
+                self.current_metrics = {'loss': 2.3, 'accuracy': 0.1}
+                self.broadcaster.reset()
+                continue
+
+            step = note['step']
+            view = SlotView(self.shm.buf, (step % self.slots) * self.slot_size, step, note['generation'])
+            shape = note['pixels_shape']
+            self.current_step = step
+            self.current_metrics = note['metrics']
+            # The worker's own metrics aren't scraped; its step timing rides along instead
+            mock_trainer.STEP_GENERATION_SECONDS.observe(note['generate_s'])
+            self.broadcaster.publish({
+                'step': step,
+                'metrics': note['metrics'],
+                'batch': {
+                    'images': SharedImages(view, note['images'], shape[2], shape[1], note['format']),
+                    'pixels': SharedPixels(view, shape),
+                    'labels': note['labels'],
+                    'predictions': note['predictions'],
+                    'confidences': note['confidences'],
+                    'label_ids': note['label_ids'],
+                    'prediction_ids': note['prediction_ids']
+                },
+                'timestamp_ms': note['timestamp_ms'],
+                'generate_s': note['generate_s']
+            })
+
+    def _send(self, command):
+        try:
+            self.control.send(command)
+            return True
+        except (BrokenPipeError, OSError):
+            print(f"Trainer process is gone, cannot {command}")
+            return False
+
+    def start_training(self):
+        """Start or resume training in the worker"""
+        self.is_training = self._send('start')
+        return self.is_training
+
+    def pause_training(self):
+        """Pause training without stopping the worker"""
+        self.is_training = False
+        return self._send('pause')
+
+    def stop_training(self):
+        """Stop the worker's training loop"""
+        self.is_training = False
+        return self._send('stop')
+
+    def reset_training(self):
+        """Reset training to step 0"""
+        self.is_training = False
+        self._send('reset')
+
+    def get_current_metrics(self):
+        """Get current metrics"""
+        return self.current_metrics
+
+    def shutdown(self):
+        """Stop the worker process and release the shared memory"""
+        self._send('shutdown')
+        self.process.join(timeout=5)
+        self.shm.close()
+        self.shm.unlink()
@@ -0,0 +1,150 @@
+import os
+import threading
+import sys
+
+if getattr(sys, 'frozen', False):
+    import adaptation
+    import batch_cache
+    import broadcaster
+    import class_stats
+    import columnar_export
+    import image_codecs
+    import step_log
+else:
+    from server import adaptation
+    from server import batch_cache
+    from server import broadcaster
+    from server import class_stats
+    from server import columnar_export
+    from server import image_codecs
+    from server import step_log
+from common import telemetry
+
+
+RUN_SUBSCRIBERS = telemetry.REGISTRY.gauge('run_subscribers', 'Streams attached to a run', ('run',))
+RUN_STEP = telemetry.REGISTRY.gauge('run_current_step', 'Latest published step of a run', ('run',))
+IMAGE_CACHE_HITS = telemetry.REGISTRY.gauge('image_cache_hits', 'Shared image batch cache hits of a run', ('run',))
+IMAGE_CACHE_MISSES = telemetry.REGISTRY.gauge('image_cache_misses', 'Image batches a run had to build', ('run',))
+
+
+class Run:
+    """One hosted trainer plus the per-run state its streams share"""
+
+    def __init__(self, run_id, trainer, build_image_batch, image_cache_size=32, log=None, export=None):
+        self.run_id = run_id
+        self.trainer = trainer
+        self.build_image_batch = build_image_batch  # (record, max_images, codec, selection) -> ImageBatchParts
+        self.image_cache_size = image_cache_size
+        # On-disk history that reconnecting streams replay from (None = live only)
+        self.step_log = log
+        # Columnar copy of every step for QueryMetrics (None = disabled)
+        self.export = export
+        # Serialized ImageBatch parts per step, quality variant and selection, shared by every subscriber
+        self.image_caches = {}
+        self.lock = threading.Lock()
+        self.image_cache = self.image_cache_for(adaptation.ADAPTATION_LEVELS[0])
+
+        self.recorders = []
+        if log:
+            # Logs the same serialized full-quality batches the streams send
+            self.recorders.append(broadcaster.Recorder(
+                trainer.broadcaster,
+                lambda record: log.append_record(record, self._logged_images(record)),
+                log.close
+            ))
+        if export:
+            self.recorders.append(broadcaster.Recorder(
+                trainer.broadcaster, export.append_record, export.close, idle_fn=export.sync
+            ))
+        # Confusion matrix and windowed per-class accuracy for StreamClassStats
+        self.class_stats = class_stats.ClassStats(trainer.classes)
+        self.recorders.append(broadcaster.Recorder(trainer.broadcaster, self.class_stats.append_record))
+
+        # Read when /metrics is scraped, so the hot path pays nothing
+        RUN_SUBSCRIBERS.labels(run_id).set_function(
+            lambda: trainer.broadcaster.subscriber_count() - len(self.recorders)
+        )
+        RUN_STEP.labels(run_id).set_function(lambda: trainer.current_step)
+        IMAGE_CACHE_HITS.labels(run_id).set_function(lambda: self._cache_stat('hits'))
+        IMAGE_CACHE_MISSES.labels(run_id).set_function(lambda: self._cache_stat('misses'))
+
+    def _cache_stat(self, name):
+        with self.lock:
+            caches = list(self.image_caches.values())
+        return sum(getattr(cache, name) for cache in caches)
+
+    def _logged_images(self, record):
+        try:
+            return self.image_cache.get(record).full
+        except broadcaster.StaleRecordError:
+            return b''  # The recorder fell behind a process trainer; log the metrics only
+
+    def image_cache_for(self, level, selection=None):
+        """Shared cache for one (max_images, codec) quality variant and image selection
+
+        Streams asking for the same selection at the same level share it, so
+        each step is selected and encoded once per distinct variant.
+        """
+        max_images = selection.limit(level['max_images']) if selection else level['max_images']
+        policy = (selection.policy, selection.class_name) if selection and selection.policy != 'first' else None
+        key = (max_images, level['codec'], policy)
+        with self.lock:
+            if key not in self.image_caches:
+                codec = image_codecs.get_codec(level['codec']) if level['codec'] else None
+                self.image_caches[key] = batch_cache.BatchCache(
+                    lambda record: self.build_image_batch(record, max_images, codec, selection),
+                    capacity=self.image_cache_size
+                )
+            return self.image_caches[key]
+
+    def close(self):
+        """Stop training and flush the run's recorders"""
+        self.trainer.stop_training()
+        for recorder in self.recorders:
+            recorder.stop()
+        if hasattr(self.trainer, 'shutdown'):
+            self.trainer.shutdown()  # Process trainers also own a worker and shared memory
+
+
+class RunRegistry:
+    """Trainers hosted by one server process, looked up by run id
+
+    Every run has its own step counter, broadcaster and caches; the gRPC
+    thread pool and the services are shared. With step_log_dir or export_dir
+    set, each run records into its own subdirectory.
+    """
+
+    def __init__(self, build_image_batch, image_cache_size=32, step_log_dir=None, export_dir=None):
+        self.build_image_batch = build_image_batch
+        self.image_cache_size = image_cache_size
+        self.step_log_dir = step_log_dir
+        self.export_dir = export_dir
+        self.runs = {}
+        self.default_run_id = None
+        self.lock = threading.Lock()
+
+    def add(self, run_id, trainer):
+        """Host a trainer under `run_id`; the first run added is the default"""
+        with self.lock:
+            if run_id in self.runs:
+                raise ValueError(f"Run '{run_id}' already exists")
+            log = step_log.StepLog(os.path.join(self.step_log_dir, run_id)) if self.step_log_dir else None
+            export = columnar_export.ColumnarExport(os.path.join(self.export_dir, run_id)) if self.export_dir else None
+            run = Run(run_id, trainer, self.build_image_batch, self.image_cache_size, log, export)
+            self.runs[run_id] = run
+            if self.default_run_id is None:
+                self.default_run_id = run_id
+            return run
+
+    def get(self, run_id=''):
+        """The run with this id (empty = default), or None"""
+        with self.lock:
+            return self.runs.get(run_id or self.default_run_id)
+
+    def list(self):
+        with self.lock:
+            return list(self.runs.values())
+
+    def close(self):
+        for run in self.list():
+            run.close()
@@ -0,0 +1,118 @@
+import heapq
+import threading
+import time
+
+from common import telemetry
+
+
+# Clients ping every 5 s; a session survives a few missed pings
+DEFAULT_LEASE_S = 30.0
+
+SESSIONS_ACTIVE = telemetry.REGISTRY.gauge('sessions_active', 'Client sessions holding a lease')
+SESSIONS_ENDED = telemetry.REGISTRY.counter(
+    'sessions_ended_total', 'Client sessions ended: lease expired or client disconnected', ('reason',)
+)
+
+
+class Session:
+    """One client's lease and the cancel callbacks of its open streams"""
+
+    __slots__ = ('client_id', 'connected_since_ms', 'retry_count', 'expires_at', 'streams')
+
+    def __init__(self, client_id):
+        self.client_id = client_id
+        self.connected_since_ms = int(time.time() * 1000)
+        self.retry_count = 0
+        self.expires_at = 0.0
+        self.streams = {}  # token -> cancel()
+
+
+class SessionTable:
+    """Client sessions kept alive by leases that Ping renews
+
+    Deadlines sit in a heap. Renewing only pushes a newer entry; the stale
+    one is skipped when it reaches the top, so a renewal is O(log n) and
+    never searches the heap. A reaper thread sleeps until the earliest
+    deadline. When a session expires or the client disconnects, its
+    streams are cancelled and `listeners` are told, so per-client state
+    does not outlive the client.
+    """
+
+    def __init__(self, lease_s=DEFAULT_LEASE_S):
+        self.lease_s = lease_s
+        self.sessions = {}
+        self.deadlines = []  # (expires_at, client_id), possibly stale
+        self.listeners = []  # Called with the client id of every ended session
+        self.condition = threading.Condition()
+        self.reaper = threading.Thread(target=self._reap, daemon=True)
+        self.reaper.start()
+        SESSIONS_ACTIVE.set_function(lambda: len(self.sessions))
+
+    def renew(self, client_id):
+        """Extend a client's lease, opening a session for a new client; returns the Session"""
+        with self.condition:
+            session = self.sessions.get(client_id)
+            if session is None:
+                session = self.sessions[client_id] = Session(client_id)
+            session.expires_at = time.monotonic() + self.lease_s
+            heapq.heappush(self.deadlines, (session.expires_at, client_id))
+            if self.deadlines[0][1] == client_id:
+                self.condition.notify()  # Only an earlier first deadline changes the reaper's wait
+            return session
+
+    def get(self, client_id):
+        """Live session of a client, or None"""
+        with self.condition:
+            return self.sessions.get(client_id)
+
+    def attach(self, client_id, cancel):
+        """Tie a stream to its client's session; returns a token for detach, or None
+
+        Streams of clients without a session (anonymous, or never pinged) are
+        not lease-managed and end with their RPC as before.
+        """
+        with self.condition:
+            session = self.sessions.get(client_id)
+            if session is None:
+                return None
+            token = object()
+            session.streams[token] = cancel
+            return token
+
+    def detach(self, client_id, token):
+        """Forget a stream that ended by itself"""
+        if token is None:
+            return
+        with self.condition:
+            session = self.sessions.get(client_id)
+            if session is not None:
+                session.streams.pop(token, None)
+
+    def end(self, client_id, reason='disconnected'):
+        """End a session now, cancelling its streams; False if there was none"""
+        with self.condition:
+            session = self.sessions.pop(client_id, None)
+        if session is None:
+            return False
+        self._ended(session, reason)
+        return True
+
+    def _ended(self, session, reason):
+        SESSIONS_ENDED.labels(reason).inc()
+        for cancel in list(session.streams.values()):
+            cancel()
+        for listener in self.listeners:
+            listener(session.client_id)
+
+    def _reap(self):
+        while True:
+            with self.condition:
+                while not self.deadlines or self.deadlines[0][0] > time.monotonic():
+                    timeout = self.deadlines[0][0] - time.monotonic() if self.deadlines else None
+                    self.condition.wait(timeout)
+                _, client_id = heapq.heappop(self.deadlines)
+                session = self.sessions.get(client_id)
+                if session is None or session.expires_at > time.monotonic():
+                    continue  # Renewed since, or already ended
+                del self.sessions[client_id]
+            self._ended(session, 'expired')
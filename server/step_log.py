@@ -0,0 +1,218 @@
+import os
+import mmap
+import time
+import bisect
+import struct
+import threading
+from array import array
+
+
+# magic, step, timestamp_ms, loss, accuracy, images_len
+RECORD_HEADER = struct.Struct('<IIQffI')
+RECORD_MAGIC = 0x50455453  # b'STEP'
+SEGMENT_SUFFIX = '.steplog'
+
+
+class Segment:
+    """One append-only file of step records plus its in-memory step -> offset index"""
+
+    def __init__(self, path, first_step):
+        self.path = path
+        self.first_step = first_step
+        self.steps = array('I')
+        self.offsets = array('Q')
+        self.size = 0
+        self.created = time.time()
+        self.writer = None
+        self.mm = None
+        self.mapped_size = 0
+
+    def open_for_append(self):
+        self.writer = open(self.path, 'ab')
+
+    def append(self, step, header, images):
+        self.steps.append(step)
+        self.offsets.append(self.size)
+        self.writer.write(header)
+        self.writer.write(images)
+        self.writer.flush()  # Readers map the file, so the bytes must reach the OS
+        self.size += len(header) + len(images)
+
+    def seal(self):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+
+    def read(self, offset, length):
+        """Copy bytes out of the mapping, remapping first if the file has grown"""
+        if offset + length > self.mapped_size:
+            if self.mm:
+                self.mm.close()
+            with open(self.path, 'rb') as f:
+                self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.mapped_size = len(self.mm)
+        return self.mm[offset:offset + length]
+
+    def close(self):
+        self.seal()
+        if self.mm:
+            self.mm.close()
+            self.mm = None
+
+    def recover(self):
+        """Rebuild the index from disk, truncating a torn trailing record"""
+        file_size = os.path.getsize(self.path)
+        offset = 0
+        with open(self.path, 'rb') as f:
+            while offset + RECORD_HEADER.size <= file_size:
+                f.seek(offset)
+                magic, step, _, _, _, images_len = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                end = offset + RECORD_HEADER.size + images_len
+                if magic != RECORD_MAGIC or end > file_size:
+                    break
+                self.steps.append(step)
+                self.offsets.append(offset)
+                offset = end
+        if offset < file_size:
+            os.truncate(self.path, offset)
+        self.size = offset
+        self.created = os.path.getmtime(self.path)
+
+
+class StepLog:
+    """Append-only, segmented on-disk log of metrics and serialized image batches
+
+    Records are indexed by step and read back through mmap. Old segments are
+    deleted once the log exceeds max_bytes or a segment is older than
+    max_age_s. A step that goes backwards (the trainer was reset) starts a
+    fresh log.
+    """
+
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, max_bytes=1024 ** 3, max_age_s=None):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.segments = []
+        self.lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(SEGMENT_SUFFIX):
+                segment = Segment(os.path.join(directory, name), int(name[:-len(SEGMENT_SUFFIX)]))
+                segment.recover()
+                if segment.steps:
+                    self.segments.append(segment)
+                else:
+                    os.remove(segment.path)
+
+    def _segment_path(self, first_step):
+        return os.path.join(self.directory, f'{first_step:010d}{SEGMENT_SUFFIX}')
+
+    def first_step(self):
+        with self.lock:
+            return self.segments[0].steps[0] if self.segments else 0
+
+    def last_step(self):
+        with self.lock:
+            return self.segments[-1].steps[-1] if self.segments else 0
+
+    def append(self, step, timestamp_ms, loss, accuracy, images=b''):
+        """Write one step; `images` is the serialized ImageBatch (may be empty)"""
+        header = RECORD_HEADER.pack(RECORD_MAGIC, step, timestamp_ms, loss, accuracy, len(images))
+        with self.lock:
+            if self.segments and step <= self.segments[-1].steps[-1]:
+                self._drop(len(self.segments))
+
+            active = self.segments[-1] if self.segments else None
+            if active is None or active.size >= self.segment_bytes:
+                if active:
+                    active.seal()
+                active = Segment(self._segment_path(step), step)
+                active.open_for_append()
+                self.segments.append(active)
+
+            active.append(step, header, images)
+            self._enforce_retention()
+
+    def append_record(self, record, images=b''):
+        """Write a published step record"""
+        self.append(
+            record['step'],
+            record['timestamp_ms'],
+            record['metrics']['loss'],
+            record['metrics']['accuracy'],
+            images
+        )
+
+    def _drop(self, count):
+        for segment in self.segments[:count]:
+            segment.close()
+            os.remove(segment.path)
+        del self.segments[:count]
+
+    def _enforce_retention(self):
+        """Delete the oldest sealed segments while over the size or age limit"""
+        now = time.time()
+        total = sum(segment.size for segment in self.segments)
+        expired = 0
+        for segment in self.segments[:-1]:
+            too_big = self.max_bytes and total > self.max_bytes
+            too_old = self.max_age_s and now - segment.created > self.max_age_s
+            if not (too_big or too_old):
+                break
+            total -= segment.size
+            expired += 1
+        if expired:
+            self._drop(expired)
+
+    def _locate(self, step):
+        """(segment index, record index) of the first record with a step > `step`"""
+        first_steps = [segment.first_step for segment in self.segments]
+        s = max(0, bisect.bisect_right(first_steps, step) - 1)
+        while s < len(self.segments):
+            r = bisect.bisect_right(self.segments[s].steps, step)
+            if r < len(self.segments[s].steps):
+                return s, r
+            s += 1
+        return None
+
+    def _read_record(self, segment, r, with_images):
+        offset = segment.offsets[r]
+        _, step, timestamp_ms, loss, accuracy, images_len = RECORD_HEADER.unpack(
+            segment.read(offset, RECORD_HEADER.size)
+        )
+        images = segment.read(offset + RECORD_HEADER.size, images_len) if with_images and images_len else None
+        return {
+            'step': step,
+            'timestamp_ms': timestamp_ms,
+            'metrics': {'loss': loss, 'accuracy': accuracy},
+            'images': images
+        }
+
+    def latest(self, with_images=True):
+        """The newest retained record, or None"""
+        with self.lock:
+            if not self.segments:
+                return None
+            segment = self.segments[-1]
+            return self._read_record(segment, len(segment.steps) - 1, with_images)
+
+    def iter_from(self, start_step, with_images=True):
+        """Yield retained records with step > start_step in order, including ones appended meanwhile"""
+        step = start_step
+        while True:
+            with self.lock:
+                position = self._locate(step)
+                if position is None:
+                    return
+                s, r = position
+                record = self._read_record(self.segments[s], r, with_images)
+            step = record['step']
+            yield record
+
+    def close(self):
+        with self.lock:
+            for segment in self.segments:
+                segment.close()
+
@@ -1,8 +1,15 @@
 import grpc
+import grpc.aio
+import asyncio
 from concurrent import futures
+from google.protobuf import message_factory
 import time
+import threading
+import multiprocessing
+import signal
 import sys
 import os
+import numpy as np
 
 # Handle both script and PyInstaller execution
 if getattr(sys, 'frozen', False):
@@ -25,32 +32,191 @@ from generated import training_metric_pb2
 # Import mock trainer
 if getattr(sys, 'frozen', False):
     import mock_trainer
+    import flow_control
+    import adaptation
+    import run_registry
+    import broadcaster
+    import process_trainer
+    import image_dedup
+    import image_codecs
+    import image_selection
+    import sessions
 else:
     from server import mock_trainer
+    from server import flow_control
+    from server import adaptation
+    from server import run_registry
+    from server import broadcaster
+    from server import process_trainer
+    from server import image_dedup
+    from server import image_codecs
+    from server import image_selection
+    from server import sessions
+from common import telemetry
+
+
+def _encode_varint(value):
+    """Protobuf base-128 varint encoding"""
+    out = bytearray()
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _embed_message_field(field_number, payload):
+    """Wire-encode already serialized bytes as a length-delimited message field"""
+    return _encode_varint((field_number << 3) | 2) + _encode_varint(len(payload)) + payload
+
+
+TRAINING_UPDATE_BATCH_FIELD = training_service_pb2.TrainingUpdate.DESCRIPTOR.fields_by_name['batch'].number
+IMAGE_BATCH_IMAGES_FIELD = image_batch_pb2.ImageBatch.DESCRIPTOR.fields_by_name['images'].number
+
+# Let clients send HTTP/2 keepalive pings on idle streams without being told "too many pings"
+SERVER_OPTIONS = [
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.min_ping_interval_without_data_ms', 5000),
+]
+
+# Default steps per QueryMetrics response, keeping replies under gRPC's 4 MB receive limit
+QUERY_STEP_LIMIT = 100_000
+QUERY_PREDICTION_STEP_LIMIT = 10_000
+
+# StreamMetricsBatches defaults; a batch goes out once full or once its first step waited this long
+METRICS_FLUSH_INTERVAL_MS = 100
+METRICS_BATCH_STEPS = 256
+MAX_METRICS_BATCH_STEPS = 4096
+
+# Least time between StreamClassStats updates unless the request asks otherwise
+CLASS_STATS_INTERVAL_MS = 500
+
+# Logged steps read per executor call when the aio server replays a log
+REPLAY_CHUNK_STEPS = 256
+
+# ImageSelection enum value -> image_selection policy
+IMAGE_SELECTION_POLICIES = {
+    training_service_pb2.SELECT_FIRST: 'first',
+    training_service_pb2.SELECT_MISCLASSIFIED: 'misclassified',
+    training_service_pb2.SELECT_LEAST_CONFIDENT: 'least_confident',
+    training_service_pb2.SELECT_STRATIFIED: 'stratified',
+    training_service_pb2.SELECT_CLASS: 'class',
+}
+
+
+# Exposed on GET /metrics (see telemetry.serve_http)
+STREAMS_OPEN = telemetry.REGISTRY.gauge('stream_open', 'Streams currently open', ('rpc',))
+STREAM_MESSAGES = telemetry.REGISTRY.counter('stream_messages_sent_total', 'Messages sent on streams', ('rpc',))
+STREAM_BYTES = telemetry.REGISTRY.counter('stream_bytes_sent_total', 'Serialized bytes sent on streams', ('rpc',))
+STREAM_QUEUE_DEPTH = telemetry.REGISTRY.histogram(
+    'stream_queue_depth', 'Steps still buffered for a stream when it sends one', ('rpc',),
+    buckets=telemetry.DEPTH_BUCKETS
+)
+STREAM_SEND_DELAY = telemetry.REGISTRY.histogram(
+    'stream_send_delay_seconds', 'Time from a step being published to a stream sending it', ('rpc',)
+)
+SERIALIZE_SECONDS = telemetry.REGISTRY.histogram('serialize_seconds', 'Time to serialize one message', ('message',))
+DROPPED_FRAMES = telemetry.REGISTRY.counter(
+    'dropped_frames_total', 'Steps a stream skipped: superseded by a newer one, buffer full, '
+    'thinned by adaptation, or overwritten in shared memory', ('reason',)
+)
+STEP_LATENCY = telemetry.REGISTRY.histogram(
+    'step_latency_seconds', 'End-to-end step latency reported by dashboards, clock skew corrected'
+)
+DASHBOARD_FPS = telemetry.REGISTRY.histogram(
+    'dashboard_fps', 'Frame rate reported by dashboards', buckets=(1, 5, 10, 15, 24, 30, 45, 60, 120)
+)
+
+
+def _chunks(records, size):
+    """Lists of up to `size` consecutive records"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _column_bytes(column, dtype):
+    """Little-endian bytes of a NumPy column for MetricsColumns"""
+    return column.astype(dtype, copy=False).tobytes()
+
+
+def build_image_batch(record, max_images=16, codec=None, selection=None):
+    """Build and serialize one step's ImageBatch (called once per step and variant)
+    
+    Returns ImageBatchParts: every image carries its content id, and the
+    pixel-less variant of each lets streams send repeats by reference.
+    """
+    start = time.perf_counter()
+    batch = record['batch']
+    images, refs, ids = [], [], []
+
+    # Take up to max_images images, picked by the stream's selection policy
+    for i in image_selection.select(batch, max_images, selection).tolist():
+        if codec is None:
+            img_data = batch['images'][i]
+        else:
+            # Not batch['images']: indexing it would run a lazy codec for nothing
+            with image_codecs.IMAGE_ENCODE_SECONDS.time():
+                data = codec.encode(batch['pixels'][i])
+            _, height, width, _ = batch['pixels'].shape
+            img_data = {
+                'pixels': data,
+                'width': width,
+                'height': height,
+                'format': codec.format
+            }
+
+        image_id = image_dedup.content_id(img_data['pixels'])
+        labeled_img = image_batch_pb2.LabeledImage(
+            image=image_batch_pb2.Image(
+                width=img_data['width'],
+                height=img_data['height'],
+                format=img_data['format'],
+                content_id=image_id
+            ),
+            ground_truth=batch['labels'][i],
+            prediction=batch['predictions'][i],
+            confidence=batch['confidences'][i]
+        )
+        refs.append(_embed_message_field(IMAGE_BATCH_IMAGES_FIELD, labeled_img.SerializeToString()))
+        labeled_img.image.pixel_data = img_data['pixels']
+        images.append(_embed_message_field(IMAGE_BATCH_IMAGES_FIELD, labeled_img.SerializeToString()))
+        ids.append(image_id)
+
+    head = image_batch_pb2.ImageBatch(
+        step=record['step'],
+        timestamp_ms=record['timestamp_ms']
+    ).SerializeToString()
+    parts = image_dedup.ImageBatchParts(head, images, refs, ids)
+    # Includes encoding for lazy codecs and quality variants (also counted in image_encode_seconds)
+    SERIALIZE_SECONDS.labels('image_batch').observe(time.perf_counter() - start)
+    return parts
 
 
 class HealthCheckService(health_check_pb2_grpc.HealthCheckServicer):
     """Implements fault tolerance and connection management"""
     
-    def __init__(self):
-        self.connected_clients = {}
+    def __init__(self, registry, session_table=None):
+        # Leases renewed by Ping; shared with the dashboard service, whose streams they bound
+        self.sessions = session_table or sessions.SessionTable()
         self.max_retries = 5
+        # Runs' step logs decide which steps a reconnecting client can still resume after
+        self.registry = registry
     
     def Ping(self, request, context):
-        """Respond to heartbeat pings"""
-        client_id = request.client_id
+        """Respond to heartbeat pings, renewing the client's session lease"""
         timestamp = int(time.time() * 1000)
-        
-        if client_id not in self.connected_clients:
-            self.connected_clients[client_id] = {
-                'retry_count': 0,
-                'connected_since': timestamp
-            }
+        session = self.sessions.renew(request.client_id) if request.client_id else None
         
         return health_check_pb2.PingResponse(
             alive=True,
             timestamp_ms=timestamp,
-            retry_count=self.connected_clients[client_id]['retry_count'],
+            retry_count=session.retry_count if session else 0,
             max_retries=self.max_retries
         )
     
@@ -69,164 +235,1088 @@ class HealthCheckService(health_check_pb2_grpc.HealthCheckServicer):
                 status=health_check_pb2.MAX_RETRIES_EXCEEDED
             )
         
-        # Simulate successful reconnection
+        if client_id:
+            self.sessions.renew(client_id)
+        resume_step, message = self._resume_point(self.registry.get(request.run_id), request.last_known_step)
         return health_check_pb2.ReconnectResponse(
             success=True,
-            resume_step=request.last_known_step,
-            message="Reconnected successfully",
+            resume_step=resume_step,
+            message=message,
             attempts_remaining=self.max_retries - attempt,
             retry_after_ms=1000,
             status=health_check_pb2.SUCCESS
         )
     
+    def _resume_point(self, run, last_known_step):
+        """Step the client's streams should replay after, clamped to the run's current step and log"""
+        if run is None:
+            return last_known_step, "Reconnected successfully"
+        if run.step_log is None:
+            if last_known_step > run.trainer.current_step:
+                return 0, "Run restarted, resuming live"
+            return last_known_step, "Reconnected successfully"
+
+        first_step, last_step = run.step_log.first_step(), run.step_log.last_step()
+        if last_known_step > last_step:
+            # Training was reset since the client last saw a step
+            return 0, "Run restarted, resuming live"
+        if first_step and last_known_step < first_step - 1:
+            return first_step - 1, f"Steps before {first_step} are no longer retained"
+        return last_known_step, "Reconnected successfully"
+    
+    def Disconnect(self, request, context):
+        """End the client's session now instead of waiting for its lease to expire"""
+        if self.sessions.end(request.client_id, 'disconnected'):
+            print(f"Client {request.client_id} disconnected: {request.reason or 'no reason given'}")
+            return health_check_pb2.DisconnectResponse(acknowledged=True, message="Session ended")
+        return health_check_pb2.DisconnectResponse(acknowledged=True, message="No open session")
+    
     def GetConnectionStatus(self, request, context):
         """Get current connection status"""
-        client_id = request.client_id
-        client_info = self.connected_clients.get(client_id, {})
+        session = self.sessions.get(request.client_id)
         
         return health_check_pb2.ConnectionStatus(
-            is_connected=client_id in self.connected_clients,
-            failed_attempts=client_info.get('retry_count', 0),
+            is_connected=session is not None,
+            failed_attempts=session.retry_count if session else 0,
             max_allowed_attempts=self.max_retries,
-            connected_since_ms=client_info.get('connected_since', 0),
+            connected_since_ms=session.connected_since_ms if session else 0,
             last_failure_ms=0,
-            status_message="Connected" if client_id in self.connected_clients else "Disconnected"
+            status_message="Connected" if session else "Disconnected"
         )
 
 
 class TrainingDashboardService(training_service_pb2_grpc.TrainingDashboardServicer):
     """Streams training data to dashboard clients"""
     
-    def __init__(self, trainer):
-        self.trainer = trainer
-        self.current_step = 0
+    def __init__(self, registry, subscriber_buffer_size=8, wait_timeout=1.0, target_latency_ms=500, session_table=None):
+        # Hosted runs; requests pick one with run_id
+        self.registry = registry
+        # Each stream gets its own bounded buffer and cursor
+        self.subscriber_buffer_size = subscriber_buffer_size
+        # How often an idle stream re-checks whether its client is still there
+        self.wait_timeout = wait_timeout
+        self.lock = threading.Lock()
+        # Per-client degradation keeps slow dashboards under the latency target
+        self.target_latency_ms = target_latency_ms
+        self.adaptations = {}
+        # Client sessions (shared with HealthCheckService); None = streams only end with their RPC
+        self.sessions = session_table
+        if session_table is not None:
+            session_table.listeners.append(self._session_ended)
+    
+    def _abort(self, context, code, details):
+        """End the RPC with an error status (raises)"""
+        context.abort(code, details)
+    
+    def _run(self, run_id, context):
+        """Run a request targets; aborts the RPC with NOT_FOUND for an unknown id"""
+        run = self.registry.get(run_id)
+        if run is None:
+            self._abort(context, grpc.StatusCode.NOT_FOUND, f"Unknown run '{run_id}'")
+        return run
+    
+    def ListRuns(self, request, context):
+        """Every hosted run with its current progress"""
+        runs = []
+        for run in self.registry.list():
+            metrics = run.trainer.get_current_metrics()
+            runs.append(training_service_pb2.RunInfo(
+                run_id=run.run_id,
+                is_training=run.trainer.is_training,
+                current_step=run.trainer.current_step,
+                max_steps=run.trainer.max_steps,
+                current_loss=metrics['loss'],
+                current_accuracy=metrics['accuracy'],
+                subscribers=run.trainer.broadcaster.subscriber_count() - len(run.recorders)
+            ))
+        return training_service_pb2.ListRunsResponse(runs=runs, default_run_id=self.registry.default_run_id or '')
     
     def StartTraining(self, request, context):
         """Handle start training request"""
-        print(f"Received start training request from client: {request.client_id}")
-        success = self.trainer.start_training()
+        run = self._run(request.run_id, context)
+        print(f"Received start training request for run {run.run_id} from client: {request.client_id}")
+        success = run.trainer.start_training()
         return training_service_pb2.TrainingControlResponse(
             success=success,
             message="Training started" if success else "Failed to start training",
-            is_training=self.trainer.is_training,
-            current_step=self.trainer.current_step
+            is_training=run.trainer.is_training,
+            current_step=run.trainer.current_step
         )
     
     def StopTraining(self, request, context):
         """Handle stop training request"""
-        print(f"Received stop training request from client: {request.client_id}")
-        success = self.trainer.pause_training()
+        run = self._run(request.run_id, context)
+        print(f"Received stop training request for run {run.run_id} from client: {request.client_id}")
+        success = run.trainer.pause_training()
         return training_service_pb2.TrainingControlResponse(
             success=success,
             message="Training stopped" if success else "Failed to stop training",
-            is_training=self.trainer.is_training,
-            current_step=self.trainer.current_step
+            is_training=run.trainer.is_training,
+            current_step=run.trainer.current_step
         )
     
     def GetTrainingStatus(self, request, context):
         """Get current training status"""
-        metrics = self.trainer.get_current_metrics()
+        trainer = self._run(request.run_id, context).trainer
+        metrics = trainer.get_current_metrics()
         return training_service_pb2.TrainingStatusResponse(
-            is_training=self.trainer.is_training,
-            current_step=self.trainer.current_step,
-            max_steps=self.trainer.max_steps,
+            is_training=trainer.is_training,
+            current_step=trainer.current_step,
+            max_steps=trainer.max_steps,
             current_loss=metrics['loss'],
             current_accuracy=metrics['accuracy']
         )
     
+    def QueryMetrics(self, request, context):
+        """Range read of recorded metrics (and predictions) as packed columns"""
+        run = self._run(request.run_id, context)
+        if run.export is None:
+            self._abort(context, grpc.StatusCode.FAILED_PRECONDITION, "Metrics export is not enabled on this server")
+        
+        limit = request.limit or (QUERY_PREDICTION_STEP_LIMIT if request.include_predictions else QUERY_STEP_LIMIT)
+        stride = max(1, request.stride)
+        last_step = run.export.last_step()
+        to_step = min(request.to_step or last_step, last_step)
+        # Cap the range so one response holds at most `limit` steps
+        page_to_step = min(to_step, request.from_step + limit * stride - 1)
+        
+        metrics, predictions = run.export.query(
+            request.from_step, page_to_step, stride, request.include_predictions
+        )
+        response = training_service_pb2.MetricsColumns(
+            count=len(metrics['step']),
+            step=_column_bytes(metrics['step'], '<u4'),
+            loss=_column_bytes(metrics['loss'], '<f4'),
+            accuracy=_column_bytes(metrics['accuracy'], '<f4'),
+            timestamp_ms=_column_bytes(metrics['timestamp_ms'], '<u8'),
+            next_step=page_to_step + 1 if page_to_step < to_step else 0
+        )
+        if predictions is not None:
+            response.image_step = _column_bytes(predictions['step'], '<u4')
+            response.ground_truth = _column_bytes(predictions['ground_truth'], 'u1')
+            response.prediction = _column_bytes(predictions['prediction'], 'u1')
+            response.confidence = _column_bytes(predictions['confidence'], '<f4')
+            response.class_names.extend(run.trainer.classes)
+        return response
+    
+    def _subscribe(self, run, context, start_step=0, maxlen=None):
+        """Attach a stream to the run's broadcaster for the lifetime of the RPC"""
+        subscription = run.trainer.broadcaster.subscribe(
+            maxlen=maxlen or self.subscriber_buffer_size,
+            start_step=start_step
+        )
+        # Wake the waiting handler as soon as the client goes away
+        context.add_callback(subscription.close)
+        return subscription
+    
+    def _replay(self, run, subscription, start_step, with_images=False):
+        """Logged records after start_step, then hand the subscription over to live
+        
+        The subscription is opened before replaying, so steps published during
+        the replay are buffered and only the ones the log didn't cover follow.
+        """
+        if run.step_log is None or not start_step:
+            return
+        last_step = start_step
+        for record in run.step_log.iter_from(start_step, with_images):
+            yield record
+            last_step = record['step']
+        subscription.advance(last_step)
+    
+    def _selection(self, run, request, context):
+        """Image selection a stream request asks for (None = default); aborts with INVALID_ARGUMENT on a bad one"""
+        policy = IMAGE_SELECTION_POLICIES.get(request.selection, str(request.selection))
+        try:
+            selection = image_selection.selection_for(policy, request.batch_size, request.selection_class)
+        except ValueError as e:
+            self._abort(context, grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        if selection is not None and selection.policy == 'class' and selection.class_name not in run.trainer.classes:
+            self._abort(context, grpc.StatusCode.INVALID_ARGUMENT, f"Unknown class '{selection.class_name}'")
+        return selection
+    
+    def _replay_latest_images(self, run, subscription, start_step, selection=None):
+        """Logged record of the newest step after start_step with its images, or None
+        
+        The log holds the default images, so streams selecting others get None.
+        """
+        if run.step_log is None or not start_step:
+            return None
+        if selection is not None and run.image_cache_for(adaptation.ADAPTATION_LEVELS[0], selection) is not run.image_cache:
+            return None
+        record = run.step_log.latest()
+        if record is None or record['step'] <= start_step or record['images'] is None:
+            return None
+        subscription.advance(record['step'])
+        return record
+    
+    def _adaptation_for(self, client_id):
+        """Adaptation state for a client, or None for anonymous streams (full quality)"""
+        if not client_id:
+            return None
+        with self.lock:
+            if client_id not in self.adaptations:
+                self.adaptations[client_id] = adaptation.ClientAdaptation(self.target_latency_ms)
+            return self.adaptations[client_id]
+    
+    def _pacer_for(self, client_id):
+        """Send pacing for a new stream of a client, or None for anonymous streams (full quality, unpaced)"""
+        client_adaptation = self._adaptation_for(client_id)
+        return client_adaptation.pacer() if client_adaptation is not None else None
+    
+    def _image_cache_for_client(self, run, pacer, record, last_sent_step, selection=None):
+        """Image cache for a client's current level and selection, or None to skip this step"""
+        if pacer is None:
+            if selection is None:
+                return run.image_cache
+            return run.image_cache_for(adaptation.ADAPTATION_LEVELS[0], selection)
+        if pacer.should_send(record['step'], last_sent_step):
+            return run.image_cache_for(pacer.current(), selection)
+        DROPPED_FRAMES.labels('adaptation').inc()
+        return None
+    
+    def _cached_images(self, cache, record):
+        try:
+            return cache.get(record)
+        except broadcaster.StaleRecordError:
+            DROPPED_FRAMES.labels('stale').inc()
+            return None  # Too far behind a process trainer's ring; a newer step follows
+    
+    def _images_for(self, run, pacer, record, last_sent_step, held=None, selection=None):
+        """Serialized ImageBatch for a client's current level, or None to skip this step
+        
+        With `held` (the stream's HeldImages), images the client already has
+        are sent by content id only.
+        """
+        cache = self._image_cache_for_client(run, pacer, record, last_sent_step, selection)
+        if cache is None:
+            return None
+        parts = self._cached_images(cache, record)
+        return parts.for_client(held) if parts is not None else None
+    
+    def _session_ended(self, client_id):
+        """Forget a gone client's adaptation state; its streams were cancelled already"""
+        with self.lock:
+            self.adaptations.pop(client_id, None)
+    
+    def _attach_session(self, client_id, context):
+        """Let the client's session cancel this stream; returns a token for _detach_session"""
+        if self.sessions is None or not client_id:
+            return None
+        return self.sessions.attach(client_id, self._canceller(context))
+    
+    def _detach_session(self, client_id, token):
+        if token is not None:
+            self.sessions.detach(client_id, token)
+    
+    def _canceller(self, context):
+        """Callable ending this RPC from any thread"""
+        return context.cancel
+    
+    def _stream_opened(self, rpc):
+        STREAMS_OPEN.labels(rpc).inc()
+    
+    def _stream_closed(self, rpc, subscription=None, drop_reason=None):
+        STREAMS_OPEN.labels(rpc).dec()
+        if subscription is not None:
+            DROPPED_FRAMES.labels(drop_reason).inc(subscription.dropped)
+    
+    def _sent(self, rpc, size, record=None, subscription=None):
+        """Count a sent message; live steps also record their delay and the backlog behind them"""
+        STREAM_MESSAGES.labels(rpc).inc()
+        STREAM_BYTES.labels(rpc).inc(size)
+        if record is not None:
+            STREAM_SEND_DELAY.labels(rpc).observe(max(0.0, time.time() - record['timestamp_ms'] / 1000))
+        if subscription is not None:
+            STREAM_QUEUE_DEPTH.labels(rpc).observe(subscription.pending())
+    
+    def _build_metrics(self, record):
+        """TrainingMetrics message for one published step"""
+        return training_metric_pb2.TrainingMetrics(
+            step=record['step'],
+            loss=record['metrics']['loss'],
+            accuracy=record['metrics']['accuracy'],
+            timestamp_ms=record['timestamp_ms']
+        )
+    
+    def _build_metrics_batch(self, records, dropped=0):
+        """Serialized MetricsBatch of consecutive published steps"""
+        start = time.perf_counter()
+        batch = training_metric_pb2.MetricsBatch(
+            step=[record['step'] for record in records],
+            loss=[record['metrics']['loss'] for record in records],
+            accuracy=[record['metrics']['accuracy'] for record in records],
+            timestamp_ms=[record['timestamp_ms'] for record in records],
+            dropped=dropped
+        )
+        data = batch.SerializeToString()
+        SERIALIZE_SECONDS.labels('metrics_batch').observe(time.perf_counter() - start)
+        return data
+    
+    def _build_class_stats(self, run, snapshot, previous=None):
+        """ClassStatsUpdate with the confusion matrix change since `previous` (None = from empty)"""
+        reset = previous is None or previous['generation'] != snapshot['generation']
+        delta = snapshot['confusion'] if reset else snapshot['confusion'] - previous['confusion']
+        cells = np.flatnonzero(delta)
+        return training_metric_pb2.ClassStatsUpdate(
+            step=snapshot['step'],
+            timestamp_ms=snapshot['timestamp_ms'],
+            reset=reset,
+            class_names=run.class_stats.classes if reset else [],
+            confusion_cells=cells.tolist(),
+            confusion_counts=delta.ravel()[cells].tolist(),
+            window_steps=snapshot['window_steps'],
+            window_correct=snapshot['window_correct'].tolist(),
+            window_total=snapshot['window_total'].tolist(),
+            confidence_correct=snapshot['window_confidence'][1].tolist(),
+            confidence_wrong=snapshot['window_confidence'][0].tolist()
+        )
+    
+    def _batch_limits(self, request):
+        """Flush interval (seconds) and steps per message a StreamMetricsBatches request asks for"""
+        flush_interval_ms = request.flush_interval_ms or METRICS_FLUSH_INTERVAL_MS
+        max_steps = min(request.max_batch_steps or METRICS_BATCH_STEPS, MAX_METRICS_BATCH_STEPS)
+        return flush_interval_ms / 1000, max_steps
+    
+    def _build_training_update(self, run, record, images=None):
+        """Serialized TrainingUpdate, splicing in already serialized ImageBatch bytes"""
+        start = time.perf_counter()
+        update = training_service_pb2.TrainingUpdate(
+            step=record['step'],
+            metrics=self._build_metrics(record),
+            status="TRAINING" if run.trainer.is_training else "PAUSED"
+        )
+        data = update.SerializeToString()
+        SERIALIZE_SECONDS.labels('training_update').observe(time.perf_counter() - start)
+        if images is not None:
+            # Appending a field to a serialized message is a valid protobuf merge
+            data += _embed_message_field(TRAINING_UPDATE_BATCH_FIELD, images)
+        return data
+    
     def StreamMetrics(self, request, context):
-        """Stream training metrics (loss, accuracy)"""
-        update_interval = request.update_interval
+        """Stream training metrics (loss, accuracy) as each step is published"""
+        run = self._run(request.run_id, context)
+        subscription = self._subscribe(run, context, start_step=request.start_step)
+        start_step = subscription.cursor  # 0 if the client's step predates a reset
+        self._stream_opened('StreamMetrics')
+        session = self._attach_session(request.client_id, context)
         
-        while True:
-            if self.current_step < self.trainer.current_step:
-                self.current_step = self.trainer.current_step
+        try:
+            for record in self._replay(run, subscription, start_step):
+                if not context.is_active():
+                    return
+                metrics = self._build_metrics(record)
+                yield metrics
+                self._sent('StreamMetrics', metrics.ByteSize())
+            
+            while context.is_active():
+                record = subscription.get(timeout=self.wait_timeout)
+                if record is None:
+                    continue
                 
-                metrics = self.trainer.get_current_metrics()
-                yield training_metric_pb2.TrainingMetrics(
-                    step=self.current_step,
-                    loss=metrics['loss'],
-                    accuracy=metrics['accuracy'],
-                    timestamp_ms=int(time.time() * 1000)
-                )
+                metrics = self._build_metrics(record)
+                yield metrics
+                self._sent('StreamMetrics', metrics.ByteSize(), record, subscription)
+        finally:
+            subscription.close()
+            self._detach_session(request.client_id, session)
+            self._stream_closed('StreamMetrics', subscription, 'buffer_full')
+    
+    def StreamMetricsBatches(self, request, context):
+        """Stream every step's metrics, coalesced into MetricsBatch messages
+        
+        A batch is sent once it holds max_batch_steps steps or its first step
+        has waited flush_interval_ms. The stream buffers two full batches, so
+        only a client that falls that far behind loses steps, and the next
+        batch reports how many.
+        """
+        run = self._run(request.run_id, context)
+        flush_interval, max_steps = self._batch_limits(request)
+        subscription = self._subscribe(run, context, start_step=request.start_step, maxlen=2 * max_steps)
+        start_step = subscription.cursor
+        self._stream_opened('StreamMetricsBatches')
+        session = self._attach_session(request.client_id, context)
+        reported = 0
+        
+        try:
+            for records in _chunks(self._replay(run, subscription, start_step), max_steps):
+                if not context.is_active():
+                    return
+                data = self._build_metrics_batch(records)
+                yield data
+                self._sent('StreamMetricsBatches', len(data))
             
-            time.sleep(update_interval / 1000.0)  # Convert ms to seconds
+            while context.is_active():
+                records = subscription.get_batch(max_steps, timeout=self.wait_timeout, linger=flush_interval)
+                if not records:
+                    continue
+                
+                dropped = subscription.dropped - reported
+                reported += dropped
+                data = self._build_metrics_batch(records, dropped)
+                yield data
+                self._sent('StreamMetricsBatches', len(data), records[-1], subscription)
+        finally:
+            subscription.close()
+            self._detach_session(request.client_id, session)
+            self._stream_closed('StreamMetricsBatches', subscription, 'buffer_full')
     
-    def StreamImages(self, request, context):
-        """Stream image batches with predictions"""
-        batch_size = request.batch_size
-        start_step = request.start_step
+    def StreamClassStats(self, request, context):
+        """Stream confusion matrix deltas and windowed per-class accuracy
         
-        self.current_step = start_step
+        The first update carries the whole matrix; later ones only the cells
+        that changed, at most one per update_interval_ms.
+        """
+        run = self._run(request.run_id, context)
+        interval = (request.update_interval_ms or CLASS_STATS_INTERVAL_MS) / 1000
+        stats = run.class_stats
+        previous = None
+        self._stream_opened('StreamClassStats')
+        session = self._attach_session(request.client_id, context)
         
-        while True:
-            if self.current_step < self.trainer.current_step:
-                self.current_step = self.trainer.current_step
+        try:
+            while context.is_active():
+                if previous is not None and not stats.wait_for(
+                    previous['generation'], previous['step'], timeout=self.wait_timeout
+                ):
+                    continue
                 
-                batch = self.trainer.get_current_batch()
-                labeled_images = []
+                snapshot = stats.snapshot()
+                update = self._build_class_stats(run, snapshot, previous)
+                yield update
+                self._sent('StreamClassStats', update.ByteSize())
+                previous = snapshot
+                time.sleep(interval)
+        finally:
+            self._detach_session(request.client_id, session)
+            self._stream_closed('StreamClassStats')
+    
+    def StreamImages(self, request, context):
+        """Stream image batches with predictions as each step is published"""
+        run = self._run(request.run_id, context)
+        selection = self._selection(run, request, context)
+        subscription = self._subscribe(run, context, start_step=request.start_step)
+        start_step = subscription.cursor
+        pacer = self._pacer_for(request.client_id)
+        held = image_dedup.held_images_for(request.image_cache_size)
+        last_sent_step = 0
+        self._stream_opened('StreamImages')
+        session = self._attach_session(request.client_id, context)
+        
+        try:
+            # Catching up after a reconnect: only the newest logged step is worth showing
+            record = self._replay_latest_images(run, subscription, start_step, selection)
+            if record is not None:
+                yield record['images']
+                self._sent('StreamImages', len(record['images']))
+                last_sent_step = record['step']
+            
+            while context.is_active():
+                # Images are only worth showing for the newest step
+                record = subscription.get_latest(timeout=self.wait_timeout)
+                if record is None:
+                    continue
                 
-                # Take up to 16 images (or batch_size)
-                for i in range(min(16, len(batch['images']))):
-                    img_data = batch['images'][i]
-                    
-                    labeled_img = image_batch_pb2.LabeledImage(
-                        image=image_batch_pb2.Image(
-                            pixel_data=img_data['pixels'],
-                            width=img_data['width'],
-                            height=img_data['height'],
-                            format="RGB"
-                        ),
-                        ground_truth=batch['labels'][i],
-                        prediction=batch['predictions'][i],
-                        confidence=batch['confidences'][i]
-                    )
-                    labeled_images.append(labeled_img)
+                # Bytes shared by every subscriber at this level, sent through the pass-through serializer
+                images = self._images_for(run, pacer, record, last_sent_step, held, selection)
+                if images is None:
+                    continue
                 
-                yield image_batch_pb2.ImageBatch(
-                    step=self.current_step,
-                    images=labeled_images,
-                    timestamp_ms=int(time.time() * 1000)
-                )
+                yield images
+                self._sent('StreamImages', len(images), record)
+                last_sent_step = record['step']
+        finally:
+            subscription.close()
+            self._detach_session(request.client_id, session)
+            self._stream_closed('StreamImages', subscription, 'superseded')
+    
+    def LiveTrainingStream(self, request_iterator, context):
+        """Multiplex metrics and image batches on one stream, paced by client credit
+        
+        The client opens with a DashboardResponse (ready, last_received_step,
+        window) and acks each update it has rendered. Every step's metrics are
+        sent; images ride along only with the newest buffered step.
+        """
+        first = next(request_iterator, None)
+        if first is None:
+            return
+        run = self._run(first.run_id, context)
+        selection = self._selection(run, first, context)
+        
+        credits = flow_control.CreditWindow(first.window or 1)
+        credits.update(first.ready, first.last_received_step)
+        subscription = self._subscribe(run, context, start_step=first.last_received_step)
+        start_step = subscription.cursor
+        context.add_callback(credits.close)
+        pacer = self._pacer_for(first.client_id)
+        held = image_dedup.held_images_for(first.image_cache_size)
+        last_images_step = 0
+        
+        def consume_acks():
+            try:
+                for ack in request_iterator:
+                    credits.update(ack.ready, ack.last_received_step, ack.window)
+            except grpc.RpcError:
+                pass  # Client went away; the callbacks above clean up
+            finally:
+                credits.close()
+                subscription.close()
+        
+        threading.Thread(target=consume_acks, daemon=True).start()
+        self._stream_opened('LiveTrainingStream')
+        session = self._attach_session(first.client_id, context)
+        
+        try:
+            # Replay logged metrics under the same credit window, images only with the last one
+            latest = self._replay_latest_images(run, subscription, start_step, selection)
+            for record in self._replay(run, subscription, start_step):
+                while not credits.wait_for_credit(timeout=self.wait_timeout):
+                    if credits.closed or not context.is_active():
+                        return
+                images = None
+                if latest is not None and record['step'] == latest['step']:
+                    images = latest['images']
+                    last_images_step = record['step']
+                update = self._build_training_update(run, record, images)
+                yield update
+                self._sent('LiveTrainingStream', len(update))
+                credits.sent(record['step'])
             
-            time.sleep(0.1)  # Check every 100ms
+            while context.is_active() and not credits.closed:
+                if not credits.wait_for_credit(timeout=self.wait_timeout):
+                    continue
+                
+                record = subscription.get(timeout=self.wait_timeout)
+                if record is None:
+                    continue
+                
+                images = None
+                if subscription.pending() == 0:
+                    images = self._images_for(run, pacer, record, last_images_step, held, selection)
+                    if images is not None:
+                        last_images_step = record['step']
+                else:
+                    DROPPED_FRAMES.labels('superseded').inc()
+                
+                update = self._build_training_update(run, record, images)
+                yield update
+                self._sent('LiveTrainingStream', len(update), record, subscription)
+                credits.sent(record['step'])
+        finally:
+            credits.close()
+            subscription.close()
+            self._detach_session(first.client_id, session)
+            self._stream_closed('LiveTrainingStream', subscription, 'buffer_full')
     
     def SendDashboardStatus(self, request, context):
-        """Receive dashboard performance metrics"""
-        print(f"Dashboard Status - FPS: {request.fps:.2f}, Latency: {request.latency_ms:.2f}ms")
+        """Receive dashboard performance metrics and adapt that client's stream quality"""
+        client_adaptation = self._adaptation_for(request.client_id)
+        if client_adaptation is None:
+            print(f"Dashboard Status - FPS: {request.fps:.2f}, Latency: {request.latency_ms:.2f}ms")
+            return training_service_pb2.StatusAck(
+                success=True,
+                message="Status received"
+            )
+        
+        # Dashboards correct latency_ms for clock skew before reporting it
+        STEP_LATENCY.observe(max(0.0, request.latency_ms / 1000))
+        DASHBOARD_FPS.observe(request.fps)
+        
+        previous_level = client_adaptation.level
+        level = client_adaptation.report(request.fps, request.latency_ms)
+        print(f"Dashboard Status [{request.client_id}] - FPS: {request.fps:.2f}, "
+              f"Latency: {request.latency_ms:.2f}ms, Adaptation: {client_adaptation.describe()}")
         
         return training_service_pb2.StatusAck(
             success=True,
-            message="Status received"
+            message="Adaptation level changed" if level != previous_level else "Status received",
+            adaptation_level=level,
+            adaptation_name=client_adaptation.current()['name']
         )
 
 
-def serve(trainer, port=50051):
-    """Start the gRPC server"""
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+class _DeferredAbort(Exception):
+    """Abort raised from synchronous helpers, awaited by the async handler"""
     
-    # Add services
-    training_service_pb2_grpc.add_TrainingDashboardServicer_to_server(
-        TrainingDashboardService(trainer), server
+    def __init__(self, code, details):
+        super().__init__(details)
+        self.code = code
+        self.details = details
+
+
+class AsyncTrainingDashboardService(TrainingDashboardService):
+    """TrainingDashboard for a grpc.aio server
+    
+    Streams are coroutines awaiting the broadcaster instead of threads
+    blocked on it, so an open stream costs a task rather than a worker.
+    Unary RPCs and image encoding run in the loop's default executor so they
+    never stall the streams.
+    """
+    
+    def __init__(self, registry, **kwargs):
+        super().__init__(registry, **kwargs)
+        self.waker = None  # LoopWaker, created on the serving loop
+    
+    def _abort(self, context, code, details):
+        raise _DeferredAbort(code, details)
+    
+    async def _unary(self, method, request, context):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, method, request, context)
+        except _DeferredAbort as e:
+            await context.abort(e.code, e.details)
+    
+    async def _run_async(self, run_id, context):
+        try:
+            return self._run(run_id, context)
+        except _DeferredAbort as e:
+            await context.abort(e.code, e.details)
+    
+    async def _selection_async(self, run, request, context):
+        try:
+            return self._selection(run, request, context)
+        except _DeferredAbort as e:
+            await context.abort(e.code, e.details)
+    
+    def _subscribe(self, run, context, start_step=0, maxlen=None):
+        """Async subscription; the handler's finally closes it when the call ends"""
+        if self.waker is None:
+            self.waker = broadcaster.LoopWaker(asyncio.get_running_loop())
+        return run.trainer.broadcaster.subscribe(
+            maxlen=maxlen or self.subscriber_buffer_size,
+            start_step=start_step,
+            waker=self.waker
+        )
+    
+    def _canceller(self, context):
+        """Callable ending this RPC from any thread
+        
+        Cancelling the handler's task alone leaves the client waiting, so the
+        CANCELLED status goes out first.
+        """
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        
+        async def cancel():
+            try:
+                await context.abort(grpc.StatusCode.CANCELLED, "Session ended")
+            except Exception:
+                pass  # abort() raises once the status is sent, or if the RPC already ended
+            task.cancel()
+        
+        return lambda: asyncio.run_coroutine_threadsafe(cancel(), loop)
+    
+    async def _replay_chunks(self, run, subscription, start_step, size=REPLAY_CHUNK_STEPS):
+        """_replay without blocking the loop: lists of up to `size` records read in the executor"""
+        loop = asyncio.get_running_loop()
+        chunks = _chunks(self._replay(run, subscription, start_step), size)
+        while True:
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    
+    async def _replay_latest_images_async(self, run, subscription, start_step, selection=None):
+        """_replay_latest_images with the log read in the executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, self._replay_latest_images, run, subscription, start_step, selection
+        )
+    
+    async def _images_async(self, run, pacer, record, last_sent_step, held=None, selection=None):
+        """_images_for without blocking the loop: cache hits inline, builds in the executor"""
+        cache = self._image_cache_for_client(run, pacer, record, last_sent_step, selection)
+        if cache is None:
+            return None
+        parts = cache.peek(record)
+        if parts is None:
+            loop = asyncio.get_running_loop()
+            parts = await loop.run_in_executor(None, self._cached_images, cache, record)
+        return parts.for_client(held) if parts is not None else None
+    
+    async def StartTraining(self, request, context):
+        return await self._unary(super().StartTraining, request, context)
+    
+    async def StopTraining(self, request, context):
+        return await self._unary(super().StopTraining, request, context)
+    
+    async def GetTrainingStatus(self, request, context):
+        return await self._unary(super().GetTrainingStatus, request, context)
+    
+    async def QueryMetrics(self, request, context):
+        return await self._unary(super().QueryMetrics, request, context)
+    
+    async def ListRuns(self, request, context):
+        return await self._unary(super().ListRuns, request, context)
+    
+    async def SendDashboardStatus(self, request, context):
+        return await self._unary(super().SendDashboardStatus, request, context)
+    
+    async def StreamMetrics(self, request, context):
+        """Stream training metrics (loss, accuracy) as each step is published"""
+        run = await self._run_async(request.run_id, context)
+        subscription = self._subscribe(run, context, start_step=request.start_step)
+        start_step = subscription.cursor
+        self._stream_opened('StreamMetrics')
+        session = self._attach_session(request.client_id, context)
+        
+        try:
+            async for records in self._replay_chunks(run, subscription, start_step):
+                for record in records:
+                    metrics = self._build_metrics(record)
+                    yield metrics
+                    self._sent('StreamMetrics', metrics.ByteSize())
+            
+            while not subscription.closed:
+                record = await subscription.next(timeout=self.wait_timeout)
+                if record is not None:
+                    metrics = self._build_metrics(record)
+                    yield metrics
+                    self._sent('StreamMetrics', metrics.ByteSize(), record, subscription)
+        finally:
+            subscription.close()
+            self._detach_session(request.client_id, session)
+            self._stream_closed('StreamMetrics', subscription, 'buffer_full')
+    
+    async def StreamMetricsBatches(self, request, context):
+        """Stream every step's metrics, coalesced into MetricsBatch messages"""
+        run = await self._run_async(request.run_id, context)
+        flush_interval, max_steps = self._batch_limits(request)
+        subscription = self._subscribe(run, context, start_step=request.start_step, maxlen=2 * max_steps)
+        start_step = subscription.cursor
+        self._stream_opened('StreamMetricsBatches')
+        session = self._attach_session(request.client_id, context)
+        reported = 0
+        
+        try:
+            async for records in self._replay_chunks(run, subscription, start_step, max_steps):
+                data = self._build_metrics_batch(records)
+                yield data
+                self._sent('StreamMetricsBatches', len(data))
+            
+            while not subscription.closed:
+                records = await subscription.next_batch(max_steps, timeout=self.wait_timeout, linger=flush_interval)
+                if records:
+                    dropped = subscription.dropped - reported
+                    reported += dropped
+                    data = self._build_metrics_batch(records, dropped)
+                    yield data
+                    self._sent('StreamMetricsBatches', len(data), records[-1], subscription)
+        finally:
+            subscription.close()
+            self._detach_session(request.client_id, session)
+            self._stream_closed('StreamMetricsBatches', subscription, 'buffer_full')
+    
+    async def StreamClassStats(self, request, context):
+        """Stream confusion matrix deltas and windowed per-class accuracy"""
+        run = await self._run_async(request.run_id, context)
+        interval = (request.update_interval_ms or CLASS_STATS_INTERVAL_MS) / 1000
+        stats = run.class_stats
+        previous = None
+        self._stream_opened('StreamClassStats')
+        session = self._attach_session(request.client_id, context)
+        
+        try:
+            while True:
+                # Checked once per interval; a snapshot is a few small array copies
+                snapshot = stats.snapshot()
+                if previous is None or (snapshot['generation'], snapshot['step']) != (
+                    previous['generation'], previous['step']
+                ):
+                    update = self._build_class_stats(run, snapshot, previous)
+                    yield update
+                    self._sent('StreamClassStats', update.ByteSize())
+                    previous = snapshot
+                await asyncio.sleep(interval)
+        finally:
+            self._detach_session(request.client_id, session)
+            self._stream_closed('StreamClassStats')
+    
+    async def StreamImages(self, request, context):
+        """Stream image batches with predictions as each step is published"""
+        run = await self._run_async(request.run_id, context)
+        selection = await self._selection_async(run, request, context)
+        subscription = self._subscribe(run, context, start_step=request.start_step)
+        start_step = subscription.cursor
+        pacer = self._pacer_for(request.client_id)
+        held = image_dedup.held_images_for(request.image_cache_size)
+        last_sent_step = 0
+        self._stream_opened('StreamImages')
+        session = self._attach_session(request.client_id, context)
+        
+        try:
+            record = await self._replay_latest_images_async(run, subscription, start_step, selection)
+            if record is not None:
+                yield record['images']
+                self._sent('StreamImages', len(record['images']))
+                last_sent_step = record['step']
+            
+            while not subscription.closed:
+                record = await subscription.next(timeout=self.wait_timeout, latest=True)
+                if record is None:
+                    continue
+                
+                images = await self._images_async(run, pacer, record, last_sent_step, held, selection)
+                if images is None:
+                    continue
+                
+                yield images
+                self._sent('StreamImages', len(images), record)
+                last_sent_step = record['step']
+        finally:
+            subscription.close()
+            self._detach_session(request.client_id, session)
+            self._stream_closed('StreamImages', subscription, 'superseded')
+    
+    async def LiveTrainingStream(self, request_iterator, context):
+        """Multiplex metrics and image batches on one stream, paced by client credit"""
+        try:
+            first = await request_iterator.__anext__()
+        except StopAsyncIteration:
+            return
+        run = await self._run_async(first.run_id, context)
+        selection = await self._selection_async(run, first, context)
+        
+        credits = flow_control.CreditWindow(first.window or 1)
+        credits.update(first.ready, first.last_received_step)
+        credit_changed = asyncio.Event()
+        subscription = self._subscribe(run, context, start_step=first.last_received_step)
+        start_step = subscription.cursor
+        pacer = self._pacer_for(first.client_id)
+        held = image_dedup.held_images_for(first.image_cache_size)
+        last_images_step = 0
+        
+        async def consume_acks():
+            try:
+                async for ack in request_iterator:
+                    credits.update(ack.ready, ack.last_received_step, ack.window)
+                    credit_changed.set()
+            except grpc.RpcError:
+                pass  # Client went away
+            finally:
+                credits.close()
+                credit_changed.set()
+                subscription.close()
+        
+        async def wait_for_credit():
+            # Acks arrive on this same loop, so checking then waiting can't miss one
+            while not credits.closed and not credits.has_credit():
+                credit_changed.clear()
+                await credit_changed.wait()
+            return not credits.closed
+        
+        acks = asyncio.create_task(consume_acks())
+        self._stream_opened('LiveTrainingStream')
+        session = self._attach_session(first.client_id, context)
+        try:
+            latest = await self._replay_latest_images_async(run, subscription, start_step, selection)
+            async for records in self._replay_chunks(run, subscription, start_step):
+                for record in records:
+                    if not await wait_for_credit():
+                        return
+                    images = None
+                    if latest is not None and record['step'] == latest['step']:
+                        images = latest['images']
+                        last_images_step = record['step']
+                    update = self._build_training_update(run, record, images)
+                    yield update
+                    self._sent('LiveTrainingStream', len(update))
+                    credits.sent(record['step'])
+            
+            while await wait_for_credit():
+                record = await subscription.next(timeout=self.wait_timeout)
+                if record is None:
+                    continue
+                
+                images = None
+                if subscription.pending() == 0:
+                    images = await self._images_async(run, pacer, record, last_images_step, held, selection)
+                    if images is not None:
+                        last_images_step = record['step']
+                else:
+                    DROPPED_FRAMES.labels('superseded').inc()
+                
+                update = self._build_training_update(run, record, images)
+                yield update
+                self._sent('LiveTrainingStream', len(update), record, subscription)
+                credits.sent(record['step'])
+        finally:
+            credits.close()
+            subscription.close()
+            acks.cancel()
+            self._detach_session(first.client_id, session)
+            self._stream_closed('LiveTrainingStream', subscription, 'buffer_full')
+
+
+class AsyncHealthCheckService(HealthCheckService):
+    """HealthCheck for a grpc.aio server; every handler is quick and non-blocking"""
+    
+    async def Ping(self, request, context):
+        return super().Ping(request, context)
+    
+    async def Reconnect(self, request, context):
+        return super().Reconnect(request, context)
+    
+    async def Disconnect(self, request, context):
+        return super().Disconnect(request, context)
+    
+    async def GetConnectionStatus(self, request, context):
+        return super().GetConnectionStatus(request, context)
+
+
+def _passthrough_serializer(message):
+    """Send pre-serialized bytes untouched, serialize anything else normally"""
+    if isinstance(message, bytes):
+        return message
+    return message.SerializeToString()
+
+
+def add_training_dashboard_to_server(servicer, server):
+    """Register TrainingDashboard so handlers may yield pre-serialized messages"""
+    service = training_service_pb2.DESCRIPTOR.services_by_name['TrainingDashboard']
+    handler_factories = {
+        (False, False): grpc.unary_unary_rpc_method_handler,
+        (False, True): grpc.unary_stream_rpc_method_handler,
+        (True, False): grpc.stream_unary_rpc_method_handler,
+        (True, True): grpc.stream_stream_rpc_method_handler,
+    }
+    
+    rpc_method_handlers = {}
+    for method in service.methods:
+        request_class = message_factory.GetMessageClass(method.input_type)
+        factory = handler_factories[(method.client_streaming, method.server_streaming)]
+        rpc_method_handlers[method.name] = factory(
+            getattr(servicer, method.name),
+            request_deserializer=request_class.FromString,
+            response_serializer=_passthrough_serializer
+        )
+    
+    server.add_generic_rpc_handlers((
+        grpc.method_handlers_generic_handler(service.full_name, rpc_method_handlers),
+    ))
+
+
+def _build_registry(trainers, step_log_dir=None, export_dir=None):
+    """Registry hosting `trainers` (a dict of run id -> trainer, or one trainer as 'default')"""
+    if not isinstance(trainers, dict):
+        trainers = {'default': trainers}
+    
+    registry = run_registry.RunRegistry(build_image_batch, step_log_dir=step_log_dir, export_dir=export_dir)
+    for run_id, trainer in trainers.items():
+        registry.add(run_id, trainer)
+    return registry
+
+
+def _serve_metrics(metrics_port):
+    """Expose the telemetry registry on http://<host>:<metrics_port>/metrics"""
+    if metrics_port:
+        telemetry.serve_http(metrics_port)
+        print(f"Metrics on http://localhost:{metrics_port}/metrics")
+
+
+def _close_on_sigterm():
+    """Handle SIGTERM (docker stop) like Ctrl+C, so runs are closed and flushed"""
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+
+def serve(trainers, port=50051, step_log_dir=None, export_dir=None, max_workers=None, metrics_port=None,
+          session_lease_s=sessions.DEFAULT_LEASE_S):
+    """Start the thread-pool gRPC server hosting one or more trainers
+    
+    `trainers` maps run ids to trainers (a single trainer becomes run
+    'default'). Every step is recorded under step_log_dir (for reconnect
+    replay) and export_dir (columnar, for QueryMetrics) when they are given.
+    With metrics_port, counters and histograms are served on GET /metrics.
+    A client that stops pinging for session_lease_s loses its streams.
+    """
+    registry = _build_registry(trainers, step_log_dir, export_dir)
+    _serve_metrics(metrics_port)
+    _close_on_sigterm()
+    run_ids = [run.run_id for run in registry.list()]
+    
+    # Every open stream holds a worker thread, so size the shared pool by run count
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=max_workers or 10 * len(run_ids)),
+        options=SERVER_OPTIONS
     )
+    
+    # Add services
+    session_table = sessions.SessionTable(session_lease_s)
+    add_training_dashboard_to_server(TrainingDashboardService(registry, session_table=session_table), server)
     health_check_pb2_grpc.add_HealthCheckServicer_to_server(
-        HealthCheckService(), server
+        HealthCheckService(registry, session_table), server
     )
     
     server.add_insecure_port(f'[::]:{port}')
     server.start()
-    print(f"Server started on port {port}")
+    print(f"Server started on port {port} with runs: {', '.join(run_ids)}")
     print("Waiting for client to send start command...")
     
     try:
         server.wait_for_termination()
     except KeyboardInterrupt:
         print("\nShutting down server...")
-        trainer.stop_training()
+    finally:
         server.stop(0)
+        registry.close()
+
+
+async def _serve_async(registry, port, session_lease_s):
+    server = grpc.aio.server(options=SERVER_OPTIONS)
+    session_table = sessions.SessionTable(session_lease_s)
+    add_training_dashboard_to_server(AsyncTrainingDashboardService(registry, session_table=session_table), server)
+    health_check_pb2_grpc.add_HealthCheckServicer_to_server(
+        AsyncHealthCheckService(registry, session_table), server
+    )
+    
+    server.add_insecure_port(f'[::]:{port}')
+    await server.start()
+    print(f"Async server started on port {port} with runs: {', '.join(run.run_id for run in registry.list())}")
+    print("Waiting for client to send start command...")
+    
+    try:
+        await server.wait_for_termination()
+    finally:
+        await server.stop(0)
+
+
+def serve_async(trainers, port=50051, step_log_dir=None, export_dir=None, metrics_port=None,
+                session_lease_s=sessions.DEFAULT_LEASE_S):
+    """Like serve(), on a grpc.aio server where streams are coroutines, not threads"""
+    registry = _build_registry(trainers, step_log_dir, export_dir)
+    _serve_metrics(metrics_port)
+    _close_on_sigterm()
+    try:
+        asyncio.run(_serve_async(registry, port, session_lease_s))
+    except KeyboardInterrupt:
+        print("\nShutting down server...")
+    finally:
+        registry.close()
 
 
 if __name__ == '__main__':
-    trainer = mock_trainer.MockTrainer()
+    multiprocessing.freeze_support()
+    # e.g. TRAINING_RUNS=baseline,lr-3e-4,wide hosts three independent trainers
+    run_ids = [run_id.strip() for run_id in os.getenv('TRAINING_RUNS', 'default').split(',') if run_id.strip()]
+    # TRAINER_PROCESSES=1 moves each trainer's generation and encoding into its own process
+    trainer_class = process_trainer.ProcessTrainer if os.getenv('TRAINER_PROCESSES') == '1' else mock_trainer.MockTrainer
+    # TRAINER_FIXED_SAMPLES=1 repeats the same images every step, which streams send once
+    # TRAINER_CODEC=raw skips encoding; the web dashboard paints the RGB bytes as they are (LAN use)
+    trainers = {
+        run_id: trainer_class(
+            codec=os.getenv('TRAINER_CODEC', 'png'),
+            fixed_samples=os.getenv('TRAINER_FIXED_SAMPLES') == '1'
+        )
+        for run_id in run_ids
+    }
+    # GRPC_SERVER_MODE=threads keeps the thread-pool server, e.g. for comparison
+    serve_fn = serve if os.getenv('GRPC_SERVER_MODE', 'aio') == 'threads' else serve_async
     # Don't start training automatically - wait for client command
-    serve(trainer)
\ No newline at end of file
+    serve_fn(
+        trainers,
+        step_log_dir=os.getenv('STEP_LOG_DIR'),
+        export_dir=os.getenv('METRICS_EXPORT_DIR'),
+        metrics_port=int(os.getenv('METRICS_PORT', 9464)),  # 0 disables /metrics
+        session_lease_s=float(os.getenv('SESSION_LEASE_S', sessions.DEFAULT_LEASE_S))
+    )
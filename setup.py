@@ -3,7 +3,7 @@ import sys
 
 # Dependencies
 build_exe_options = {
-    "packages": ["grpc", "flask", "flask_cors", "numpy", "PIL"],
+    "packages": ["grpc", "flask", "flask_cors", "numpy", "PIL", "common"],
     "include_files": [
         ("templates/", "templates/"),
         ("generated/", "generated/")
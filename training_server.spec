@@ -4,7 +4,7 @@ block_cipher = None
 
 a = Analysis(
     ['server/training_server.py'],
-    pathex=['.'],
+    pathex=['.'],  # Repo root, so the shared `common` package resolves
     binaries=[],
     datas=[
         ('generated', 'generated'),
@@ -15,6 +15,8 @@ a = Analysis(
         'google',
         'google.protobuf',
         'numpy.random',   # ✅ force include numpy.random
+        'common',
+        'common.telemetry',  # Shared with the dashboard client
     ],
     excludes=[
         'matplotlib',     # ✅ safe to exclude